@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+home_populate.py
+
+Times the ways of creating a template's home tree on reset, on the
+filesystem holding --dir:
+
+    * records: one makedirs per entry plus open/truncate (pre-plan behaviour)
+    * plan:    TemplateCache's cached plan, one mkdir per directory and
+               one open/ftruncate per file
+    * cp:      `cp -a --reflink=auto --sparse=always` of a pre-built image
+
+mtime stamping is the same for every variant and is left out.
+
+Usage:
+    home_populate.py [--template FILE] [--entries N] [--iterations N] [--dir DIR]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, __file__.rsplit("/benchmarks/", 1)[0])
+from file_browser_env.home_snapshot import materialise, parse_template, plan_template  # noqa: E402
+
+
+def synthetic_template(entries, seed=0):
+    """Nested folders of sparse files, roughly shaped like generate_trees output."""
+    rng = random.Random(seed)
+    lines = []
+
+    def fill(depth):
+        for i in range(rng.randint(4, 9)):
+            if len(lines) >= entries:
+                return
+            if depth < 4 and rng.random() < 0.45:
+                lines.append("  " * depth + f"folder_{depth}_{i}/")
+                fill(depth + 1)
+            else:
+                lines.append("  " * depth + f"file_{depth}_{i}.dat ({rng.randint(1, 900)} KB)")
+
+    while len(lines) < entries:
+        fill(0)
+        lines.append(f"top_{len(lines)}/")
+    return lines
+
+
+def build_per_record(records, root):
+    os.makedirs(root, exist_ok=True)
+    for rec in records:
+        path = os.path.join(root, rec.path)
+        if rec.is_dir:
+            os.makedirs(path, exist_ok=True)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.truncate(rec.size)
+
+
+def measure(variants, base, iterations):
+    """Time every variant once per round, interleaved, so disk drift hits them all alike."""
+    samples = {name: [] for name, _ in variants}
+    for i in range(iterations):
+        for name, fn in variants:
+            root = os.path.join(base, f"home_{name}_{i}")
+            os.mkdir(root)
+            t0 = time.perf_counter()
+            fn(root)
+            samples[name].append(time.perf_counter() - t0)
+            shutil.rmtree(root)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--template", help="text template file (default: synthetic tree)")
+    parser.add_argument("--entries", type=int, default=400)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--dir", default=tempfile.gettempdir())
+    args = parser.parse_args()
+
+    if args.template:
+        with open(args.template, encoding="utf-8") as f:
+            lines = [L.rstrip() for L in f if L.strip()]
+    else:
+        lines = synthetic_template(args.entries)
+    records = parse_template(lines)
+    plan = plan_template(records)
+    print(f"{len(records)} entries, {len(plan.dirs)} directories")
+
+    base = tempfile.mkdtemp(prefix="home_populate_", dir=args.dir)
+    try:
+        image = os.path.join(base, "image")
+        materialise(plan, image)
+        variants = (
+            ("records", lambda root: build_per_record(records, root)),
+            ("plan", lambda root: materialise(plan, root)),
+            ("cp", lambda root: subprocess.run(
+                ["cp", "-a", "--reflink=auto", "--sparse=always", image + "/.", root], check=True)),
+        )
+        for name, samples in measure(variants, base, args.iterations).items():
+            samples.sort()
+            p50 = statistics.median(samples) * 1e3
+            p95 = samples[int(0.95 * (len(samples) - 1))] * 1e3
+            print(f"{name:>8}: p50 {p50:7.2f} ms  p95 {p95:7.2f} ms")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
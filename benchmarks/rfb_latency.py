@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+rfb_latency.py
+
+Compares input-to-frame round-trip latency of the two FBEnvironment VNC
+transports against a local fake RFB server:
+
+    * vncdotool: api.connect proxy, mouseMove + full refreshScreen
+    * asyncio:   AsyncVNCClient, mouseMove + wait for the incremental update
+
+The fake server (tests/fake_rfb.py, shared with the test suite) needs no
+Docker daemon.
+
+Usage:
+    rfb_latency.py [--clients N] [--iterations N] [--width W] [--height H]
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, __file__.rsplit("/benchmarks/", 1)[0])
+from file_browser_env.rfb import AsyncVNCClient  # noqa: E402
+from tests.fake_rfb import FakeRFBServer  # noqa: E402
+
+
+def bench_asyncio(port, iterations):
+    client = AsyncVNCClient("127.0.0.1", port, timeout=5)
+    fb = client.framebuffer
+    fb.wait_ready(5)
+    samples = []
+    for i in range(iterations):
+        version = fb.version
+        t0 = time.perf_counter()
+        client.mouseMove(10 + i % 400, 10 + i % 300)
+        fb.wait_for_update(version, timeout=5)
+        samples.append(time.perf_counter() - t0)
+    client.disconnect()
+    return samples
+
+
+_connect_lock = threading.Lock()
+
+
+def bench_vncdotool(port, iterations):
+    from vncdotool import api
+    # api.connect starts the shared reactor thread on first use and is not
+    # safe to call concurrently
+    with _connect_lock:
+        client = api.connect(f"127.0.0.1::{port}", timeout=5)
+        client.mouseMove(0, 0)
+    samples = []
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        client.mouseMove(10 + i % 400, 10 + i % 300)
+        client.refreshScreen(False)
+        samples.append(time.perf_counter() - t0)
+    client.disconnect()
+    return samples
+
+
+def report(name, clients, per_client, wall):
+    samples = [s for client in per_client for s in client]
+    samples.sort()
+    p50 = statistics.median(samples) * 1e3
+    p95 = samples[int(0.95 * (len(samples) - 1))] * 1e3
+    print(f"{name:>10}: {clients:3d} clients  p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  "
+          f"{len(samples) / wall:9.1f} round-trips/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--width", type=int, default=500)
+    parser.add_argument("--height", type=int, default=500)
+    args = parser.parse_args()
+
+    server = FakeRFBServer(args.width, args.height).start()
+    try:
+        for name, fn in (("asyncio", bench_asyncio), ("vncdotool", bench_vncdotool)):
+            with ThreadPoolExecutor(args.clients) as pool:
+                t0 = time.perf_counter()
+                per_client = list(pool.map(lambda _: fn(server.port, args.iterations), range(args.clients)))
+                wall = time.perf_counter() - t0
+            report(name, args.clients, per_client, wall)
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
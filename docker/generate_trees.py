@@ -7,18 +7,25 @@ using external word lists (created via LLM prompts) for plausible file names, si
 and detailed music albums with track listings.
 
 Usage:
-    generate_trees.py <count> <output_dir>
+    generate_trees.py <count> <output_dir> [--format txt|jsonl|fbt]
+                      [--workers N] [--shard-size N] [--seed S]
     - count=0: print one tree to stdout
-    - count>0: generate <count> trees as .txt files under <output_dir> (won't overwrite existing)
+    - count>0, --format txt (default): generate <count> trees as .txt files under
+      <output_dir> (won't overwrite existing)
+    - count>0, --format jsonl/fbt: build trees on a process pool and stream them
+      into shard files (shard-00000.jsonl, ...) plus a manifest.json;
+      fbt shards are merged into <output_dir>/corpus.fbt at the end
 """
 
 import os
 import sys
+import time
 import uuid
 import random
 import argparse
 import json
 from datetime import datetime
+from multiprocessing import Pool
 
 # ---------- Helpers for size handling ----------
 
@@ -83,17 +90,24 @@ def load_music_albums():
         print(f"Warning: Music albums JSON not found at {path}", file=sys.stderr)
         return []
 
-# Load all lists
-DOCUMENT_WORDS     = load_word_list('Documents')
-DOWNLOAD_WORDS     = load_word_list('Downloads')
-PICTURE_WORDS      = load_word_list('Pictures')
-VIDEO_WORDS        = load_word_list('Videos')
-MOVIE_WORDS        = load_word_list('Movies')
-EBOOK_WORDS        = load_word_list('EBooks')
-PRESENTATION_WORDS = load_word_list('Presentations')
-SCRIPT_WORDS       = load_word_list('Scripts')
-DESKTOP_WORDS      = load_word_list('Desktop')
-MUSIC_ALBUMS       = load_music_albums()
+# Word lists are loaded on first use (once per process), so printing a
+# single tree or forking workers doesn't pay for every list up front.
+_WORD_LISTS = {}
+_MUSIC_ALBUMS = None
+
+
+def words(category):
+    entries = _WORD_LISTS.get(category)
+    if entries is None:
+        entries = _WORD_LISTS[category] = load_word_list(category)
+    return entries
+
+
+def music_albums():
+    global _MUSIC_ALBUMS
+    if _MUSIC_ALBUMS is None:
+        _MUSIC_ALBUMS = load_music_albums()
+    return _MUSIC_ALBUMS
 
 # Static pools for config & SSH
 CONFIG_APPS = {
@@ -108,8 +122,8 @@ SSH_FILES = ['id_rsa', 'id_rsa.pub', 'known_hosts', 'config']
 def gen_documents():
     tree = {}
     # Flat list of document files
-    count = random.randint(5, min(len(DOCUMENT_WORDS), 20))
-    picks = random.sample(DOCUMENT_WORDS, k=count)
+    count = random.randint(5, min(len(words('Documents')), 20))
+    picks = random.sample(words('Documents'), k=count)
     for name, size in picks:
         tree[name] = parse_size(size) if size else generate_dummy_size(name)
     return tree
@@ -117,8 +131,8 @@ def gen_documents():
 
 def gen_downloads():
     tree = {}
-    count = random.randint(5, min(len(DOWNLOAD_WORDS), 15))
-    picks = random.sample(DOWNLOAD_WORDS, k=count)
+    count = random.randint(5, min(len(words('Downloads')), 15))
+    picks = random.sample(words('Downloads'), k=count)
     for name, size in picks:
         tree[name] = parse_size(size) if size else generate_dummy_size(name)
     return tree
@@ -126,10 +140,11 @@ def gen_downloads():
 
 def gen_music():
     tree = {}
-    if MUSIC_ALBUMS:
+    albums = music_albums()
+    if albums:
         albums = random.sample(
-            MUSIC_ALBUMS,
-            k=random.randint(1, min(5, len(MUSIC_ALBUMS)))
+            albums,
+            k=random.randint(1, min(5, len(albums)))
         )
         ext = random.choice(['.mp3', '.wav', '.m4a'])
         for alb in albums:
@@ -156,8 +171,8 @@ def gen_music():
 def gen_pictures():
     tree = {}
     # top-level picture files
-    top_count = random.randint(5, min(len(PICTURE_WORDS), 50))
-    top_picks = random.sample(PICTURE_WORDS, k=top_count)
+    top_count = random.randint(5, min(len(words('Pictures')), 50))
+    top_picks = random.sample(words('Pictures'), k=top_count)
     for name, size in top_picks:
         tree[name] = parse_size(size) if size else generate_dummy_size(name)
     return tree
@@ -165,7 +180,7 @@ def gen_pictures():
 
 def gen_videos_or_movies(kind):
     tree = {}
-    pool = VIDEO_WORDS if kind == 'Videos' else MOVIE_WORDS
+    pool = words(kind)
     count = random.randint(3, min(len(pool), 10))
     picks = random.sample(pool, k=count)
     for name, size in picks:
@@ -175,8 +190,8 @@ def gen_videos_or_movies(kind):
 
 def gen_ebooks():
     tree = {}
-    count = random.randint(1, min(len(EBOOK_WORDS), 5))
-    picks = random.sample(EBOOK_WORDS, k=count)
+    count = random.randint(1, min(len(words('EBooks')), 5))
+    picks = random.sample(words('EBooks'), k=count)
     for name, size in picks:
         tree[name] = parse_size(size) if size else generate_dummy_size(name)
     return tree
@@ -184,8 +199,8 @@ def gen_ebooks():
 
 def gen_presentations():
     tree = {}
-    count = random.randint(1, min(len(PRESENTATION_WORDS), 5))
-    picks = random.sample(PRESENTATION_WORDS, k=count)
+    count = random.randint(1, min(len(words('Presentations')), 5))
+    picks = random.sample(words('Presentations'), k=count)
     for name, size in picks:
         tree[name] = parse_size(size) if size else generate_dummy_size(name)
     return tree
@@ -193,8 +208,8 @@ def gen_presentations():
 
 def gen_scripts():
     tree = {}
-    count = random.randint(1, min(len(SCRIPT_WORDS), 10))
-    picks = random.sample(SCRIPT_WORDS, k=count)
+    count = random.randint(1, min(len(words('Scripts')), 10))
+    picks = random.sample(words('Scripts'), k=count)
     for name, size in picks:
         tree[name] = parse_size(size) if size else generate_dummy_size(name)
     return tree
@@ -202,9 +217,9 @@ def gen_scripts():
 
 def gen_desktop():
     tree = {}
-    count = random.randint(1, min(len(DESKTOP_WORDS), 10))
-    if DESKTOP_WORDS:
-        picks = random.sample(DESKTOP_WORDS, k=count)
+    count = random.randint(1, min(len(words('Desktop')), 10))
+    if words('Desktop'):
+        picks = random.sample(words('Desktop'), k=count)
     else:
         default = ['todo.txt', 'startup.sh', 'readme.md', 'screenshot.png']
         picks = [(name, None) for name in random.sample(default, k=count)]
@@ -253,7 +268,8 @@ def build_one_tree():
         chosen.add(pick)
 
     tree = {}
-    for key in chosen:
+    # sorted, so a seed reproduces the same tree regardless of hash randomisation
+    for key in sorted(chosen):
         subtree = gens[key]()
         # flatten nested paths for Config/SSH
         if '\n' not in key and key in ('Config','SSH'):
@@ -279,16 +295,127 @@ def render_tree(tree, indent=0):
     return lines
 
 
+# ---------- Sharded corpus builder ----------
+
+def _shard_seed(seed, shard):
+    """Independent, reproducible stream per shard (independent of worker count)."""
+    return None if seed is None else seed * 1_000_003 + shard
+
+
+def _template_store():
+    try:
+        from file_browser_env import template_store
+    except ImportError:
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from file_browser_env import template_store
+    return template_store
+
+
+def _open_writer(path, fmt):
+    if fmt == 'fbt':
+        return _template_store().TemplateStoreWriter(path)
+    return open(path, 'w', encoding='utf-8')
+
+
+def merge_shards(output, shards, store='corpus.fbt'):
+    """Merge .fbt shards, in shard order, into one store FBEnvironment can load; the shards are removed."""
+    ts = _template_store()
+    with ts.TemplateStoreWriter(os.path.join(output, store)) as writer:
+        for info in shards:
+            ts.merge_store(writer, os.path.join(output, info["file"]))
+    for info in shards:
+        os.remove(os.path.join(output, info["file"]))
+    return store
+
+
+def build_shard(job):
+    """Worker: build `count` trees and stream them into one shard file."""
+    shard, count, seed, output, fmt = job
+    random.seed(_shard_seed(seed, shard))
+    fname = f"shard-{shard:05d}.{fmt}"
+    path = os.path.join(output, fname)
+    with _open_writer(path, fmt) as out:
+        for i in range(count):
+            lines = render_tree(build_one_tree())
+            name = f"home_tree_{shard:05d}_{i:06d}"
+            if fmt == 'fbt':
+                out.add_lines(name, lines)
+            else:
+                out.write(json.dumps({"name": name, "tree": "\n".join(lines)}, ensure_ascii=False))
+                out.write("\n")
+    return {"file": fname, "trees": count, "bytes": os.path.getsize(path)}
+
+
+def build_corpus(count, output, fmt='jsonl', workers=None, shard_size=10000, seed=None):
+    """
+    Build `count` trees on a process pool, `shard_size` trees per shard file,
+    and write a manifest.json describing the shards. With fmt='fbt' the
+    shards are then merged into a single corpus.fbt (the manifest's
+    "store"), so the output directory can be passed as `templates`.
+    Returns the manifest.
+    """
+    os.makedirs(output, exist_ok=True)
+    jobs = []
+    for shard, start in enumerate(range(0, count, shard_size)):
+        jobs.append((shard, min(shard_size, count - start), seed, output, fmt))
+
+    workers = workers or os.cpu_count() or 1
+    start = time.time()
+    done = 0
+    shards = []
+    with Pool(processes=min(workers, len(jobs))) as pool:
+        for info in pool.imap_unordered(build_shard, jobs):
+            shards.append(info)
+            done += info["trees"]
+            rate = done / max(time.time() - start, 1e-9)
+            print(f"  {done}/{count} trees ({rate:.0f} trees/s)", file=sys.stderr)
+    elapsed = time.time() - start
+    shards.sort(key=lambda s: s["file"])
+
+    manifest = {
+        "format": fmt,
+        "count": count,
+        "seed": seed,
+        "shard_size": shard_size,
+        "created": datetime.now().isoformat(timespec='seconds'),
+        "elapsed_sec": round(elapsed, 3),
+        "trees_per_sec": round(count / max(elapsed, 1e-9), 1),
+        "shards": shards,
+    }
+    if fmt == 'fbt':
+        t = time.time()
+        manifest["store"] = merge_shards(output, shards)
+        manifest["merge_sec"] = round(time.time() - t, 3)
+    with open(os.path.join(output, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('count', type=int, help="0=print one tree; >0=generate that many files")
-    parser.add_argument('output', nargs='?', help="Output directory for tree files")
+    parser.add_argument('count', type=int, help="0=print one tree; >0=generate that many trees")
+    parser.add_argument('output', nargs='?', help="Output directory for tree files / shards")
+    parser.add_argument('--format', choices=['txt', 'jsonl', 'fbt'], default='txt',
+                        help="txt: one file per tree; jsonl/fbt: sharded archives + manifest")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--shard-size', type=int, default=10000, help="Trees per shard file")
+    parser.add_argument('--seed', type=int, default=None, help="Base seed; each shard derives its own")
     args = parser.parse_args()
 
     if args.count > 0:
         if not args.output:
             print("Error: must specify <output_dir> when count>0", file=sys.stderr)
             sys.exit(1)
+        if args.format != 'txt':
+            manifest = build_corpus(args.count, args.output, args.format,
+                                    args.workers, args.shard_size, args.seed)
+            print(f"Generated {args.count} trees in {len(manifest['shards'])} shards under "
+                  f"'{args.output}' ({manifest['trees_per_sec']:.0f} trees/s)")
+            if 'store' in manifest:
+                print(f"Merged into {os.path.join(args.output, manifest['store'])}")
+            return
+        if args.seed is not None:
+            random.seed(args.seed)
         os.makedirs(args.output, exist_ok=True)
         for _ in range(args.count):
             tree = build_one_tree()
@@ -301,6 +428,8 @@ def main():
                 f.write(text)
         print(f"Generated {args.count} trees in '{args.output}'")
     else:
+        if args.seed is not None:
+            random.seed(args.seed)
         print("\n".join(render_tree(build_one_tree())))
 
 if __name__ == '__main__':
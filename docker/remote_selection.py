@@ -1,20 +1,32 @@
 # remote_location_pipe.py
 
-import gi, os, json, urllib.parse
+import gi, os, json, socket, struct, urllib.parse
+from collections import deque
 gi.require_version("Nautilus", "3.0")
 gi.require_version("Gio",     "2.0")
 from gi.repository import Nautilus, GObject, Gio
 
 class LocationPipeLogger(GObject.GObject, Nautilus.LocationWidgetProvider):
     """
-    1) On each folder change → write {"path":..., "view":...}.
-    2) On any toggle of icon/list → write the SAME for the current path.
+    1) On each folder change → send {"seq":..., "path":..., "view":...}.
+    2) On any toggle of icon/list → send the SAME for the current path.
+
+    Events go over the host's Unix socket (~/.hidden.sock) as 4-byte
+    big-endian length + JSON frames. Frames that cannot be delivered are
+    kept (bounded) and resent on the next connection. Hosts without the
+    socket get one JSON line per event on the legacy FIFO (~/.hidden).
     """
 
+    BACKLOG = 256
+
     def __init__(self):
         super().__init__()
         self.pipe = os.path.join(os.environ['HOME'], ".hidden")
+        self.sock_path = os.path.join(os.environ['HOME'], ".hidden.sock")
         self._last_path = None
+        self._seq = 0
+        self._sock = None
+        self._backlog = deque(maxlen=self.BACKLOG)
 
         # Listen for global view-mode changes
         try:
@@ -33,7 +45,7 @@ class LocationPipeLogger(GObject.GObject, Nautilus.LocationWidgetProvider):
         self._last_path = path
         view = self._get_view_mode()
 
-        self._write_pipe(path, view)
+        self._emit(path, view)
         return None
 
     def _on_view_changed(self, settings, key):
@@ -41,7 +53,7 @@ class LocationPipeLogger(GObject.GObject, Nautilus.LocationWidgetProvider):
         if self._last_path is None:
             return
         view = self._get_view_mode()
-        self._write_pipe(self._last_path, view)
+        self._emit(self._last_path, view)
 
     def _get_view_mode(self):
         # Read the current viewer setting
@@ -51,12 +63,37 @@ class LocationPipeLogger(GObject.GObject, Nautilus.LocationWidgetProvider):
         except Exception:
             return "unknown"
 
-    def _write_pipe(self, path, view):
-        msg = json.dumps({"path": path, "view": view})
+    def _emit(self, path, view):
+        msg = {"seq": self._seq, "path": path, "view": view}
+        self._seq += 1
+        if os.path.exists(self.sock_path):
+            self._send_socket(msg)
+        else:
+            self._write_pipe(msg)
+
+    def _send_socket(self, msg):
+        payload = json.dumps(msg).encode("utf-8")
+        self._backlog.append(struct.pack(">I", len(payload)) + payload)
+        try:
+            if self._sock is None:
+                s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                # never stall the Nautilus UI on a wedged host
+                s.settimeout(0.5)
+                s.connect(self.sock_path)
+                self._sock = s
+            while self._backlog:
+                self._sock.sendall(self._backlog[0])
+                self._backlog.popleft()
+        except OSError:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+
+    def _write_pipe(self, msg):
         try:
             fd = os.open(self.pipe, os.O_WRONLY | os.O_NONBLOCK)
             with os.fdopen(fd, "w") as f:
-                f.write(msg + "\n")
+                f.write(json.dumps(msg) + "\n")
         except (FileNotFoundError, BlockingIOError):
             pass
         except Exception:
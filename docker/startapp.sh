@@ -1,5 +1,12 @@
 #!/usr/bin/env bash
 
+# Boot-time breakdown: one "<phase> <epoch seconds>" line per step, read by
+# FBEnvironment.get_boot_breakdown() ($EPOCHREALTIME needs no fork); every
+# run of this script (the first boot and each restart) begins with "start"
+BOOT_LOG=/tmp/fb-boot.log
+boot_mark() { echo "$1 ${EPOCHREALTIME:-$(date +%s.%N)}" >> "$BOOT_LOG"; }
+boot_mark start
+
 # 1) Determine the home‐folder name
 USERNAME="${USER_NAME:-user}"
 export HOME="/home/${USERNAME}"
@@ -11,6 +18,12 @@ export XDG_CACHE_HOME=/tmp/xdg-cache
 export XDG_STATE_HOME=/tmp/xdg-state
 export XDG_DATA_HOME=/tmp/xdg-data
 export XDG_RUNTIME_DIR=/tmp/xdg-runtime
+# Extra themes from the host are mounted under /usr/local/share
+case ":${XDG_DATA_DIRS:=/usr/local/share:/usr/share}:" in
+  *:/usr/local/share:*) ;;
+  *) XDG_DATA_DIRS="/usr/local/share:$XDG_DATA_DIRS" ;;
+esac
+export XDG_DATA_DIRS
 
 # Ensure they exist
 mkdir -p \
@@ -20,19 +33,24 @@ mkdir -p \
   "$XDG_DATA_HOME" \
   "$XDG_RUNTIME_DIR"
 
-# 1) Sidebar toggle
-if [ "${SIDEBAR_HIDDEN:-true}" = "true" ]; then
-  gsettings set org.gnome.nautilus.window-state start-with-sidebar false
-else
-  gsettings set org.gnome.nautilus.window-state start-with-sidebar true
-fi
+boot_mark xdg
 
-# 2) Randomly pick list or icon view
-if [ "${ICONVIEW:-true}" = "true" ]; then
-  gsettings set org.gnome.nautilus.preferences default-folder-viewer icon-view
+# 1) Sidebar toggle and 2) list or icon view
+if [ "${SIDEBAR_HIDDEN:-true}" = "true" ]; then SIDEBAR=false; else SIDEBAR=true; fi
+if [ "${ICONVIEW:-true}" = "true" ]; then VIEW=icon-view; else VIEW=list-view; fi
+
+# The image bakes one compiled dconf database per combination, so picking
+# one is a single environment override instead of gsettings forks. The
+# profile reads the user db first, and /tmp survives a container restart:
+# drop what the previous run wrote so the baked defaults apply
+if [ -f "/etc/dconf/profile/fb-$SIDEBAR-$VIEW" ]; then
+  rm -f "$XDG_CONFIG_HOME/dconf/user"
+  export DCONF_PROFILE="fb-$SIDEBAR-$VIEW"
 else
-  gsettings set org.gnome.nautilus.preferences default-folder-viewer list-view
+  gsettings set org.gnome.nautilus.window-state start-with-sidebar $SIDEBAR
+  gsettings set org.gnome.nautilus.preferences default-folder-viewer $VIEW
 fi
+boot_mark dconf
 
 # ─── seed bookmarks into XDG_CONFIG_HOME only ────────────────
 mkdir -p "$XDG_CONFIG_HOME/gtk-3.0"
@@ -41,32 +59,39 @@ IFS=',' read -ra BMLIST <<< "${BOOKMARKS:-Documents}"
 for d in "${BMLIST[@]}"; do
   echo "file://$HOME/$d    $d" >> "$XDG_CONFIG_HOME/gtk-3.0/bookmarks"
 done
+boot_mark bookmarks
 
 # ────────────────────────────────────────────────────────────────
-# Gather all GTK themes (dirs with an index.theme inside)
-mapfile -t GTK_THEMES < <(
-  for d in /usr/share/themes/*/; do
-    [ -f "${d}index.theme" ] && basename "$d"
-  done
-)
-
-# Gather all icon themes (same logic under /usr/share/icons)
-mapfile -t ICON_THEMES < <(
-  for d in /usr/share/icons/*/; do
-    [ -f "${d}index.theme" ] && basename "$d"
-  done
-)
-# ────────────────────────────────────────────────────────────────
-  
-if [ "${#GTK_THEMES[@]}" -gt 0 ]; then
-  CHOSEN_GTK="${GTK_THEMES[RANDOM % ${#GTK_THEMES[@]}]}"
-  echo "🔧 Setting GTK theme to: $CHOSEN_GTK" >&2
-fi
+# The host picks the themes from its pre-scanned list (theme bundle index)
+# and passes them in; only scan the theme directories when it did not
+if [ -n "${GTK_THEME_NAME+set}" ]; then
+  CHOSEN_GTK="$GTK_THEME_NAME"
+  CHOSEN_ICON="$ICON_THEME_NAME"
+else
+  # Gather all GTK themes (dirs with an index.theme inside), the image's
+  # own and the ones mounted from the host
+  mapfile -t GTK_THEMES < <(
+    for d in /usr/share/themes/*/ /usr/local/share/themes/*/; do
+      [ -f "${d}index.theme" ] && basename "$d"
+    done
+  )
+
+  # Gather all icon themes (same logic under .../share/icons)
+  mapfile -t ICON_THEMES < <(
+    for d in /usr/share/icons/*/ /usr/local/share/icons/*/; do
+      [ -f "${d}index.theme" ] && basename "$d"
+    done
+  )
+
+  if [ "${#GTK_THEMES[@]}" -gt 0 ]; then
+    CHOSEN_GTK="${GTK_THEMES[RANDOM % ${#GTK_THEMES[@]}]}"
+  fi
 
-if [ "${#ICON_THEMES[@]}" -gt 0 ]; then
-  CHOSEN_ICON="${ICON_THEMES[RANDOM % ${#ICON_THEMES[@]}]}"
-  echo "🔧 Setting Icon theme to: $CHOSEN_ICON" >&2
+  if [ "${#ICON_THEMES[@]}" -gt 0 ]; then
+    CHOSEN_ICON="${ICON_THEMES[RANDOM % ${#ICON_THEMES[@]}]}"
+  fi
 fi
+echo "🔧 Setting GTK theme to: $CHOSEN_GTK, icon theme to: $CHOSEN_ICON" >&2
 # ────────────────────────────────────────────────────────────────
 
 export GTK_THEME="$CHOSEN_GTK"
@@ -75,12 +100,14 @@ cat > "$HOME/.config/gtk-3.0/settings.ini" <<EOF
 [Settings]
 gtk-icon-theme-name=$CHOSEN_ICON
 EOF
+boot_mark themes
 
 
 # 3) Launch Nautilus pointed at /workspace
 nautilus -q || true
 while true; do
   echo "[`date`] Starting Nautilus on $HOME" >&2
+  boot_mark exec
   exec dbus-launch --exit-with-session nautilus --no-desktop "$HOME"
   echo "[`date`] Nautilus exited; restarting in 1s…" >&2
   sleep 1
@@ -1 +1,7 @@
 from .env import FBEnvironment, FBGymEnv
+from .pool import FBEnvironmentPool
+from .vector import FBVectorEnv
+from .tree_snapshot import TreeSnapshot, TreeDiff
+from .shm import SharedObservationRing
+from .event_log import EventLog, EventRecord, read_spill
+from .themes import ThemeBundle
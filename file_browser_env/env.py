@@ -1,15 +1,30 @@
+import atexit
 from threading import Thread, Condition
 import docker
 from docker.errors import NotFound
-from ipaddress import ip_network
 import os
 import tempfile
 import shutil
 import threading
-import subprocess
 import yaml
+import copy
 import uuid
 from vncdotool import api
+from .framebuffer import FramebufferFactory, RegionCaptureFactory
+from .rfb import AsyncVNCClient
+from .readiness import FrameReadiness
+from .tree_watch import DirectoryTreeWatcher, DEFAULT_IGNORE
+from .observation import ObservationProcessor
+from .shm import SharedObservationRing
+from .lifecycle import ContainerSpec, make_backend
+from .events import NavigationEventChannel
+from .event_log import EventLog
+from .settle import FrameSettler, SettleHistogram
+from .ipam import SubnetAllocator, AddressPoolExhausted
+from .leases import HostLeaseAllocator
+from .home_snapshot import TemplateCache, parse_template
+from .template_store import TemplateStore, corpus_store, render_tree
+from .themes import ThemeBundle, build_bundle, fetch_sources
 import io
 import numpy as np
 from pathlib import Path
@@ -17,7 +32,6 @@ import json
 import pkg_resources
 import gymnasium as gym
 from gymnasium import spaces
-import random
 from urllib.parse import urlparse
 
 import string
@@ -27,54 +41,126 @@ import threading
 
 import time
 
-import re
+import socket
+from concurrent.futures import ThreadPoolExecutor
 
 
 class FBEnvironmentException(Exception):
     """Exception raised when maximum number of environments are created."""
     pass
 
+class _LazyDockerClient:
+    """
+    Class attribute that connects to Docker on first use rather than at
+    import time, so the package (its RFB client, template and theme tools,
+    benchmarks) can be imported on hosts without a Docker daemon.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    def __get__(self, obj, owner=None):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = docker.from_env()
+        return self._client
+
+
 class FBEnvironment:
-    _docker_client = docker.from_env()
+    _docker_client = _LazyDockerClient()
     _network_name = None
-    _available_ips = []
+    _allocators = {}  # subnet -> SubnetAllocator (addresses over one or more bridges)
     _lock = threading.Lock()  # For thread safety when managing IPs
     _initialized = False
+    _init_lock = threading.Lock()  # One-time network setup / cleanup
+    _adoptable = {}  # subnet -> healthy containers left by a previous run, not yet reattached
+    # Seconds an adoptable container may stay unclaimed before it is removed
+    ADOPT_GRACE = 300.0
+
+    # Labels every container carries so a later process can reattach it
+    _ADOPT_LABELS = ("fb_env.homedir", "fb_env.width", "fb_env.height",
+                     "fb_env.username", "fb_env.ip", "fb_env.network")
+    _themes_lock = threading.Lock()  # Theme repos are cloned into a shared dir
+    _legacy_bundle = None  # bundle built from ~/.nautilus_extra_themes, checked once
     _subnet = None
     
     # Class-level dictionary to map IP addresses to instances
     _instances = {}
 
-    # Create Docker network and IP pool on the first instantiation
+    # Parsed compose-fb.yaml, loaded once per process
+    _compose_template = None
+    _template_stores = {}     # .fbt path -> TemplateStore
+    _template_listings = {}   # templates dir -> (mtime, sorted file names)
+
+    @classmethod
+    def _load_compose_template(cls, compose_file):
+        """Return a private copy of the parsed compose template."""
+        with cls._lock:
+            if cls._compose_template is None:
+                with open(compose_file, "r") as file:
+                    cls._compose_template = yaml.safe_load(file)
+        return copy.deepcopy(cls._compose_template)
+
+    # Create Docker networks on demand, as the address allocator grows
     @classmethod
-    def _initialize_network(cls, ip_range="172.20.0.0/24"):
-        """Initialize Docker network and populate available IP list."""
+    def _initialize_network(cls, ip_range="172.20.0.0/24", name=None):
+        """Load or create one bridge network."""
+        name = name or cls._network_name
         try:
-            print(f"Loading network {cls._network_name}")
-            cls._docker_client.networks.get(cls._network_name)
+            print(f"Loading network {name}")
+            cls._docker_client.networks.get(name)
         except NotFound:
-            print(f"Not found. Making new network {cls._network_name}")
+            print(f"Not found. Making new network {name}")
             # Create the network with a specified subnet
             cls._docker_client.networks.create(
-                cls._network_name,
+                name,
                 driver="bridge",
                 ipam=docker.types.IPAMConfig(
                     pool_configs=[docker.types.IPAMPool(subnet=ip_range)]
                 )
             )
 
-        # Generate list of available IPs from subnet, excluding gateway (.1)
-        cls._available_ips = [str(ip) for ip in ip_network(ip_range).hosts()][1:]
-
 
     @classmethod
-    def _cleanup_existing_containers(cls):
-        """Stop and remove all containers created by previous runs of this script."""
+    def _cleanup_existing_containers(cls, subnet=None, max_workers=8, keep=None, adopt=False):
+        """
+        Stop and remove all containers created by previous runs of this script.
+
+        :param keep: optional callable returning container names to leave
+                     alone (leases of other live processes). It is called
+                     after listing, so a container created meanwhile is
+                     already covered by its lease.
+        :param adopt: probe the containers first and only remove the broken
+                      ones; healthy ones are returned for reattachment.
+        """
+        subnet = FBEnvironment._subnet if subnet is None else subnet
         containers = cls._docker_client.containers.list(
             all=True,
-            filters={"label": f"created_by=FBEnvironment{FBEnvironment._subnet}"}
+            filters={"label": f"created_by=FBEnvironment{subnet}"}
         )
-        for container in containers:
+        if keep is not None:
+            live = keep()
+            containers = [c for c in containers if c.name not in live]
+
+        healthy = []
+        if adopt and containers:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(containers))) as pool:
+                probes = list(pool.map(cls._probe_container, containers))
+            healthy = [c for c, reason in zip(containers, probes) if reason is None]
+            for c, reason in zip(containers, probes):
+                if reason is not None:
+                    print(f"[FBEnvironment] not adopting {c.name}: {reason}")
+            containers = [c for c, reason in zip(containers, probes) if reason is not None]
+            print(f"[FBEnvironment] adopting {len(healthy)} healthy containers, removing {len(containers)}")
+
+        cls._remove_containers(containers, max_workers)
+        return healthy
+
+    @staticmethod
+    def _remove_containers(containers, max_workers=8):
+        def remove(container):
             try:
                 container.stop()
                 container.remove()
@@ -82,33 +168,240 @@ class FBEnvironment:
             except Exception as e:
                 print(f"Failed to remove container {container.id}: {e}")
 
-    def __init__(self, height, width, templates=None, subnet=20, send_pipe=None, recv_pipe=None, child_mode=False, static_ip=None, onNavigate=None, username="user"):
+        if containers:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(containers))) as pool:
+                list(pool.map(remove, containers))
+
+    @classmethod
+    def _probe_container(cls, container, timeout=2.0):
+        """Return None if `container` can be reattached, else the reason it cannot."""
+        labels = container.labels
+        missing = [k for k in cls._ADOPT_LABELS if k not in labels]
+        if missing:
+            return f"missing labels {missing}"
+        if container.status != "running":
+            return f"status {container.status}"
+        if not os.path.isdir(labels["fb_env.homedir"]):
+            return "home directory is gone"
+        try:
+            with socket.create_connection((labels["fb_env.ip"], 5900), timeout=timeout) as sock:
+                sock.settimeout(timeout)
+                if not sock.recv(12).startswith(b"RFB "):
+                    return "VNC server sent no RFB banner"
+        except OSError as e:
+            return f"VNC unreachable ({e})"
+        try:
+            if container.exec_run(["pgrep", "-x", "nautilus"]).exit_code != 0:
+                return "Nautilus is not running"
+        except Exception as e:
+            return f"exec failed ({e})"
+        return None
+
+    @classmethod
+    def _claim_adoptable(cls, subnet, width, height, username):
+        """Take one adoptable container with matching geometry and user, or None."""
+        with cls._init_lock:
+            candidates = cls._adoptable.get(subnet, [])
+            for i, container in enumerate(candidates):
+                labels = container.labels
+                if (labels["fb_env.width"], labels["fb_env.height"], labels["fb_env.username"]) == \
+                        (str(width), str(height), username):
+                    return candidates.pop(i)
+        return None
+
+    @classmethod
+    def _remove_reclaimed(cls, allocator):
+        """Remove the containers of dead processes whose leases `allocator` reclaimed; each name is taken once."""
+        for name in allocator.take_reclaimed():
+            try:
+                cls._docker_client.api.remove_container(name, force=True)
+                print(f"Removed container {name} of a dead process")
+            except Exception:
+                pass
+
+    @classmethod
+    def reap_adoptable(cls, subnet=None, max_workers=8):
+        """
+        Remove the adoptable containers of `subnet` (default: every subnet)
+        that no instance has claimed, and release their addresses. Runs on
+        its own `ADOPT_GRACE` seconds after start-up, in `close_all()` and
+        at exit. Returns how many containers were removed.
+        """
+        with cls._init_lock:
+            subnets = list(cls._adoptable) if subnet is None else [subnet]
+            unclaimed = [(s, c) for s in subnets for c in cls._adoptable.pop(s, [])]
+        if not unclaimed:
+            return 0
+        print(f"[FBEnvironment] removing {len(unclaimed)} unclaimed adoptable containers")
+        cls._remove_containers([c for _, c in unclaimed], max_workers)
+        for s, container in unclaimed:
+            cls._allocators[s].release(container.labels["fb_env.ip"])
+        return len(unclaimed)
+
+    @classmethod
+    def _ensure_initialized(cls, subnet, child_mode=False, max_networks=16, shared=False, adopt=False):
+        """
+        Perform one-time cleanup of existing containers and network setup
+        for `subnet`; returns its address allocator.
+
+        Each subnet gets 172.<subnet>.0.0/16, handed out in /24 bridges
+        (the first is the original 172.<subnet>.0.0/24); further bridges
+        are created only once the existing ones are full.
+
+        With `shared`, addresses are leased through a host-wide state file
+        (HostLeaseAllocator), so independent worker processes can share a
+        subnet: cleanup then only removes containers no live process holds.
+
+        With `adopt`, healthy containers of a previous run are kept (their
+        addresses reserved) and handed to new instances created with
+        `adopt=True`; only broken ones are removed. Those still unclaimed
+        after `ADOPT_GRACE` seconds are removed too (see reap_adoptable).
+        """
+        with cls._init_lock:
+            allocator = cls._allocators.get(subnet)
+            if allocator is not None:
+                return allocator
+            if cls._subnet is None:
+                cls._subnet = subnet
+                cls._network_name = f"browser_environment_network_{subnet}"
+
+            allocator = (HostLeaseAllocator if shared else SubnetAllocator)(
+                f"browser_environment_network_{subnet}",
+                f"172.{subnet}.0.0/16",
+                lambda name, cidr: cls._initialize_network(ip_range=cidr, name=name),
+                max_networks=max_networks,
+            )
+            if not child_mode:
+                healthy = cls._cleanup_existing_containers(
+                    subnet, keep=allocator.live_owners if shared else None, adopt=adopt)
+                allocator.initialize()
+                for container in healthy:
+                    allocator.reserve(container.labels["fb_env.ip"], owner=container.name)
+                cls._adoptable[subnet] = healthy
+                if healthy:
+                    reaper = threading.Timer(cls.ADOPT_GRACE, cls.reap_adoptable, args=(subnet,))
+                    reaper.daemon = True
+                    reaper.start()
+                    atexit.register(cls.reap_adoptable, subnet)
+                # cleanup already dealt with every container of a dead process
+                allocator.take_reclaimed()
+
+            cls._allocators[subnet] = allocator
+            cls._initialized = True
+            return allocator
+
+    @classmethod
+    def spawn_many(cls, n, height, width, max_workers=8, wait_ready=True, **kwargs):
+        """
+        Start `n` environments concurrently on a bounded worker pool.
+
+        Cleanup and network setup run once up front; containers are then
+        launched in parallel and (with `wait_ready`) every VNC endpoint is
+        waited on in parallel until it serves a usable frame. If any
+        launch fails, the environments that did start are closed again and
+        the first error is raised.
+
+        Returns `(envs, timings)`, where `timings` holds the seconds spent
+        in each phase: "init", "launch", "vnc_ready" and "total".
+        """
+        timings = {}
+        start = time.time()
+
+        t = time.time()
+        cls._ensure_initialized(kwargs.get("subnet", 20), kwargs.get("child_mode", False),
+                                kwargs.get("max_networks", 16), kwargs.get("shared_allocator", False),
+                                kwargs.get("adopt", False))
+        timings["init"] = time.time() - t
+
+        def launch(_):
+            try:
+                return cls(height, width, **kwargs)
+            except Exception as e:
+                return e
+
+        t = time.time()
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, n))) as pool:
+            results = list(pool.map(launch, range(n)))
+        timings["launch"] = time.time() - t
+
+        envs = [r for r in results if isinstance(r, FBEnvironment)]
+        errors = [r for r in results if not isinstance(r, FBEnvironment)]
+        if errors:
+            cls.close_all(envs, max_workers=max_workers)
+            raise errors[0]
+
+        t = time.time()
+        if wait_ready and envs:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, n))) as pool:
+                list(pool.map(lambda env: env.getScreen(), envs))
+        timings["vnc_ready"] = time.time() - t
+
+        timings["total"] = time.time() - start
+        print(f"[FBEnvironment] spawned {n} environments: " +
+              ", ".join(f"{k} {v:.1f}s" for k, v in timings.items()))
+        return envs, timings
+
+    @classmethod
+    def close_all(cls, envs=None, max_workers=8):
+        """
+        Close `envs` (default: every live instance in this process, plus
+        any adoptable containers nobody claimed) concurrently. Returns the
+        seconds it took.
+        """
+        start = time.time()
+        if envs is None:
+            envs = list(cls._instances.values())
+            cls.reap_adoptable(max_workers=max_workers)
+        if envs:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(envs)))) as pool:
+                list(pool.map(lambda env: env.close(), envs))
+        return time.time() - start
+
+    def __init__(self, height, width, templates=None, subnet=20, send_pipe=None, recv_pipe=None, child_mode=False, static_ip=None, onNavigate=None, username="user", persistent_framebuffer=False, vnc_backend="vncdotool", backend="compose", seed=None, event_log_size=4096, event_log_path=None, settle_quiet=0.05, settle_idle=0.15, settle_deadline=1.0, max_networks=16, shared_allocator=False, adopt=False, theme_bundle=None):
         """Initialize the environment, start Docker container, and assign an IP."""
 
         compose_file = Path(pkg_resources.resource_filename('browser_env', 'compose-fb.yaml'))
         
         self.subnet = subnet
-        self._log = ""
+
+        # Bounded ring of navigation events (optionally spilled to disk);
+        # FBGymEnv keeps `step_index` current so records carry the step
+        self.event_log = EventLog(event_log_size, spill_path=event_log_path)
+        self.episode = 0
+        self.step_index = 0
 
 
         # Perform one-time cleanup of existing containers
-        if not FBEnvironment._initialized:
-            FBEnvironment._subnet = self.subnet
-            FBEnvironment._network_name = f"browser_environment_network_{self.subnet}"
-            if not child_mode:
-                FBEnvironment._cleanup_existing_containers()
-                FBEnvironment._initialize_network(ip_range=f"172.{self.subnet}.0.0/24")
-            
-            FBEnvironment._initialized = True
-
-        if static_ip is None:
-            # Acquire lock to safely assign IP
-            with FBEnvironment._lock:
-                if not FBEnvironment._available_ips:
-                    raise FBEnvironmentException("Maximum number of environments created")
-                self.ip_address = FBEnvironment._available_ips.pop(0)
+        self._allocator = FBEnvironment._ensure_initialized(self.subnet, child_mode, max_networks, shared_allocator, adopt)
+
+        # Reattach a healthy container left by a previous run (same size and
+        # user) instead of starting a new one; its address is already reserved
+        adopted = FBEnvironment._claim_adoptable(self.subnet, width, height, username) if adopt else None
+        self.adopted = adopted is not None
+
+        if adopted is not None:
+            labels = adopted.labels
+            self.project_name = labels.get("com.docker.compose.project", adopted.name)
+            self.container_name = adopted.name
+            self.ip_address = labels["fb_env.ip"]
+            self.network_name = labels["fb_env.network"]
+            print(f"[FBEnvironment] adopted {adopted.name} at {self.ip_address}")
         else:
-            self.ip_address = static_ip
+            # Generate a unique project name to isolate this instance
+            self.project_name = f"browser_env_{uuid.uuid4().hex[:8]}"
+            self.container_name = f"{self.project_name}_fb_service_1"
+
+            if static_ip is None:
+                try:
+                    self.ip_address, self.network_name = self._allocator.acquire(owner=self.container_name)
+                except AddressPoolExhausted as e:
+                    raise FBEnvironmentException(f"Maximum number of environments created ({e})")
+            else:
+                self.ip_address = static_ip
+                self.network_name = self._allocator.reserve(static_ip, owner=self.container_name)
+
+        # Containers of crashed workers whose leases were just reclaimed
+        FBEnvironment._remove_reclaimed(self._allocator)
 
         # Store the instance in the class-level dictionary
         FBEnvironment._instances[self.ip_address] = self
@@ -122,10 +415,21 @@ class FBEnvironment:
         self.username       = username
         self.container_home = f"/home/{self.username}"
 
+        # Every random decision (template, mtimes, sidebar, bookmarks, themes,
+        # task) is drawn from this generator, so a seed reproduces an episode.
+        self.np_random = np.random.default_rng(seed)
+
         #  A) Create a fresh host‐side folder and populate it:
-        self.homedir = tempfile.mkdtemp(prefix="fb_env_")
-        self.templates = os.path.abspath(templates) if (templates and os.path.isdir(templates)) else None
-        self._populate_random_files(self.homedir, self.templates)
+        self.templates = os.path.abspath(templates) if (templates and os.path.exists(templates)) else None
+        if adopted is not None:
+            # the mounted home is reused; reset() below repopulates it
+            self.homedir = adopted.labels["fb_env.homedir"]
+        else:
+            self.homedir = tempfile.mkdtemp(prefix="fb_env_")
+            self._populate_random_files(self.homedir, self.templates)
+
+        # Cached directory-tree model, only re-read where inotify saw changes
+        self._tree_watcher = DirectoryTreeWatcher(self.homedir)
 
         self.width = width
         self.height = height
@@ -133,39 +437,53 @@ class FBEnvironment:
         self.isMouseDown = False
 
         self.vnc_client = None
+        # "vncdotool" (Twisted reactor thread) or "asyncio" (shared event loop)
+        if vnc_backend not in ("vncdotool", "asyncio"):
+            raise FBEnvironmentException(f"Unknown VNC backend {vnc_backend!r}")
+        self.vnc_backend = vnc_backend
+        # Mirror the remote screen locally from incremental updates instead
+        # of capturing the full region on every observation; the asyncio
+        # backend always works this way
+        self.persistent_framebuffer = persistent_framebuffer or vnc_backend == "asyncio"
 
         self.TOOLBAR_MARGIN = 0
 
-        # Generate a unique project name to isolate this instance
-        self.project_name = f"browser_env_{uuid.uuid4().hex[:8]}"
+        # Black-frame check; skipped once warm until the next reset()
+        self._readiness = FrameReadiness()
+
+        # Host-side start-up timestamps for get_boot_breakdown()
+        self._boot_marks = {}
+
+        # Adaptive post-action settling (VNC update traffic + nav events)
+        self._settler = FrameSettler(settle_quiet, settle_idle, settle_deadline)
+        self.settle_stats = SettleHistogram()
 
-        # Create the FIFO for navigation events
+        # "compose" (docker-compose CLI) or "sdk" (Docker SDK, no compose files)
+        self._backend = make_backend(backend, FBEnvironment._docker_client)
+
+        # Navigation events: the extension streams them over a Unix socket in
+        # the shared home; the FIFO stays for images with the older extension
         self.pipe_path = os.path.join(self.homedir, ".hidden")
-        try:
-            os.mkfifo(self.pipe_path)
-        except FileExistsError:
-            pass
+        self.sock_path = os.path.join(self.homedir, ".hidden.sock")
 
         # Store optional callback
         self.onNavigate = onNavigate
 
         # Start background listener thread
-        self._stop_pipe = threading.Event()
-        t = threading.Thread(target=self._pipe_listener, daemon=True)
-        t.start()
+        self._events = NavigationEventChannel(self.sock_path, self.pipe_path, on_event=self._on_nav_event)
 
         # Modify the compose file to set the correct volumes, IP address, and exposed ports
-        with open(compose_file, "r") as file:
-            self.compose_data = yaml.safe_load(file)
+        self.compose_data = FBEnvironment._load_compose_template(compose_file)
     
-        self._fetch_and_bind_extra_themes()
+        with FBEnvironment._themes_lock:
+            self._fetch_and_bind_extra_themes(theme_bundle or os.environ.get("FB_ENV_THEME_BUNDLE"))
 
         self.compose_data['version'] = '3.7'
 
         # Apply environment-specific configurations to the compose file data
         self.compose_data['services']['fb_service'].update({
             "networks": {
-                FBEnvironment._network_name: {
+                self.network_name: {
                     "ipv4_address": self.ip_address
                 }
             },
@@ -174,13 +492,20 @@ class FBEnvironment:
             ],
             "expose": ["5900"],  # Expose port 5901 for VNC
             "labels": {  # Add label to identify containers created by this script
-                "created_by": f"FBEnvironment{self.subnet}"
+                "created_by": f"FBEnvironment{self.subnet}",
+                # what a later process needs to reattach it (adopt=True)
+                "fb_env.homedir":  self.homedir,
+                "fb_env.width":    str(self.width),
+                "fb_env.height":   str(self.height),
+                "fb_env.username": self.username,
+                "fb_env.ip":       self.ip_address,
+                "fb_env.network":  self.network_name,
             }
         })
 
         # 1) Randomly hide or show sidebar
-        self.hide_sidebar = random.choice(["true","false"])
-        self._lastKnownViewMode = random.choice(["icon-view","list-view"])
+        self.hide_sidebar = self._choice(["true","false"])
+        self._lastKnownViewMode = self._choice(["icon-view","list-view"])
 
         # 2) Pick 2–4 random standard folders for bookmarks, but only those that actually exist
         options = ["Documents", "Desktop", "Downloads", "Music", "Pictures", "Videos", "Templates"]
@@ -190,12 +515,17 @@ class FBEnvironment:
             if os.path.isdir(os.path.join(self.homedir, d))
         ]
         if existing:
-            count  = random.randint(2, min(4, len(existing)))
-            chosen = random.sample(existing, count)
+            count  = self._randint(2, min(4, len(existing)))
+            chosen = self._sample(existing, count)
         else:
             chosen = []
         bm_str = ",".join(chosen)
 
+        # Themes come from the host's pre-scanned list, so the container
+        # does not have to scan its theme directories on boot
+        gtk_theme  = self._choice(self._gtk_themes) if self._gtk_themes else ""
+        icon_theme = self._choice(self._icon_themes) if self._icon_themes else ""
+
         # 3) Inject into the container’s env
         self.compose_data['services']['fb_service']['environment'].update({
             "VNC_PASSWORD":     "12345",
@@ -209,36 +539,40 @@ class FBEnvironment:
             "SIDEBAR_HIDDEN":   self.hide_sidebar,
             "ICONVIEW":   "true" if self._lastKnownViewMode == "icon-view" else "false",
             "BOOKMARKS":        bm_str,
+            "GTK_THEME_NAME":   gtk_theme,
+            "ICON_THEME_NAME":  icon_theme,
         })
 
         self.compose_data['networks'] = {}
-        self.compose_data['networks'][FBEnvironment._network_name] = {
+        self.compose_data['networks'][self.network_name] = {
             'external': True
         }
         
         
-        # Write modified compose data to a temporary file for this instance
-        self.modified_compose_file = tempfile.NamedTemporaryFile(delete=False, suffix=".yaml")
-        with open(self.modified_compose_file.name, 'w') as file:
-            yaml.dump(self.compose_data, file)
+        self.container_spec = ContainerSpec(
+            self.container_name,
+            self.project_name,
+            self.compose_data['services']['fb_service'],
+            self.network_name,
+            self.ip_address,
+            compose_data=self.compose_data,
+        )
 
-        self.modified_compose_file.close()
-        # Start the container with the modified compose file and unique project name
+        # Start the container
         try:
-            subprocess.run(
-                ["docker-compose", "-f", self.modified_compose_file.name, "up", "-d"],
-                check=True,
-                env=dict(os.environ, COMPOSE_PROJECT_NAME=self.project_name)
-            )
-        except subprocess.CalledProcessError as e:
-            # Return IP to pool and clean up temp dir if container fails to start
-            with FBEnvironment._lock:
-                FBEnvironment._available_ips.append(self.ip_address)
+            if adopted is not None:
+                self._backend.adopt(self.container_spec)
+            else:
+                self._boot_marks["up_start"] = time.time()
+                self._backend.up(self.container_spec)
+                self._boot_marks["up_end"] = time.time()
+        except Exception as e:
+            # Return IP to pool if container fails to start
+            self._allocator.release(self.ip_address)
                 
             # Remove the instance from the class-level dictionary
             FBEnvironment._instances.pop(self.ip_address, None)
-
-            os.remove(self.modified_compose_file.name)
+            self._closed = True
             raise e
         
         self._latest_screen = None
@@ -248,7 +582,12 @@ class FBEnvironment:
         if self.onNavigate:
             self.onNavigate("", "icon")
 
-        self._generate_instruction()
+        if adopted is not None:
+            # fresh tree, task and preferences in the running container
+            self.reset()
+            self.episode = 0
+        else:
+            self._generate_instruction()
 
     def update_sidebar_bookmarks(self, bookmarks):
         """
@@ -280,19 +619,40 @@ class FBEnvironment:
 
         # 2) Tell Nautilus to reload by quitting—it will restart via your loop
         container = FBEnvironment._docker_client.containers.get(
-            f"{self.project_name}_fb_service_1"
+            self.container_name
         )
         # `nautilus -q` cleanly quits, your startapp.sh will bring it back
         container.exec_run(["nautilus", "-q"], user=f"{self.uid}:{self.gid}")
 
-    def reset(self):
+    def _choice(self, seq):
+        return seq[int(self.np_random.integers(len(seq)))]
+
+    def _randint(self, a, b):
+        """Random integer in [a, b], like random.randint."""
+        return int(self.np_random.integers(a, b + 1))
+
+    def _sample(self, seq, k):
+        return [seq[i] for i in self.np_random.choice(len(seq), size=k, replace=False)]
+
+    def reset(self, seed=None):
         """
         Wipe & re-populate home; then randomly re-theme Nautilus,
         re-seed the sidebar and pick view/sidebar preferences.
+
+        :param seed: re-seed this instance's generator first, so the episode
+                     (template, mtimes, view, bookmarks, themes, task) is
+                     reproducible.
         """
+        if seed is not None:
+            self.np_random = np.random.default_rng(seed)
+        self._readiness.mark_cold()
+        self.episode += 1
+        self.step_index = 0
+
         # --- 1) wipe out everything under homedir except our pipe
+        keep = {os.path.basename(self.pipe_path), os.path.basename(self.sock_path)}
         for name in os.listdir(self.homedir):
-            if name == os.path.basename(self.pipe_path):
+            if name in keep:
                 continue
             path = os.path.join(self.homedir, name)
             try:
@@ -309,12 +669,12 @@ class FBEnvironment:
 
         # --- 3) pick sidebar/view/bookmarks exactly as before
         # --- 3) pick sidebar/bookmarks/view preferences
-        self.hide_sidebar      = random.choice(["true","false"])
-        self._lastKnownViewMode = random.choice(["icon-view","list-view"])
+        self.hide_sidebar      = self._choice(["true","false"])
+        self._lastKnownViewMode = self._choice(["icon-view","list-view"])
 
         opts     = ["Documents","Desktop","Downloads","Music","Pictures","Videos","Templates"]
         existing = [d for d in opts if os.path.isdir(os.path.join(self.homedir, d))]
-        chosen   = random.sample(existing, k=random.randint(2, min(4, len(existing)))) if existing else []
+        chosen   = self._sample(existing, k=self._randint(2, min(4, len(existing)))) if existing else []
         # build bookmark lines
         # ─── seed bookmarks into the container’s XDG_CONFIG_HOME ─────────────
         bk_csv = ",".join(chosen)
@@ -334,20 +694,13 @@ for d in "${{BMLIST[@]}}"; do
 done
 '''
 
-        # --- 4) pick GTK and icon themes from our extra-themes dir
-        base_extra = os.path.expanduser("~/.nautilus_extra_themes")
-        try:
-            gtk_theme  = random.choice(os.listdir(os.path.join(base_extra, "themes")))
-        except Exception:
-            gtk_theme = ""
-        try:
-            icon_theme = random.choice(os.listdir(os.path.join(base_extra, "icons")))
-        except Exception:
-            icon_theme = ""
+        # --- 4) pick GTK and icon themes from the mounted set
+        gtk_theme  = self._choice(self._gtk_themes) if self._gtk_themes else ""
+        icon_theme = self._choice(self._icon_themes) if self._icon_themes else ""
 
-        # --- 5) kill & re-launch Nautilus under new env + gsettings
+        # --- 5) kill & re-launch Nautilus under new env + dconf profile
         container = FBEnvironment._docker_client.containers.get(
-            f"{self.project_name}_fb_service_1"
+            self.container_name
         )
         # quit Nautilus
         
@@ -370,128 +723,252 @@ done
             f'export GTK_THEME="{gtk_theme}"',
             f'export ICON_THEME="{icon_theme}"',
 
-            # 3) toggle sidebar & default view
-            f'gsettings set org.gnome.nautilus.window-state start-with-sidebar {self.hide_sidebar}',
-            f'gsettings set org.gnome.nautilus.preferences default-folder-viewer {self._lastKnownViewMode}',
+            # 3) toggle sidebar & default view: select the image's baked
+            #    dconf database (dropping the user db, which would override
+            #    it); older images without one fall back to gsettings
+            f'{{ P=fb-{self.hide_sidebar}-{self._lastKnownViewMode}; '
+            f'if [ -f /etc/dconf/profile/$P ]; then rm -f "$XDG_CONFIG_HOME/dconf/user"; export DCONF_PROFILE=$P; '
+            f'else gsettings set org.gnome.nautilus.window-state start-with-sidebar {self.hide_sidebar} && '
+            f'gsettings set org.gnome.nautilus.preferences default-folder-viewer {self._lastKnownViewMode}; fi; }}',
 
             # 4) finally start Nautilus pointed at the real home
             f'exec nautilus --no-desktop "{self.container_home}"'
         ]
         bash_invocation = " && ".join(cmd)
 
+        token = self.settle_token()
         container.exec_run(
             ["bash", "-lc", bash_invocation],
             user=f"{self.uid}:{self.gid}",
             detach=True
         )
 
-        # small pause and warm up
-        time.sleep(0.5)
+        # wait for the relaunched Nautilus to report its location and finish
+        # drawing, then warm up
+        self.settle(token, kind="reset", deadline=5.0, require_event=True, fallback=0.5)
         self.getScreen()
 
-    def _pipe_listener(self):
-        """Continuously read JSON lines from the FIFO and dispatch onNavigate."""
-        with open(self.pipe_path, "r") as fifo:
-            while not self._stop_pipe.is_set():
-                line = fifo.readline()
-                if not line:
-                    # EOF → reopen
-                    time.sleep(0.1)
-                    continue
-                try:
-                    data = json.loads(line.strip())
-
-                    self._log = f"{self._log} \n {time.time()}: {line.strip()}"
+    def _on_nav_event(self, data):
+        """Apply one navigation event from the extension and dispatch onNavigate."""
+        self._boot_marks.setdefault("first_event", data["received"])
+        self.event_log.append(
+            data["received"], data.get("path"), data.get("view"),
+            episode=self.episode, step=self.step_index, seq=data.get("seq", -1),
+        )
 
-                    latestPath = data.get("path", None)
-                    latestViewMode = data.get("view", None)
+        latestPath = data.get("path", None)
+        latestViewMode = data.get("view", None)
 
-                    if (self._lastKnownPath != latestPath) or (self._lastKnownViewMode != latestViewMode):
-                        self._lastKnownPath = latestPath
-                        self._lastKnownViewMode = latestViewMode
+        if (self._lastKnownPath != latestPath) or (self._lastKnownViewMode != latestViewMode):
+            self._lastKnownPath = latestPath
+            self._lastKnownViewMode = latestViewMode
 
-                        prefix = self.container_home
-                        if latestPath.startswith(prefix):
-                            rel = latestPath[len(prefix):] or "/"
+            prefix = self.container_home
+            if latestPath and latestPath.startswith(prefix):
+                rel = latestPath[len(prefix):] or "/"
 
-                            # callback signature: onNavigate(path, view)
-                            if self.onNavigate:
-                                self.onNavigate(rel, latestViewMode)
+                # callback signature: onNavigate(path, view)
+                if self.onNavigate:
+                    self.onNavigate(rel, latestViewMode)
 
-                        
-                except json.JSONDecodeError:
-                    pass
+    def wait_for_event(self, timeout=None, after=None):
+        """
+        Block until Nautilus reports a navigation / view event, instead of
+        sleeping and hoping the state has caught up.
+
+        :param timeout: max seconds to wait (None = forever)
+        :param after: event count to wait past (default: the current count,
+                      i.e. the next event); see `event_count`
+        :return: the event dict ("path", "view", "seq", "count", ...) or
+                 None on timeout
+        """
+        return self._events.wait_for_event(timeout=timeout, after=after)
 
+    @property
+    def event_count(self):
+        """Number of navigation events received so far."""
+        return self._events.count
 
-    def _fetch_and_bind_extra_themes(self):
+    def get_event_log(self, **query):
         """
-        Ensure at least 10 GTK and 10 icon themes are available by
-        cloning them into ~/.nautilus_extra_themes/(themes|icons),
-        then bind-mounting into the container.
+        Buffered navigation events as EventRecords (time, episode, step,
+        seq, path, view), oldest first. Accepts EventLog.query() filters:
+        since, until, episode, step, path_prefix, last.
         """
-        import os, subprocess
-
-        base_dir   = os.path.expanduser("~/.nautilus_extra_themes")
-        themes_dir = os.path.join(base_dir, "themes")
-        icons_dir  = os.path.join(base_dir, "icons")
-        os.makedirs(themes_dir, exist_ok=True)
-        os.makedirs(icons_dir,  exist_ok=True)
-
-        # A small curated list of popular GTK themes
-        gtk_repos = [
-            ("Arc",      "https://github.com/horst3180/arc-theme.git"),
-            ("Adapta",   "https://github.com/adapta-project/adapta-gtk-theme.git"),
-            ("Materia",  "https://github.com/nana-4/materia-theme.git"),
-            ("Pop",      "https://github.com/pop-os/gtk-theme.git"),
-            ("Canta",    "https://github.com/vinceliuice/Canta-theme.git"),
-            ("Nord",     "https://github.com/nordtheme/nord.git"),
-            ("Dracula",  "https://github.com/dracula/gtk.git"),
-            ("FlatRemix","https://github.com/daniruiz/flat-remix-gtk.git"),
-            ("WhiteSur", "https://github.com/vinceliuice/WhiteSur-gtk-theme.git"),
-        ]
-
-        icon_repos = [
-            ("Papirus",      "https://github.com/PapirusDevelopmentTeam/papirus-icon-theme.git"),
-            ("Moka",         "https://github.com/snwh/Moka-icon-theme.git"),
-            ("Numix",        "https://github.com/numixproject/numix-icon-theme.git"),
-            ("FlatRemix",    "https://github.com/daniruiz/flat-remix.git"),
-            ("La-Capitaine", "https://github.com/keeferrourke/la-capitaine-icon-theme.git"),
-            ("Tela",         "https://github.com/vinceliuice/Tela-icon-theme.git"),
-            # Papirus variants all live in the main Papirus repo (it contains Papirus, Papirus-Dark, Papirus-Light, etc.)
-        ]
+        return self.event_log.query(**query)
 
-        # Clone each if missing
-        for name, url in gtk_repos:
-            dest = os.path.join(themes_dir, name)
-            if not os.path.isdir(dest):
-                subprocess.run(["git", "clone", "--depth=1", url, dest], check=True)
+    def get_event_stats(self):
+        """Events received, events lost (sequence gaps) and extension connections."""
+        return self._events.stats()
 
-        for name, url in icon_repos:
-            dest = os.path.join(icons_dir, name)
-            if not os.path.isdir(dest):
-                subprocess.run(["git", "clone", "--depth=1", url, dest], check=True)
+    @classmethod
+    def _build_legacy_bundle(cls):
+        """Path of the host's fetched theme bundle, fetching and building it on first use."""
+        if cls._legacy_bundle is None:
+            base_dir = os.path.expanduser("~/.nautilus_extra_themes")
+            archive = os.path.join(base_dir, "bundle.tar")
+            if not os.path.isfile(archive):
+                src = os.path.join(base_dir, "src")
+                fetch_sources(src)
+                # keep whatever built; a host without the build tools still gets some themes
+                build_bundle(src, archive + ".tmp", min_sources=0)
+                os.replace(archive + ".tmp", archive)
+            cls._legacy_bundle = archive
+        return cls._legacy_bundle
+
+    def _fetch_and_bind_extra_themes(self, bundle=None):
+        """
+        Bind-mount extra GTK and icon themes into the container and remember
+        their names for reset().
+
+        With `bundle` (a ThemeBundle archive, see themes.py) everything is
+        offline: the archive is extracted and verified once per host and
+        loaded once per process. Without one, the upstream repositories are
+        cloned and installed into ~/.nautilus_extra_themes/src and packed
+        into ~/.nautilus_extra_themes/bundle.tar the first time a host
+        needs them, then used the same way.
+        """
+        if bundle is None:
+            bundle = FBEnvironment._build_legacy_bundle()
+        themes = ThemeBundle.load(bundle)
+        volumes = themes.volumes()
+        self._gtk_themes, self._icon_themes = themes.gtk_themes, themes.icon_themes
 
         # Finally, bind‐mount these into the container
         svc = self.compose_data['services']['fb_service']
-        vols = svc.setdefault("volumes", [])
-        vols.extend([
-            f"{themes_dir}:/usr/share/themes:ro",
-            f"{icons_dir}:/usr/share/icons:ro"
-        ])
+        svc.setdefault("volumes", []).extend(volumes)
+
+    def _vnc_connect(self):
+        if self.vnc_backend == "asyncio":
+            return AsyncVNCClient(self.ip_address, 5900, password="12345", timeout=5)
+        if self.persistent_framebuffer:
+            return api.connect(f"{self.ip_address}::5900", password="12345", timeout=1, factory_class=FramebufferFactory)
+        return api.connect(f"{self.ip_address}::5900", password="12345", timeout=1, factory_class=RegionCaptureFactory)
 
     def _connect_vnc(self):
-        self.vnc_client = api.connect(f"{self.ip_address}::5900", password="12345", timeout=1)
-        while not self._known_mouse:
+        self.vnc_client = None
+        while self.vnc_client is None or not self._known_mouse:
             try:
-                self.vnc_client.mouseMove(2, self.TOOLBAR_MARGIN+2)
-                self._known_mouse = (2, self.TOOLBAR_MARGIN+2)
+                if self.vnc_client is None:
+                    self.vnc_client = self._vnc_connect()
+                if not self._known_mouse:
+                    self.vnc_client.mouseMove(2, self.TOOLBAR_MARGIN+2)
+                    self._known_mouse = (2, self.TOOLBAR_MARGIN+2)
             except:
-                self.vnc_client = api.connect(f"{self.ip_address}::5900", password="12345", timeout=1)
-                pass
+                self.vnc_client = None
+                time.sleep(0.1)
+
+    def _framebuffer(self):
+        if self.vnc_backend == "asyncio":
+            return self.vnc_client.framebuffer
+        return self.vnc_client.factory.framebuffer
                     
     def _set_screen(self, v):
         self._latest_screen = v
 
+    def _grab_frame(self, timeout=None):
+        """Return the current screen region as an (H, W, 3) uint8 array."""
+        if self.persistent_framebuffer:
+            fb = self._framebuffer()
+            if fb is None:
+                # any proxied call blocks until the RFB handshake is done,
+                # and the framebuffer is created during the handshake
+                self.vnc_client.mouseMove(*self._known_mouse)
+                fb = self._framebuffer()
+            fb.wait_ready(timeout if timeout is not None else 5)
+            return fb.read(0, self.TOOLBAR_MARGIN, self.width, self.height)
+
+        self.vnc_client.captureRegionPIL(
+            self._set_screen,
+            0, self.TOOLBAR_MARGIN,
+            self.width, self.height
+        )
+        img = self._latest_screen.convert('RGB')
+        return np.array(img, dtype=np.uint8)
+
+    def settle_token(self):
+        """Capture (framebuffer version, event count) before sending input; pass it to settle()."""
+        fb = self._framebuffer() if (self.persistent_framebuffer and self.vnc_client) else None
+        return (fb.version if fb is not None else 0, self._events.count)
+
+    def settle(self, token, kind="step", deadline=None, require_event=False, fallback=0.0):
+        """
+        Wait until the screen has settled after the input sent since `token`
+        was taken: no VNC updates for `settle_quiet` seconds, nothing at all
+        for `settle_idle`, or `deadline` (default `settle_deadline`).
+        Without a persistent framebuffer this is only a wait of up to
+        `fallback` seconds that ends early on a navigation event.
+        The wait is recorded in `get_settle_stats()` under `kind`.
+
+        :return: (seconds waited, outcome)
+        """
+        fb = self._framebuffer() if (self.persistent_framebuffer and self.vnc_client) else None
+        waited, outcome = self._settler.settle(
+            fb, self._events, token[0], token[1], deadline=deadline, require_event=require_event,
+            fallback=fallback,
+        )
+        self.settle_stats.record(kind, waited, outcome)
+        return waited, outcome
+
+    def get_settle_stats(self):
+        """Settle-time histograms (count, mean/p50/p90/p99/max ms, buckets, outcomes) per kind."""
+        return self.settle_stats.stats()
+
+    def get_boot_breakdown(self):
+        """
+        Seconds spent in each start-up phase of this container, in order:
+
+        container_up: backend `up` (create + start);
+        entrypoint: from start until startapp.sh runs (init, X and VNC server);
+        script_<phase>: startapp.sh steps (xdg, dconf, bookmarks, themes, exec);
+        nautilus: from exec until the extension's first navigation event;
+        vnc_connect / first_frame: since `up` returned, until VNC connected /
+        the first usable frame; total: until both a frame and an event arrived.
+
+        Phases that were not observed (e.g. for an adopted container, or
+        before the first getScreen()) are left out. "restarts" counts later
+        startapp.sh runs (Nautilus relaunches).
+        """
+        marks = self._boot_marks
+        out = {}
+        if "up_end" in marks:
+            out["container_up"] = marks["up_end"] - marks["up_start"]
+
+        runs = []
+        try:
+            container = FBEnvironment._docker_client.containers.get(self.container_name)
+            log = container.exec_run(["cat", "/tmp/fb-boot.log"]).output.decode(errors="replace")
+            for line in log.splitlines():
+                name, _, stamp = line.partition(" ")
+                if name == "start":
+                    runs.append([])
+                if runs and stamp:
+                    runs[-1].append((name, float(stamp)))
+        except Exception as e:
+            print(f"[FBEnvironment] boot log unavailable: {e}")
+
+        if runs:
+            boot = runs[0]
+            if "up_start" in marks:
+                out["entrypoint"] = boot[0][1] - marks["up_start"]
+            for (_, prev), (name, stamp) in zip(boot, boot[1:]):
+                out[f"script_{name}"] = stamp - prev
+            if "first_event" in marks:
+                out["nautilus"] = marks["first_event"] - boot[-1][1]
+            out["restarts"] = len(runs) - 1
+
+        if "up_end" in marks:
+            for phase, key in (("vnc_connect", "vnc_connected"), ("first_frame", "first_frame")):
+                if key in marks:
+                    out[phase] = marks[key] - marks["up_end"]
+            if "first_frame" in marks and "first_event" in marks:
+                out["total"] = max(marks["first_frame"], marks["first_event"]) - marks["up_start"]
+        return out
+
+    def get_readiness_stats(self):
+        """Time-to-first-usable-frame stats (seconds) since construction and each reset()."""
+        return self._readiness.stats()
+
     def getBlankScreen(self, mode="rgb_array"):
         return np.zeros((self.height, self.width, 3), dtype=np.int8)
     
@@ -509,31 +986,18 @@ done
 
         if not self.vnc_client:
             self._connect_vnc()
+            self._boot_marks.setdefault("vnc_connected", time.time())
 
         start = time.time()
         while True:
             try:
-                # grab one frame into self._latest_screen
-                self.vnc_client.captureRegionPIL(
-                    self._set_screen,
-                    0, self.TOOLBAR_MARGIN,
-                    self.width, self.height
-                )
-                img = self._latest_screen.convert('RGB')
-                arr = np.array(img, dtype=np.uint8)
-
-                # convert to grayscale luminance
-                # weights: 0.2989 R, 0.5870 G, 0.1140 B
-                lum = (0.2989 * arr[...,0] +
-                       0.5870 * arr[...,1] +
-                       0.1140 * arr[...,2])
+                # grab one frame, either from the mirrored framebuffer or
+                # with a full capture into self._latest_screen
+                arr = self._grab_frame(timeout)
 
-                # fraction of pixels below "black" threshold
-                black_pixels = np.count_nonzero(lum < 16)
-                frac_black = black_pixels / lum.size
-
-                # if not >90% black, we’re ready
-                if frac_black <= 0.9:
+                # if not >90% black (or already known warm), we’re ready
+                if self._readiness.check(arr):
+                    self._boot_marks.setdefault("first_frame", time.time())
                     break
 
                 # optional timeout
@@ -549,12 +1013,57 @@ done
 
         # return in requested format
         if mode == "pil":
-            return img
+            from PIL import Image
+            return Image.fromarray(arr)
         elif mode == "rgb_array":
             return arr
         else:
             return None
     
+    def getRegion(self, x, y, w, h, out=None):
+        """
+        Return the screen region at (x, y) of size (w, h), clipped to the
+        screen: a copy out of the mirrored framebuffer, or else a
+        FramebufferUpdateRequest for just that region. Until the instance
+        is warm this goes through a full getScreen() so the black-frame
+        wait still applies.
+
+        :param out: optional preallocated array of the clipped region's shape
+        """
+        x1, y1 = max(0, x), max(0, y)
+        x2, y2 = min(self.width, x + w), min(self.height, y + h)
+
+        if not self._readiness.warm:
+            region = self.getScreen()[y1:y2, x1:x2]
+            if out is None:
+                return region
+            np.copyto(out, region)
+            return out
+
+        if not self.vnc_client:
+            self._connect_vnc()
+
+        while True:
+            try:
+                if self.persistent_framebuffer:
+                    fb = self._framebuffer()
+                    return fb.read(x1, self.TOOLBAR_MARGIN + y1, x2 - x1, y2 - y1, out=out)
+
+                self.vnc_client.captureRegionPIL(
+                    self._set_screen,
+                    x1, self.TOOLBAR_MARGIN + y1,
+                    x2 - x1, y2 - y1
+                )
+                region = np.asarray(self._latest_screen.convert('RGB'), dtype=np.uint8)
+                if out is None:
+                    return region
+                np.copyto(out, region)
+                return out
+            except Exception:
+                # on any VNC hiccup, re-connect and retry
+                self.vnc_client = None
+                self._connect_vnc()
+
     def nudgeMouse(self, dx, dy):
         if not self.vnc_client:
             self._connect_vnc()
@@ -650,153 +1159,201 @@ done
             return False
         
         
+    def _compile_macro(self, sequence):
+        """
+        Turn a macro into segments: lists of low-level (method, *args) input
+        events, separated by ("wait", seconds) / ("settle", deadline) steps.
+        """
+        segments = []
+        batch = []
+        x, y = self._known_mouse
+        down = self.isMouseDown
+        for op in sequence:
+            kind, args = op[0], op[1:]
+            if kind == "move":
+                x = int(min(max(0, args[0]), self.width-1))
+                y = int(min(max(0, args[1]), self.height-1)+self.TOOLBAR_MARGIN)
+                batch.append(("mouseMove", x, y))
+            elif kind == "nudge":
+                x = int(min(max(0, x+args[0]), self.width-1))
+                y = int(min(max(0, y-self.TOOLBAR_MARGIN+args[1]), self.height-1)+self.TOOLBAR_MARGIN)
+                batch.append(("mouseMove", x, y))
+            elif kind in ("down", "up"):
+                button = args[0] if args else 1
+                batch.append(("mouseDown" if kind == "down" else "mouseUp", button))
+                down = kind == "down"
+            elif kind in ("click", "double_click"):
+                button = args[0] if args else 1
+                for _ in range(2 if kind == "double_click" else 1):
+                    batch += [("mouseDown", button), ("mouseUp", button)]
+            elif kind == "key":
+                batch += [("keyDown", args[0]), ("keyUp", args[0])]
+            elif kind in ("keydown", "keyup"):
+                batch.append(("keyDown" if kind == "keydown" else "keyUp", args[0]))
+            elif kind in ("wait", "settle"):
+                segments.append(batch)
+                segments.append((kind, args[0] if args else None))
+                batch = []
+            else:
+                raise FBEnvironmentException(f"Unknown macro step {op!r}")
+        segments.append(batch)
+        return segments, (x, y), down
+
+    def _send_batch(self, events):
+        if not events:
+            return
+        run = getattr(self.vnc_client, "runMacro", None)
+        if run is not None and (self.vnc_backend == "asyncio" or self.persistent_framebuffer):
+            run(events)
+        else:
+            # plain vncdotool client: no batching, one call per event
+            for name, *args in events:
+                getattr(self.vnc_client, name)(*args)
+
+    def execute_macro(self, sequence, observe=True, settle=True, mode="rgb_array"):
+        """
+        Run a sequence of primitive inputs as one pipelined batch and
+        return a single observation.
+
+        Steps (tuples): ("move", x, y), ("nudge", dx, dy), ("down"[, button]),
+        ("up"[, button]), ("click"[, button]), ("double_click"[, button]),
+        ("key", key), ("keydown", key), ("keyup", key), ("wait", seconds),
+        ("settle"[, deadline]).
+
+        Consecutive input steps are sent in a single write / reactor call;
+        only "wait" and "settle" split the batch. With `settle`, the screen
+        is also settled after the last step.
+
+        :return: the screen (see getScreen) if `observe`, else None
+        """
+        if not self.vnc_client:
+            self._connect_vnc()
+        segments, mouse, down = self._compile_macro(sequence)
+
+        token = self.settle_token()
+        try:
+            for segment in segments:
+                if isinstance(segment, tuple):
+                    kind, arg = segment
+                    if kind == "wait":
+                        time.sleep(arg or 0)
+                    else:
+                        self.settle(token, kind="macro", deadline=arg)
+                    token = self.settle_token()
+                else:
+                    self._send_batch(segment)
+        except Exception as e:
+            self.vnc_client = None
+            raise FBEnvironmentException(f"Macro failed: {e}")
+
+        self._known_mouse = mouse
+        self.isMouseDown = down
+        ends_with_settle = bool(sequence) and sequence[-1][0] == "settle"
+        if settle and not ends_with_settle:
+            self.settle(token, kind="macro")
+        return self.getScreen(mode=mode) if observe else None
+
     def close(self):
         """Stop and remove the container, return the IP address to the pool, delete the temp directory, and close VNC."""
-        try:
-            subprocess.run(
-                ["docker-compose", "-f", self.modified_compose_file.name, "down"],
-                check=True,
-                env=dict(os.environ, COMPOSE_PROJECT_NAME=self.project_name)
-            )
-        except subprocess.CalledProcessError as e:
-            print(f"Error stopping container: {e}")
+        # close() may run from several owners (vector env, pool, __del__)
+        if getattr(self, "_closed", False):
+            return
+        self._closed = True
+
+        self._backend.down(self.container_spec)
 
         # Close the VNC connection if it's open
         if self.vnc_client:
             self.vnc_client.disconnect()
 
-        self._stop_pipe.set()
-
-        try:
-            os.remove(self.pipe_path)
-        except:
-            pass
+        self._events.close()
+        self._tree_watcher.close()
+        self.event_log.close()
 
         # Release the IP back to the pool and clean up resources
-        with FBEnvironment._lock:
-            FBEnvironment._available_ips.append(self.ip_address)
+        self._allocator.release(self.ip_address)
             
         # Remove the instance from the class-level dictionary
         FBEnvironment._instances.pop(self.ip_address, None)
 
-        # Remove the modified compose file if it exists
-        try:
-            if os.path.exists(self.modified_compose_file.name):
-                os.remove(self.modified_compose_file.name)
-        except PermissionError as e:
-            print(f"Permission error when trying to delete file {self.modified_compose_file.name}: {e}")
-
-
 
     def __del__(self):
         """Ensure the container is closed, IP returned, and VNC disconnected on object deletion."""
         self.close()
 
 
-    def _populate_random_files(self, root, templates):
-        # parse_size as before…
-        def _parse_size(size_str):
-            m = re.match(r'^\s*([\d.]+)\s*(B|KB|MB|GB)\s*$', size_str, re.IGNORECASE)
-            if not m:
-                raise ValueError(f"Cannot parse size: {size_str!r}")
-            num, unit = m.groups()
-            num = float(num)
-            unit = unit.upper()
-            mult = {'B':1, 'KB':1024, 'MB':1024**2, 'GB':1024**3}[unit]
-            return int(num * mult)
+    @classmethod
+    def _template_source(cls, templates):
+        """
+        Return (TemplateStore, None) for a compiled .fbt store, or for a
+        generate_trees.py corpus directory whose manifest names one, and
+        (None, names) for a directory of text templates. Both are opened /
+        listed once per process; a directory is listed again only when its
+        mtime changes.
+        """
+        with cls._lock:
+            store = cls._template_stores.get(templates)
+            if store is not None:
+                return store, None
+            path = templates if os.path.isfile(templates) else corpus_store(templates)
+            if path is not None:
+                store = cls._template_stores[templates] = TemplateStore(path)
+                return store, None
+
+            mtime = os.path.getmtime(templates)
+            cached = cls._template_listings.get(templates)
+            if cached is None or cached[0] != mtime:
+                names = sorted(
+                    fn for fn in os.listdir(templates)
+                    if os.path.isfile(os.path.join(templates, fn))
+                )
+                cached = cls._template_listings[templates] = (mtime, names)
+            return None, cached[1]
 
+    def _populate_random_files(self, root, templates):
         if templates is None:
             os.makedirs(root, exist_ok=True)
             open(os.path.join(root, "example.txt"), "wb").close()
             return
 
-        dirs = []  # collect all created directories
-        now = time.time()
-
-        # 1) Create everything
-        chosen = random.choice([
-            fn for fn in os.listdir(templates)
-            if os.path.isfile(os.path.join(templates, fn))
-        ])
-        with open(os.path.join(templates, chosen), encoding='utf-8') as f:
-            lines = [L.rstrip() for L in f if L.strip()]
-
-        self._initial_template_lines = lines
-
-        print("Chosen: ", os.path.join(templates, chosen))
-
-        indent = 2
-        stack = []
-
-        for line in lines:
-            leading = len(line) - len(line.lstrip(' '))
-            level = leading // indent
-            entry = line.lstrip(' ')
-
-            if entry.endswith('/'):
-                # directory
-                stack = stack[:level] + [entry[:-1]]
-                path = os.path.join(root, *stack)
-                os.makedirs(path, exist_ok=True)
-                dirs.append(path)
-            else:
-                # file + size
-                # file + size; but name may include subpaths
-                name_part, size_part = entry.rsplit('(', 1)
-                rel_name = name_part.strip()
-                size     = _parse_size(size_part.rstrip(')'))
-
-                # first build the full path under root + any stack prefix
-                full_path = os.path.join(root, *stack[:level], rel_name)
-
-                # **ensure all parent dirs exist, including any in rel_name**
-                parent_dir = os.path.dirname(full_path)
-                os.makedirs(parent_dir, exist_ok=True)
-
-                # now create/truncate the file
-                with open(full_path, 'wb') as f:
-                    f.truncate(size)
-
-                # file mtime
-                f_mtime = now - random.uniform(0, 365*24*3600)
-                os.utime(full_path, (f_mtime, f_mtime))
+        store, names = FBEnvironment._template_source(templates)
+        if store is not None:
+            index = int(self.np_random.integers(len(store)))
+            key = (templates, index)
+            load = lambda: store.records(index)
+            print("Chosen: ", f"{templates}[{index}] {store.name(index)}")
+        else:
+            template_path = os.path.join(templates, self._choice(names))
+            key = (template_path, os.path.getmtime(template_path))
 
+            def load():
+                with open(template_path, encoding='utf-8') as f:
+                    return parse_template([L.rstrip() for L in f if L.strip()])
+            print("Chosen: ", template_path)
 
-        # 2) Stamp directory mtimes *after* all children exist
-        for d in dirs:
-            d_mtime = now - random.uniform(0, 30*24*3600)
-            os.utime(d, (d_mtime, d_mtime))
+        # The template is parsed and planned once per process; each episode
+        # only creates the planned entries and re-stamps mtimes.
+        self._template_records = TemplateCache.populate(key, root, load, rng=self.np_random)
 
     def get_directory_tree(self) -> str:
         """
         Return a textual representation of the current directory tree under self.homedir,
         using two-space indentation per level and directories ending with '/',
         but *skipping* our Nautilus runtime files so they never show up.
-        """
-        import os
 
-        # only these exact names are hidden; any other dot-entry (from your templates) still appears
-        ignore = {'.dbus', '.hidden'}
-        lines = []
-
-        def walk(path: str, level: int):
-            indent = " " * (2 * level)
-            try:
-                entries = sorted(os.listdir(path))
-            except PermissionError:
-                return
-            for name in entries:
-                if name in ignore:
-                    continue
-                full = os.path.join(path, name)
-                if os.path.isdir(full):
-                    lines.append(f"{indent}{name}/")
-                    walk(full, level + 1)
-                else:
-                    lines.append(f"{indent}{name}")
+        Served from the inotify-backed cache; only directories that changed
+        since the last call are listed again.
+        """
+        # only '.dbus', '.hidden' and '.hidden.sock' are hidden; any other dot-entry (from your templates) still appears
+        return self._tree_watcher.get_tree()
 
-        walk(self.homedir, 0)
-        return "\n".join(lines)
+    def get_directory_snapshot(self):
+        """
+        Structured counterpart of get_directory_tree(): an immutable
+        TreeSnapshot with O(1) equality and a `diff()` listing added,
+        removed and moved entries.
+        """
+        return self._tree_watcher.get_snapshot()
     
     def get_template_tree(self) -> str:
         """
@@ -804,19 +1361,7 @@ done
         stripped of all size annotations, using the same two-space
         indentation and trailing '/' for directories.
         """
-        # Requires that `_populate_random_files` saved the raw template lines:
-        #     self._initial_template_lines = [L.rstrip('\n') for L in f if L.strip()]
-        raw = getattr(self, "_initial_template_lines", [])
-        out = []
-        for line in raw:
-            # preserve indentation
-            indent = len(line) - len(line.lstrip(' '))
-            entry = line.strip()
-            # remove size annotation, if present
-            if '(' in entry:
-                entry = entry[:entry.rfind('(')].rstrip()
-            out.append(" " * indent + entry)
-        return "\n".join(out)
+        return render_tree(getattr(self, "_template_records", []))
 
 
     def _generate_instruction(self):
@@ -824,18 +1369,20 @@ done
         # scan what's on disk
         all_paths = []
         for dp, dn, filenames in os.walk(self.homedir):
-            for fn in filenames:
-                all_paths.append((dp, fn))
+            dn.sort()  # walk order must not depend on the filesystem
+            for fn in sorted(filenames):
+                if fn not in DEFAULT_IGNORE:  # never target our runtime files
+                    all_paths.append((dp, fn))
 
-        src_dir, fn = random.choice(all_paths)
+        src_dir, fn = self._choice(all_paths)
         rel_src = os.path.relpath(src_dir, self.homedir)
-        action = random.choice(["move", "delete"])
+        action = self._choice(["move", "delete"])
 
         if action == "move":
             # pick or create a target dir
-            possible_dirs = [d for d in os.listdir(self.homedir)
+            possible_dirs = [d for d in sorted(os.listdir(self.homedir))
                              if os.path.isdir(os.path.join(self.homedir, d))]
-            dest_dir = random.choice(possible_dirs)
+            dest_dir = self._choice(possible_dirs)
             instruction = f"move {fn} into the directory '{dest_dir}'"
             condition = lambda: (
                 os.path.exists(os.path.join(self.homedir, dest_dir, fn))
@@ -871,7 +1418,7 @@ done
         then parses out the path after the “— ”.
         """
         # docker-compose names: {project_name}_fb_service_1
-        container_name = f"{self.project_name}_fb_service_1"
+        container_name = self.container_name
         try:
             # Run xdotool in the container
             result = FBEnvironment._docker_client.containers \
@@ -906,20 +1453,25 @@ class FBGymEnv(gym.Env):
     metadata = {'render_modes': ['rgb_array']}
     _all_time_seen = {}
     
-    def __init__(self, maxsteps=30, actionmode='relative',  width=500, height=500, statemode='full', statewidth=100, stateheight=100, subnet=20, runtime_args=None, cautious_mode=False, reward_function=None, done_function=None):
+    def __init__(self, maxsteps=30, actionmode='relative',  width=500, height=500, statemode='full', statewidth=100, stateheight=100, subnet=20, runtime_args=None, cautious_mode=False, reward_function=None, done_function=None, pool=None, track_tree=True, structured_hooks=False, zero_copy=False, obs_size=None, grayscale=False, frame_stack=1, shared_memory=None, settle=None):
         super(FBGymEnv, self).__init__()
         
         self.cautious_mode = cautious_mode
 
+        # Hooks that only look at path/view can skip the tree entirely
+        self.track_tree = track_tree
+        # Also pass old_snapshot/new_snapshot (TreeSnapshot) keywords to the hooks
+        self.structured_hooks = structured_hooks
+
         if reward_function is None:
-            self.reward_function = lambda oldpath, newpath, oldstate, newstate, oldview, newview: 0 if oldview == newview else 1
+            self.reward_function = lambda oldpath, newpath, oldstate, newstate, oldview, newview, **_: 0 if oldview == newview else 1
         else:
             self.reward_function = reward_function
 
         self.fresh = True
         
         if done_function is None:
-            self.done_function = lambda oldpath, newpath, oldstate, newstate, oldview, newview: oldview != newview
+            self.done_function = lambda oldpath, newpath, oldstate, newstate, oldview, newview, **_: oldview != newview
         else:
             self.done_function = done_function
 
@@ -927,12 +1479,26 @@ class FBGymEnv(gym.Env):
             runtime_args = {}
 
         # Initialize the ParticleSimulation with given parameters
-        self.browser = FBEnvironment(height=height, width=width, subnet=subnet, **runtime_args)
+        # With a pool, the browser is swapped for a warm one on every reset
+        self.pool = pool
+        if self.pool is not None:
+            self.browser = self.pool.acquire()
+            width, height = self.browser.width, self.browser.height
+        else:
+            self.browser = FBEnvironment(height=height, width=width, subnet=subnet, **runtime_args)
+
+        # Wait for the UI to settle after each action before observing; by
+        # default only when a persistent framebuffer makes that precise
+        self.settle = self.browser.persistent_framebuffer if settle is None else settle
         
         self.maxsteps = maxsteps
 
         self.statewidth = statewidth
         self.stateheight = stateheight
+        # Reused crop buffer for "zoomed"/"both"; with zero_copy the buffer
+        # itself is returned and is overwritten by the next observation
+        self._zoom_buffer = np.zeros((stateheight, statewidth, 3), dtype=np.uint8)
+        self.zero_copy = zero_copy
 
         self.actionmode = actionmode
         self.statemode = statemode
@@ -950,15 +1516,35 @@ class FBGymEnv(gym.Env):
         else:
             raise Exception("Unknown action type, use 'relative' or 'absolute'")
 
-        if self.statemode == "full":
-            self.observation_space = spaces.Box(low=0, high=255, shape=(width, height, 3), dtype=np.uint8)
-        elif self.statemode == "zoomed":
-            self.observation_space = spaces.Box(low=0, high=255, shape=(self.statewidth, self.stateheight, 3), dtype=np.uint8)
+        # Optional resize / grayscale / frame stacking of the main view
+        # ("full" and "both": the screen, "zoomed": the crop)
+        base_hw = (self.stateheight, self.statewidth) if self.statemode == "zoomed" else (height, width)
+        if obs_size is not None or grayscale or frame_stack > 1:
+            self._obs_processor = ObservationProcessor(base_hw, size=obs_size, grayscale=grayscale, frame_stack=frame_stack)
+            obs_shape = self._obs_processor.shape
+        else:
+            self._obs_processor = None
+            obs_shape = base_hw + (3,)
+
+        if self.statemode in ("full", "zoomed"):
+            self.observation_space = spaces.Box(low=0, high=255, shape=obs_shape, dtype=np.uint8)
         elif self.statemode == "both":
             print("WARNING: Using 'both' mode means that observation_space will not be set")
         else:
             raise Exception("Unknown state type, use 'full' or 'zoomed'")
 
+        # shared_memory=<slots>: write observations into a shared-memory ring
+        # and return only the slot index; the learner attaches by name
+        # (info["shm_name"]) and checks info["shm_seq"] against the slot
+        self._obs_ring = None
+        if shared_memory:
+            if self.statemode == "both":
+                raise Exception("shared_memory observations need statemode 'full' or 'zoomed'")
+            self.frame_space = self.observation_space
+            self._obs_ring = SharedObservationRing(obs_shape, slots=int(shared_memory))
+            self.shm_name = self._obs_ring.name
+            self.observation_space = spaces.Discrete(self._obs_ring.slots)
+
         
         # Rendering options
         self.render_mode = None
@@ -966,70 +1552,146 @@ class FBGymEnv(gym.Env):
         self.height = height
 
         self.last_path = self.browser._lastKnownPath
-        self.last_state = self.browser.get_directory_tree()
+        self.last_state = self._get_tree()
+        self.last_snapshot = self._get_snapshot()
         self.last_view = self.browser._lastKnownViewMode
 
 
-    def convert_to_state(self, data, x, y):
-        height, width, channels = data.shape
+    def _get_tree(self):
+        return self.browser.get_directory_tree() if self.track_tree else None
 
+    def _get_snapshot(self):
+        if self.track_tree and self.structured_hooks:
+            return self.browser.get_directory_snapshot()
+        return None
+
+    def _hook_kwargs(self, new_snapshot):
+        if not self.structured_hooks:
+            return {}
+        return {"old_snapshot": self.last_snapshot, "new_snapshot": new_snapshot}
+
+    def _crop_bounds(self, x, y, width, height):
+        """Source and destination boxes for a cursor-centred crop of a (height, width) screen."""
         # Define cropping bounds
         left = x - self.statewidth // 2
-        right = x + self.statewidth // 2
+        right = left + self.statewidth
         top = y - self.stateheight // 2
-        bottom = y + self.stateheight // 2
-
-        # Create a blank image for the output
-        cropped_image = np.zeros((self.stateheight, self.statewidth, channels), dtype=data.dtype)
+        bottom = top + self.stateheight
 
         # Calculate the region to copy from the original image
-        src_x1 = max(0, left)
-        src_x2 = min(width, right)
-        src_y1 = max(0, top)
-        src_y2 = min(height, bottom)
+        src = (max(0, left), max(0, top), min(width, right), min(height, bottom))
 
         # Calculate the corresponding region in the output image
-        dst_x1 = max(0, -left)
-        dst_x2 = self.statewidth - max(0, right - width)
-        dst_y1 = max(0, -top)
-        dst_y2 = self.stateheight - max(0, bottom - height)
+        dst = (max(0, -left), max(0, -top),
+               self.statewidth - max(0, right - width),
+               self.stateheight - max(0, bottom - height))
+        return src, dst
+
+    @staticmethod
+    def _clear_padding(out, dst):
+        """Zero only the parts of `out` outside the destination box."""
+        dx1, dy1, dx2, dy2 = dst
+        out[:dy1] = 0
+        out[dy2:] = 0
+        out[dy1:dy2, :dx1] = 0
+        out[dy1:dy2, dx2:] = 0
+
+    def convert_to_state(self, data, x, y, out=None):
+        """
+        Crop a (stateheight, statewidth) window centred on (x, y) out of
+        `data`, padding with black past the screen edges. With `out`, the
+        crop is written into that buffer in place.
+        """
+        height, width, channels = data.shape
+        (sx1, sy1, sx2, sy2), dst = self._crop_bounds(x, y, width, height)
+
+        if out is None:
+            # Create a blank image for the output
+            out = np.zeros((self.stateheight, self.statewidth, channels), dtype=data.dtype)
+        else:
+            self._clear_padding(out, dst)
 
         # Copy the valid region from the original image to the output image
-        cropped_image[dst_y1:dst_y2, dst_x1:dst_x2] = data[src_y1:src_y2, src_x1:src_x2]
+        dx1, dy1, dx2, dy2 = dst
+        out[dy1:dy2, dx1:dx2] = data[sy1:sy2, sx1:sx2]
+
+        return out
+
+    def _foveated_state(self):
+        """Capture only the cursor-centred region straight into the zoom buffer."""
+        x, y = self.browser._known_mouse[0], self.browser._known_mouse[1] - self.browser.TOOLBAR_MARGIN
+        (sx1, sy1, sx2, sy2), dst = self._crop_bounds(x, y, self.browser.width, self.browser.height)
+        out = self._zoom_buffer
+        self._clear_padding(out, dst)
+        dx1, dy1, dx2, dy2 = dst
+        self.browser.getRegion(sx1, sy1, sx2 - sx1, sy2 - sy1, out=out[dy1:dy2, dx1:dx2])
+        return out
+
+    def _process(self, frame):
+        """Apply resize/grayscale/stacking; returns a fresh array unless zero_copy."""
+        if self._obs_processor is not None:
+            frame = self._obs_processor(frame)
+        elif self.statemode == "full":
+            # getScreen() already returned a new array
+            return frame
+        return frame if self.zero_copy else frame.copy()
 
-        return cropped_image
-    
     def _getState(self):
-
+        # zoomed/both reuse one preallocated crop buffer; unless zero_copy
+        # is set, callers get their own copy of it
         if self.statemode == "zoomed":
-            state = self.convert_to_state(self.browser.getScreen(), self.browser._known_mouse[0], self.browser._known_mouse[1]-self.browser.TOOLBAR_MARGIN)
+            state = self._process(self._foveated_state())
         elif self.statemode == "full":
-            state = self.browser.getScreen()
+            state = self._process(self.browser.getScreen())
         elif self.statemode == "both":
-            state = self.browser.getScreen(), self.convert_to_state(self.browser.getScreen(), self.browser._known_mouse[0], self.browser._known_mouse[1]-self.browser.TOOLBAR_MARGIN)
+            # one capture serves both views
+            screen = self.browser.getScreen()
+            zoomed = self.convert_to_state(screen, self.browser._known_mouse[0], self.browser._known_mouse[1]-self.browser.TOOLBAR_MARGIN, out=self._zoom_buffer)
+            state = self._process(screen), (zoomed if self.zero_copy else zoomed.copy())
 
         return state
 
+    def _observe(self, info):
+        """Current observation (or its shared-memory slot) and the info dict."""
+        state = self._getState()
+        if self._obs_ring is None:
+            return state, info
+        slot, seq = self._obs_ring.write(state)
+        info["shm_name"] = self._obs_ring.name
+        info["shm_seq"] = seq
+        return slot, info
+
     def reset(self, seed=None, options=None):
         """
         Reset the simulation to start over.
         """
-        # Seeding
+        # Seeding: gym's generator seeds the browser, so one seed fixes the
+        # whole sequence of episodes.
+        super().reset(seed=seed)
 
-        if not self.fresh:
-            super().reset(seed=seed)
+        if not self.fresh or seed is not None:
+            browser_seed = int(self.np_random.integers(2**63))
             self.stepcount = 0
-            self.browser.reset()
-            self.browser.setMouse(random.randrange(0, self.browser.height), random.randrange(0, self.browser.width))
+            if self.pool is not None:
+                # a seeded swap resets synchronously, so only pay for it when
+                # the caller asked for a specific episode
+                self.browser = self.pool.swap(self.browser, seed=browser_seed if seed is not None else None)
+            else:
+                self.browser.reset(seed=browser_seed)
+            self.browser.setMouse(int(self.np_random.integers(self.browser.height)), int(self.np_random.integers(self.browser.width)))
 
 
             self.last_path = self.browser._lastKnownPath
-            self.last_state = self.browser.get_directory_tree()
+            self.last_state = self._get_tree()
+            self.last_snapshot = self._get_snapshot()
             self.last_view = self.browser._lastKnownViewMode
             
         self.fresh = False
 
-        return self._getState(), {}
+        if self._obs_processor is not None:
+            self._obs_processor.reset()
+
+        return self._observe({})
 
     def step(self, action):
         """
@@ -1037,9 +1699,12 @@ class FBGymEnv(gym.Env):
         """
 
         if self.stepcount > self.maxsteps:
-            return self._getState(), 0, True, False, {"mouse_held": self.browser.isMouseDown}
+            obs, info = self._observe({"mouse_held": self.browser.isMouseDown})
+            return obs, 0, True, False, info
 
         self.stepcount += 1
+        self.browser.step_index = self.stepcount
+        token = self.browser.settle_token() if self.settle else None
 
         if self.actionmode == "absolute":
             x, y = action
@@ -1066,37 +1731,78 @@ class FBGymEnv(gym.Env):
                 self.browser.nudgeMouse(delta/2, -delta/2)
             elif action == 8:
                 self.browser.click()
-                # time.sleep(0.3)
             elif action == 9:
                 if self.browser.isMouseDown:
                     self.browser.mouseHoldEnd()
                 else:
                     self.browser.mouseHoldStart()
                     self.browser.awaitMouseDown()
-            
 
+        # observe only once the UI has reacted to the input
+        if token is not None:
+            self.browser.settle(token)
+
+        reward, done = self._evaluate_step()
+        obs, info = self._observe({"mouse_held": self.browser.isMouseDown})
+        return obs, reward, done, False, info
+
+    def step_macro(self, sequence):
+        """
+        Option-level step: run a whole macro (see FBEnvironment.execute_macro)
+        and pay for one observation, one tree read and one reward/done
+        evaluation. Counts as a single step towards `maxsteps`.
+        """
+        if self.stepcount > self.maxsteps:
+            obs, info = self._observe({"mouse_held": self.browser.isMouseDown})
+            return obs, 0, True, False, info
+
+        self.stepcount += 1
+        self.browser.step_index = self.stepcount
+        self.browser.execute_macro(sequence, observe=False, settle=self.settle)
+
+        reward, done = self._evaluate_step()
+        obs, info = self._observe({"mouse_held": self.browser.isMouseDown, "macro_steps": len(sequence)})
+        return obs, reward, done, False, info
+
+    def _evaluate_step(self):
+        """Read the new path/view/tree, compute reward and done, and roll the last_* state."""
         new_path = self.browser._lastKnownPath
-        new_state = self.browser.get_directory_tree()
+        new_state = self._get_tree()
+        new_snapshot = self._get_snapshot()
         new_view = self.browser._lastKnownViewMode
+        hook_kwargs = self._hook_kwargs(new_snapshot)
 
-        reward = self.reward_function(self.last_path, new_path, self.last_state, new_state, self.last_view, new_view)
+        reward = self.reward_function(self.last_path, new_path, self.last_state, new_state, self.last_view, new_view, **hook_kwargs)
 
 
         if self.stepcount > self.maxsteps:
             done = True
         else:
-            done = self.done_function(self.last_path, new_path, self.last_state, new_state, self.last_view, new_view)
+            done = self.done_function(self.last_path, new_path, self.last_state, new_state, self.last_view, new_view, **hook_kwargs)
             if done:
                 self.stepcount = 10000
 
 
         self.last_path = new_path
         self.last_state = new_state
+        self.last_snapshot = new_snapshot
         self.last_view = new_view
-        
-        return self._getState(), reward, done, False, {"mouse_held": self.browser.isMouseDown}
+        return reward, done
 
             
     def render(self):
         return self.browser.getScreen()
 
+    def close(self):
+        """Hand a pooled browser back to its pool (or close an owned one) and free the shared-memory ring."""
+        if self.browser is not None:
+            if self.pool is not None:
+                self.pool.release(self.browser)
+            else:
+                self.browser.close()
+            self.browser = None
+        if self._obs_ring is not None:
+            self._obs_ring.close()
+            self._obs_ring.unlink()
+            self._obs_ring = None
+
@@ -0,0 +1,159 @@
+import struct
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+
+class EventRecord(namedtuple("EventRecord", ["time", "episode", "step", "seq", "path", "view"])):
+    """
+    One navigation event.
+
+    time: host receive time; episode / step: FBEnvironment's episode counter
+    and the gym step index at the time; seq: the extension's sequence
+    number (-1 if it sent none); path / view: as reported by Nautilus.
+    """
+    __slots__ = ()
+
+
+_NUMERIC = np.dtype([("time", "<f8"), ("episode", "<i4"), ("step", "<i4"), ("seq", "<i8")])
+
+SPILL_MAGIC = b"FBEVLOG1"
+# time, episode, step, seq, len(path), len(view); then the utf-8 strings
+_SPILL_RECORD = struct.Struct("<diiqHH")
+
+
+class EventLog:
+    """
+    Fixed-capacity ring of navigation events.
+
+    Numeric fields live in one preallocated structured array, strings in a
+    parallel list, so appending is O(1) and memory stays bounded however
+    long the environment runs; once full, the oldest records are
+    overwritten. With `spill_path`, every record is also appended to a
+    compact binary file (see `read_spill()`) for offline analysis.
+    """
+
+    def __init__(self, capacity=4096, spill_path=None):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._numeric = np.zeros(capacity, dtype=_NUMERIC)
+        self._paths = [None] * capacity
+        self._views = [None] * capacity
+        self._total = 0
+        self._lock = threading.Lock()
+
+        self.spill_path = spill_path
+        self._spill = None
+        if spill_path is not None:
+            self._spill = open(spill_path, "ab")
+            if self._spill.tell() == 0:
+                self._spill.write(SPILL_MAGIC)
+
+    def __len__(self):
+        return min(self._total, self.capacity)
+
+    @property
+    def total(self):
+        """Records appended since creation (including overwritten ones)."""
+        return self._total
+
+    @property
+    def overwritten(self):
+        return max(0, self._total - self.capacity)
+
+    def append(self, time, path, view, episode=0, step=0, seq=-1):
+        path = path or ""
+        view = view or ""
+        with self._lock:
+            i = self._total % self.capacity
+            self._numeric[i] = (time, episode, step, seq)
+            self._paths[i] = path
+            self._views[i] = view
+            self._total += 1
+
+            if self._spill is not None:
+                p = path.encode("utf-8", "surrogateescape")[:0xFFFF]
+                v = view.encode("utf-8", "surrogateescape")[:0xFFFF]
+                self._spill.write(_SPILL_RECORD.pack(time, episode, step, seq, len(p), len(v)))
+                self._spill.write(p)
+                self._spill.write(v)
+
+    def _ordered(self):
+        """Ring indices, oldest first."""
+        n = len(self)
+        start = self._total - n
+        return (np.arange(start, start + n) % self.capacity)
+
+    def query(self, since=None, until=None, episode=None, step=None, path_prefix=None, last=None):
+        """
+        Records (oldest first) matching every given filter.
+
+        :param since / until: host time bounds (inclusive)
+        :param episode / step: exact episode counter / step index
+        :param path_prefix: only paths starting with this prefix
+        :param last: only the newest `last` matches
+        """
+        with self._lock:
+            idx = self._ordered()
+            rows = self._numeric[idx]
+            mask = np.ones(len(idx), dtype=bool)
+            if since is not None:
+                mask &= rows["time"] >= since
+            if until is not None:
+                mask &= rows["time"] <= until
+            if episode is not None:
+                mask &= rows["episode"] == episode
+            if step is not None:
+                mask &= rows["step"] == step
+            idx, rows = idx[mask], rows[mask]
+
+            out = []
+            for i, (t, ep, st, sq) in zip(idx.tolist(), rows.tolist()):
+                path = self._paths[i]
+                if path_prefix is not None and not path.startswith(path_prefix):
+                    continue
+                out.append(EventRecord(t, ep, st, sq, path, self._views[i]))
+        if last is not None:
+            out = out[-last:] if last > 0 else []
+        return out
+
+    def latest(self):
+        records = self.query(last=1)
+        return records[0] if records else None
+
+    def as_array(self):
+        """Numeric columns (time, episode, step, seq) of the buffered records, oldest first."""
+        with self._lock:
+            return self._numeric[self._ordered()].copy()
+
+    def flush(self):
+        if self._spill is not None:
+            self._spill.flush()
+
+    def close(self):
+        with self._lock:
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+
+
+def read_spill(path):
+    """Iterate the EventRecords of a spill file written by EventLog."""
+    with open(path, "rb") as f:
+        if f.read(len(SPILL_MAGIC)) != SPILL_MAGIC:
+            raise ValueError(f"{path!r} is not an event log")
+        while True:
+            head = f.read(_SPILL_RECORD.size)
+            if len(head) < _SPILL_RECORD.size:
+                return
+            t, ep, st, sq, lp, lv = _SPILL_RECORD.unpack(head)
+            strings = f.read(lp + lv)
+            if len(strings) < lp + lv:
+                return
+            yield EventRecord(
+                t, ep, st, sq,
+                strings[:lp].decode("utf-8", "surrogateescape"),
+                strings[lp:].decode("utf-8", "surrogateescape"),
+            )
@@ -0,0 +1,231 @@
+import json
+import os
+import selectors
+import socket
+import struct
+import threading
+import time
+
+
+_LENGTH = struct.Struct(">I")
+MAX_FRAME = 1 << 20
+
+
+class NavigationEventChannel:
+    """
+    Host end of the Nautilus extension's event stream.
+
+    The extension connects to a Unix socket in the shared home directory
+    and sends length-prefixed JSON frames, each carrying a sequence number
+    (gaps are counted as dropped events). For container images whose
+    extension predates the socket, the legacy FIFO is read as well; the
+    channel keeps its own write end open so a detached reader never
+    loses FIFO events and the FIFO never reports EOF.
+
+    One selector thread serves both. Every event is passed to `on_event`
+    and can be waited on with `wait_for_event()`.
+    """
+
+    def __init__(self, sock_path, fifo_path=None, on_event=None):
+        self.sock_path = sock_path
+        self.fifo_path = fifo_path
+        self.on_event = on_event
+
+        self._cond = threading.Condition()
+        self._count = 0
+        self._latest = None
+        self._dropped = 0
+        self._connections = 0
+        self._closed = False
+
+        self._sel = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        self._sel.register(self._wake_r, selectors.EVENT_READ, ("wake", None))
+
+        try:
+            os.remove(sock_path)
+        except FileNotFoundError:
+            pass
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(sock_path)
+        self._server.listen(8)
+        self._server.setblocking(False)
+        self._sel.register(self._server, selectors.EVENT_READ, ("accept", None))
+
+        self._fifo_r = self._fifo_w = None
+        if fifo_path is not None:
+            try:
+                os.mkfifo(fifo_path)
+            except FileExistsError:
+                pass
+            self._fifo_r = os.open(fifo_path, os.O_RDONLY | os.O_NONBLOCK)
+            self._fifo_w = os.open(fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+            self._sel.register(self._fifo_r, selectors.EVENT_READ, ("fifo", bytearray()))
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------ reader
+
+    def _run(self):
+        while not self._closed:
+            try:
+                ready = self._sel.select()
+            except (OSError, ValueError):
+                break
+            for key, _ in ready:
+                kind, buf = key.data
+                if kind == "wake":
+                    return
+                if kind == "accept":
+                    self._accept()
+                elif kind == "conn":
+                    self._read_socket(key.fileobj, buf)
+                elif kind == "fifo":
+                    self._read_fifo(buf)
+
+    def _accept(self):
+        try:
+            conn, _ = self._server.accept()
+        except (BlockingIOError, OSError):
+            return
+        conn.setblocking(False)
+        self._connections += 1
+        # per-connection receive buffer and last sequence number seen
+        self._sel.register(conn, selectors.EVENT_READ, ("conn", [bytearray(), None]))
+
+    def _drop_conn(self, conn):
+        try:
+            self._sel.unregister(conn)
+        except (KeyError, ValueError):
+            pass
+        conn.close()
+
+    def _read_socket(self, conn, state):
+        try:
+            data = conn.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._drop_conn(conn)
+            return
+
+        buf = state[0]
+        buf += data
+        while len(buf) >= _LENGTH.size:
+            (length,) = _LENGTH.unpack_from(buf)
+            if length > MAX_FRAME:
+                print(f"[NavigationEventChannel] oversized frame ({length} bytes), dropping connection")
+                self._drop_conn(conn)
+                return
+            if len(buf) < _LENGTH.size + length:
+                break
+            payload = bytes(buf[_LENGTH.size:_LENGTH.size + length])
+            del buf[:_LENGTH.size + length]
+            event = self._decode(payload)
+            if event is None:
+                continue
+            seq = event.get("seq")
+            if isinstance(seq, int):
+                if state[1] is not None and seq > state[1] + 1:
+                    self._dropped += seq - state[1] - 1
+                state[1] = seq
+            self._dispatch(event)
+
+    def _read_fifo(self, buf):
+        try:
+            data = os.read(self._fifo_r, 65536)
+        except BlockingIOError:
+            return
+        buf += data
+        while True:
+            nl = buf.find(b"\n")
+            if nl < 0:
+                break
+            line = bytes(buf[:nl])
+            del buf[:nl + 1]
+            event = self._decode(line)
+            if event is not None:
+                self._dispatch(event)
+
+    @staticmethod
+    def _decode(payload):
+        try:
+            event = json.loads(payload)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return None
+        return event if isinstance(event, dict) else None
+
+    def _dispatch(self, event):
+        event["received"] = time.time()
+        with self._cond:
+            self._count += 1
+            event["count"] = self._count
+            self._latest = event
+            self._cond.notify_all()
+        if self.on_event is not None:
+            try:
+                self.on_event(event)
+            except Exception as e:
+                print(f"[NavigationEventChannel] event handler failed: {e}")
+
+    # ------------------------------------------------------------------ API
+
+    @property
+    def count(self):
+        """Number of events received so far."""
+        return self._count
+
+    @property
+    def latest(self):
+        return self._latest
+
+    def wait_for_event(self, timeout=None, after=None):
+        """
+        Block until an event newer than `after` (an event count; default: the
+        count at call time) arrives. Returns the event dict, or None on
+        timeout. The dict is the extension's message plus "count" and
+        "received" (host time).
+        """
+        with self._cond:
+            if after is None:
+                after = self._count
+            if not self._cond.wait_for(lambda: self._count > after or self._closed, timeout):
+                return None
+            return self._latest if self._count > after else None
+
+    def stats(self):
+        return {"events": self._count, "dropped": self._dropped, "connections": self._connections}
+
+    def close(self):
+        if self._closed:
+            return
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        try:
+            os.write(self._wake_w, b"x")
+        except OSError:
+            pass
+        self._thread.join(timeout=1.0)
+
+        for key in list(self._sel.get_map().values()):
+            if key.data[0] == "conn":
+                key.fileobj.close()
+        self._sel.close()
+        self._server.close()
+        for fd in (self._wake_r, self._wake_w, self._fifo_r, self._fifo_w):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        for path in (self.sock_path, self.fifo_path):
+            if path is not None:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
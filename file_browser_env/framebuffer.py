@@ -0,0 +1,161 @@
+import threading
+
+import numpy as np
+from PIL import Image
+from twisted.internet.defer import Deferred
+from vncdotool.client import RGB32, VNCDoToolClient, VNCDoToolFactory
+
+
+class Framebuffer:
+    """
+    Numpy-backed copy of a remote VNC screen.
+
+    The VNC client applies every dirty rectangle it receives straight into
+    `array`, so reading an observation is a slice of memory that is already
+    current instead of a full-screen capture round trip.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.array = np.zeros((height, width, 3), dtype=np.uint8)
+        self.version = 0
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._committed = threading.Condition()
+
+    def resize(self, width, height):
+        with self._lock:
+            if (width, height) == (self.width, self.height):
+                return
+            grown = np.zeros((height, width, 3), dtype=np.uint8)
+            h, w = min(height, self.height), min(width, self.width)
+            grown[:h, :w] = self.array[:h, :w]
+            self.array = grown
+            self.width, self.height = width, height
+
+    def update(self, x, y, width, height, data):
+        """
+        Apply a raw rectangle in the RGB-first byte order both clients
+        negotiate (32bpp RGBX, or packed 24bpp RGB).
+        """
+        pixels = np.frombuffer(data, dtype=np.uint8)
+        channels = pixels.size // (width * height)
+        if channels not in (3, 4):
+            raise ValueError(f"Unsupported pixel size {channels} bytes; expected RGB or RGBX")
+        pixels = pixels.reshape(height, width, channels)
+        with self._lock:
+            self.array[y:y + height, x:x + width] = pixels[..., :3]
+
+    def copy_rect(self, srcx, srcy, x, y, width, height):
+        """Apply a CopyRect update."""
+        with self._lock:
+            self.array[y:y + height, x:x + width] = self.array[srcy:srcy + height, srcx:srcx + width].copy()
+
+    def commit(self):
+        """Mark the end of one FramebufferUpdate message."""
+        with self._committed:
+            self.version += 1
+            self._committed.notify_all()
+        self._ready.set()
+
+    def wait_for_update(self, version, timeout=None):
+        """
+        Block until an update newer than `version` has been committed.
+        Returns the current version (unchanged if the wait timed out).
+        """
+        with self._committed:
+            self._committed.wait_for(lambda: self.version > version, timeout)
+            return self.version
+
+    def wait_ready(self, timeout=None):
+        """Block until the first full frame has arrived."""
+        if not self._ready.wait(timeout):
+            raise TimeoutError("No framebuffer update received")
+
+    def read(self, x, y, width, height, out=None):
+        """Copy a region of the screen into `out` (or a new array)."""
+        with self._lock:
+            region = self.array[y:y + height, x:x + width]
+            if out is None:
+                return region.copy()
+            np.copyto(out, region)
+            return out
+
+
+class FramebufferClient(VNCDoToolClient):
+    """
+    vncdotool client that mirrors the remote screen into a Framebuffer.
+
+    After the initial full update it keeps one incremental
+    FramebufferUpdateRequest outstanding at all times, so the server only
+    ever sends the rectangles that changed.
+    """
+
+    def vncConnectionMade(self):
+        self.factory.framebuffer = Framebuffer(self.width, self.height)
+        # vncdotool keeps the server's pixel format when it knows it (x11vnc
+        # defaults to BGRX, some servers to 16bpp); the mirror needs RGB
+        # first, so ask for 32bpp RGBX before the first update request
+        if self.pixel_format != RGB32:
+            self.setPixelFormat(RGB32)
+        super().vncConnectionMade()
+        self.framebufferUpdateRequest(incremental=0)
+
+    def updateRectangle(self, x, y, width, height, data):
+        if not data:
+            return
+        fb = self.factory.framebuffer
+        if fb.width < x + width or fb.height < y + height:
+            fb.resize(max(fb.width, x + width), max(fb.height, y + height))
+        fb.update(x, y, width, height, data)
+
+    def copyRectangle(self, srcx, srcy, x, y, width, height):
+        self.factory.framebuffer.copy_rect(srcx, srcy, x, y, width, height)
+
+    def commitUpdate(self, rectangles=None):
+        self.factory.framebuffer.commit()
+        if self.deferred:
+            d = self.deferred
+            self.deferred = None
+            d.callback(self)
+        self.framebufferUpdateRequest(incremental=1)
+
+    def runMacro(self, events):
+        """
+        Send a batch of input events in one go. `events` is a list of
+        (method, *args) with method one of mouseMove, mouseDown, mouseUp,
+        keyDown, keyUp. Called through the threaded proxy, the whole batch
+        runs in the reactor thread and costs a single round trip.
+        """
+        for name, *args in events:
+            getattr(self, name)(*args)
+        return self
+
+
+class FramebufferFactory(VNCDoToolFactory):
+    protocol = FramebufferClient
+    framebuffer = None
+
+
+class RegionCaptureClient(VNCDoToolClient):
+    """
+    vncdotool client whose captures ask the server for the captured
+    rectangle only, so a small region costs a small update instead of a
+    full-screen one.
+    """
+
+    def captureRegionPIL(self, callback, x, y, w, h):
+        """Request (x, y, w, h) and pass it to `callback` as a PIL image."""
+        if self.screen is None:
+            # a region update must not become the whole screen
+            self.screen = Image.new("RGB", (self.width, self.height), "black")
+        d = self.deferred = Deferred()
+        self.framebufferUpdateRequest(x, y, w, h, incremental=0)
+        d.addCallback(lambda _: callback(self.screen.crop((x, y, x + w, y + h))))
+        d.addCallback(lambda _: self)
+        return d
+
+
+class RegionCaptureFactory(VNCDoToolFactory):
+    protocol = RegionCaptureClient
@@ -0,0 +1,167 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+
+_INDENT = 2
+_SIZE_RE = re.compile(r'^\s*([\d.]+)\s*(B|KB|MB|GB)\s*$', re.IGNORECASE)
+_UNITS = {'B': 1, 'KB': 1024, 'MB': 1024**2, 'GB': 1024**3}
+
+# File mtimes go back up to a year, directory mtimes up to a month
+FILE_MTIME_SPAN = 365 * 24 * 3600
+DIR_MTIME_SPAN = 30 * 24 * 3600
+
+
+class TemplateEntry(namedtuple("TemplateEntry", ["depth", "name", "is_dir", "size", "path"])):
+    """
+    One line of a tree template.
+
+    depth: indentation level; name: the entry as written (files may carry
+    sub-paths); size: file size in bytes (0 for directories); path: the
+    entry's path relative to the home directory.
+    """
+    __slots__ = ()
+
+
+def parse_size(size_str):
+    m = _SIZE_RE.match(size_str)
+    if not m:
+        raise ValueError(f"Cannot parse size: {size_str!r}")
+    num, unit = m.groups()
+    return int(float(num) * _UNITS[unit.upper()])
+
+
+def parse_template(lines):
+    """Parse indented template lines into a list of TemplateEntry records."""
+    records = []
+    stack = []
+    for line in lines:
+        leading = len(line) - len(line.lstrip(' '))
+        level = leading // _INDENT
+        entry = line.strip()
+
+        if entry.endswith('/'):
+            name = entry[:-1]
+            stack = stack[:level] + [name]
+            records.append(TemplateEntry(level, name, True, 0, "/".join(stack)))
+        else:
+            name_part, size_part = entry.rsplit('(', 1)
+            name = name_part.strip()
+            size = parse_size(size_part.rstrip(')'))
+            records.append(TemplateEntry(level, name, False, size, "/".join(stack[:level] + [name])))
+    return records
+
+
+class TemplatePlan(namedtuple("TemplatePlan", ["records", "dirs", "files"])):
+    """
+    A parsed template in creation order.
+
+    dirs: every directory exactly once, parents before children; files:
+    (path, size) for every file entry. Both are relative to the home root.
+    """
+    __slots__ = ()
+
+
+def plan_template(records):
+    """Work out once which directories and files `records` needs, so creating it is a flat loop."""
+    dirs = []
+    seen = set()
+    for rec in records:
+        # file names may include sub-paths, so every parent is listed too
+        parent = rec.path if rec.is_dir else os.path.dirname(rec.path)
+        parts = parent.split("/") if parent else []
+        for i in range(1, len(parts) + 1):
+            path = "/".join(parts[:i])
+            if path not in seen:
+                seen.add(path)
+                dirs.append(path)
+    files = tuple((rec.path, rec.size) for rec in records if not rec.is_dir)
+    return TemplatePlan(records, tuple(dirs), files)
+
+
+def materialise(plan, root):
+    """Create every entry of a TemplatePlan (or plain records) under `root`; files are sparse."""
+    if not isinstance(plan, TemplatePlan):
+        plan = plan_template(plan)
+    os.makedirs(root, exist_ok=True)
+    for path in plan.dirs:
+        try:
+            os.mkdir(os.path.join(root, path))
+        except FileExistsError:
+            pass
+    for path, size in plan.files:
+        fd = os.open(os.path.join(root, path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+        finally:
+            os.close(fd)
+
+
+def randomise_mtimes(records, root, now=None, rng=np.random):
+    """
+    Stamp random mtimes on every entry: all timestamps are drawn in one
+    vectorised call, files first and directories after their children.
+    """
+    if not records:
+        return
+    now = time.time() if now is None else now
+    is_dir = np.fromiter((rec.is_dir for rec in records), dtype=bool, count=len(records))
+    span = np.where(is_dir, DIR_MTIME_SPAN, FILE_MTIME_SPAN)
+    mtimes = now - rng.uniform(0, 1, len(records)) * span
+
+    order = np.argsort(is_dir, kind="stable")
+    for i in order.tolist():
+        t = float(mtimes[i])
+        try:
+            os.utime(os.path.join(root, records[i].path), (t, t))
+        except FileNotFoundError:
+            pass
+
+
+class TemplateCache:
+    """
+    Process-wide LRU cache of parsed templates.
+
+    A template is loaded and planned (see plan_template) the first time it
+    is used; every episode then creates the tree straight into the home
+    root from the cached plan, with one mkdir per directory and one
+    open/ftruncate per file, and re-stamps the mtimes. Loading runs outside
+    the lock, so one slow template does not hold up other environments.
+
+    At most `max_templates` plans are kept; the least recently used one is
+    dropped when a new template needs room.
+    """
+
+    max_templates = 4096
+
+    _lock = threading.Lock()
+    _plans = OrderedDict()   # template key -> TemplatePlan
+
+    @classmethod
+    def get(cls, key, load):
+        """Return the TemplatePlan for `key`, calling `load()` for its records on first use."""
+        with cls._lock:
+            plan = cls._plans.get(key)
+            if plan is not None:
+                cls._plans.move_to_end(key)
+                return plan
+        # two threads may plan the same template at once; both results are identical
+        plan = plan_template(load())
+        with cls._lock:
+            cls._plans[key] = plan
+            cls._plans.move_to_end(key)
+            while len(cls._plans) > cls.max_templates:
+                cls._plans.popitem(last=False)
+        return plan
+
+    @classmethod
+    def populate(cls, key, root, load, rng=np.random):
+        """Build the template into `root`, then randomise mtimes; returns its records."""
+        plan = cls.get(key, load)
+        materialise(plan, root)
+        randomise_mtimes(plan.records, root, rng=rng)
+        return plan.records
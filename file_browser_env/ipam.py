@@ -0,0 +1,106 @@
+import threading
+from collections import deque
+from ipaddress import ip_address, ip_network
+
+
+class AddressPoolExhausted(Exception):
+    pass
+
+
+class SubnetAllocator:
+    """
+    Container addresses spread over several bridge networks.
+
+    Networks are /`prefix` blocks carved, in order, out of `supernet`
+    (by default 172.<subnet>.0.0/16 in /24s, so the first one is the
+    original 172.<subnet>.0.0/24). A network is only created, through
+    `ensure_network(name, cidr)`, when every existing one is full, up to
+    `max_networks`. Free addresses sit in one free-list, so acquiring and
+    releasing are O(1).
+    """
+
+    def __init__(self, base_name, supernet, ensure_network, prefix=24, max_networks=16):
+        self.base_name = base_name
+        self.supernet = ip_network(supernet)
+        self.ensure_network = ensure_network
+        self.max_networks = max_networks
+        self._blocks = self.supernet.subnets(new_prefix=prefix)
+
+        self._lock = threading.Lock()
+        self._networks = []      # (name, ip_network)
+        self._free = deque()     # addresses ready to hand out
+        self._owner = {}         # address -> network name
+        self._leased = set()
+
+    def network_name(self, index):
+        # the first network keeps the historical, suffix-less name
+        return self.base_name if index == 0 else f"{self.base_name}_{index}"
+
+    @property
+    def networks(self):
+        return list(self._networks)
+
+    def _grow(self):
+        if len(self._networks) >= self.max_networks:
+            raise AddressPoolExhausted(
+                f"All {self.max_networks} networks of {self.base_name} are full"
+            )
+        block = next(self._blocks, None)
+        if block is None:
+            raise AddressPoolExhausted(f"{self.supernet} has no room for another network")
+        name = self.network_name(len(self._networks))
+        self.ensure_network(name, str(block))
+        self._networks.append((name, block))
+        # skip the gateway (.1)
+        for ip in list(block.hosts())[1:]:
+            ip = str(ip)
+            self._owner[ip] = name
+            if ip not in self._leased:
+                self._free.append(ip)
+
+    def initialize(self):
+        """Create (or load) the first network."""
+        with self._lock:
+            if not self._networks:
+                self._grow()
+
+    def acquire(self, owner=None):
+        """Lease a free address; returns (ip, network name)."""
+        with self._lock:
+            while True:
+                while self._free:
+                    ip = self._free.popleft()
+                    if ip not in self._leased:
+                        self._leased.add(ip)
+                        return ip, self._owner[ip]
+                self._grow()
+
+    def reserve(self, ip, owner=None):
+        """Mark a caller-chosen (static) address as leased; returns its network name."""
+        with self._lock:
+            self._leased.add(ip)
+            name = self._owner.get(ip)
+            if name is None:
+                addr = ip_address(ip)
+                name = next((n for n, net in self._networks if addr in net), None)
+            return name or self.network_name(0)
+
+    def release(self, ip):
+        with self._lock:
+            if ip in self._leased:
+                self._leased.discard(ip)
+                if ip in self._owner:
+                    self._free.append(ip)
+
+    def take_reclaimed(self):
+        """Containers of dead processes to remove; leases are per process here, so none."""
+        return []
+
+    def available(self):
+        """Free addresses in the networks created so far."""
+        with self._lock:
+            return len(self._free)
+
+    def leased(self):
+        with self._lock:
+            return len(self._leased)
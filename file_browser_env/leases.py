@@ -0,0 +1,227 @@
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from ipaddress import ip_address, ip_network
+
+from .ipam import AddressPoolExhausted
+
+
+def _proc_start(pid):
+    """Start time (clock ticks since boot) of `pid`, or None if unknown / not running."""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # the command name may contain spaces; fields resume after the last ')'
+    return int(stat.rsplit(b")", 1)[1].split()[19])
+
+
+class HostLeaseAllocator:
+    """
+    Address allocator shared by every process on the host.
+
+    State (networks created so far and one lease per address: owning pid,
+    pid start time, container name, last heartbeat) lives in a JSON file
+    that is only read and rewritten under an exclusive `flock`. Leases whose
+    process is gone (or, without /proc, whose heartbeat is older than
+    `lease_ttl`) are reclaimed by whoever takes the lock next, and their
+    container names are reported so they can be removed. A daemon thread
+    refreshes this process's heartbeats every `lease_ttl / 3` seconds.
+
+    Same interface as SubnetAllocator, plus `live_owners()`; the reclaimed
+    container names are handed out once by `take_reclaimed()`.
+    """
+
+    def __init__(self, base_name, supernet, ensure_network, prefix=24, max_networks=16,
+                 state_dir=None, lease_ttl=30.0):
+        self.base_name = base_name
+        self.supernet = ip_network(supernet)
+        self.prefix = prefix
+        self.ensure_network = ensure_network
+        self.max_networks = max_networks
+        self.lease_ttl = lease_ttl
+
+        state_dir = state_dir or os.environ.get("FB_ENV_STATE_DIR") or tempfile.gettempdir()
+        os.makedirs(state_dir, exist_ok=True)
+        self.state_path = os.path.join(state_dir, f"{base_name}.leases.json")
+        self.lock_path = self.state_path + ".lock"
+
+        self.pid = None
+        self.start = None
+        self._mine = set()
+        self._mine_lock = threading.Lock()
+        self._heartbeat = None
+        self._reclaimed = []   # container names of leases reclaimed from dead processes
+        self._reclaimed_lock = threading.Lock()
+
+    def _me(self):
+        """(pid, start time) of the current process; re-read after a fork."""
+        pid = os.getpid()
+        if pid != self.pid:
+            self.pid, self.start = pid, _proc_start(pid)
+            with self._mine_lock:
+                self._mine = set()
+            self._heartbeat = None
+        return self.pid, self.start
+
+    # ---------------------------------------------------------------- state
+
+    @contextmanager
+    def _locked_state(self):
+        self._me()
+        with open(self.lock_path, "a+") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.state_path, encoding="utf-8") as f:
+                        state = json.load(f)
+                except (FileNotFoundError, json.JSONDecodeError):
+                    state = {"networks": [], "leases": {}}
+                yield state
+                tmp = f"{self.state_path}.{self.pid}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(state, f)
+                os.replace(tmp, self.state_path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _alive(self, lease, now):
+        pid = lease["pid"]
+        if pid == self.pid and lease.get("start") == self.start:
+            return True
+        if lease.get("start") is not None and os.path.isdir("/proc"):
+            return _proc_start(pid) == lease["start"]
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return now - lease.get("heartbeat", 0) <= self.lease_ttl
+
+    def _reclaim(self, state):
+        now = time.time()
+        for ip, lease in list(state["leases"].items()):
+            if not self._alive(lease, now):
+                del state["leases"][ip]
+                if lease.get("owner"):
+                    # the flock only orders processes; threads of this one
+                    # take the list through take_reclaimed()
+                    with self._reclaimed_lock:
+                        self._reclaimed.append(lease["owner"])
+                print(f"[HostLeaseAllocator] reclaimed {ip} from dead process {lease['pid']}")
+
+    def _grow(self, state):
+        if len(state["networks"]) >= self.max_networks:
+            raise AddressPoolExhausted(f"All {self.max_networks} networks of {self.base_name} are full")
+        blocks = self.supernet.subnets(new_prefix=self.prefix)
+        index = len(state["networks"])
+        block = next((b for i, b in enumerate(blocks) if i == index), None)
+        if block is None:
+            raise AddressPoolExhausted(f"{self.supernet} has no room for another network")
+        name = self.base_name if index == 0 else f"{self.base_name}_{index}"
+        self.ensure_network(name, str(block))
+        state["networks"].append([name, str(block)])
+
+    def _lease(self, state, ip, name, owner):
+        state["leases"][ip] = {
+            "pid": self.pid, "start": self.start, "network": name,
+            "owner": owner, "heartbeat": time.time(),
+        }
+        with self._mine_lock:
+            self._mine.add(ip)
+        self._start_heartbeat()
+
+    # ---------------------------------------------------------------- API
+
+    def initialize(self):
+        with self._locked_state() as state:
+            self._reclaim(state)
+            if not state["networks"]:
+                self._grow(state)
+            else:
+                # another process created them; make sure they still exist
+                for name, cidr in state["networks"]:
+                    self.ensure_network(name, cidr)
+
+    def acquire(self, owner=None):
+        """Lease a free address for `owner` (a container name); returns (ip, network name)."""
+        with self._locked_state() as state:
+            self._reclaim(state)
+            leases = state["leases"]
+            while True:
+                for name, cidr in state["networks"]:
+                    for ip in list(ip_network(cidr).hosts())[1:]:
+                        ip = str(ip)
+                        if ip not in leases:
+                            self._lease(state, ip, name, owner)
+                            return ip, name
+                self._grow(state)
+
+    def reserve(self, ip, owner=None):
+        with self._locked_state() as state:
+            addr = ip_address(ip)
+            name = next((n for n, cidr in state["networks"] if addr in ip_network(cidr)), self.base_name)
+            other = state["leases"].get(ip)
+            if other is not None and other["pid"] != self.pid:
+                print(f"[HostLeaseAllocator] {ip} is leased by process {other['pid']}; taking it over")
+            self._lease(state, ip, name, owner)
+            return name
+
+    def release(self, ip):
+        with self._mine_lock:
+            self._mine.discard(ip)
+        with self._locked_state() as state:
+            lease = state["leases"].get(ip)
+            if lease is not None and lease["pid"] == self.pid:
+                del state["leases"][ip]
+
+    def take_reclaimed(self):
+        """Container names of reclaimed leases not handed out yet; each is returned exactly once."""
+        with self._reclaimed_lock:
+            names, self._reclaimed = self._reclaimed, []
+        return names
+
+    def live_owners(self):
+        """Container names leased by processes that are still alive."""
+        with self._locked_state() as state:
+            self._reclaim(state)
+            return {lease["owner"] for lease in state["leases"].values() if lease.get("owner")}
+
+    def available(self):
+        with self._locked_state() as state:
+            total = sum(ip_network(cidr).num_addresses - 3 for _, cidr in state["networks"])
+            return total - len(state["leases"])
+
+    def leased(self):
+        with self._locked_state() as state:
+            return len(state["leases"])
+
+    # ---------------------------------------------------------------- heartbeat
+
+    def _start_heartbeat(self):
+        if self._heartbeat is None or not self._heartbeat.is_alive():
+            self._heartbeat = threading.Thread(target=self._beat, daemon=True)
+            self._heartbeat.start()
+
+    def _beat(self):
+        while True:
+            time.sleep(self.lease_ttl / 3)
+            with self._mine_lock:
+                mine = set(self._mine)
+            if not mine:
+                continue
+            try:
+                with self._locked_state() as state:
+                    now = time.time()
+                    for ip in mine:
+                        lease = state["leases"].get(ip)
+                        if lease is not None and lease["pid"] == self.pid:
+                            lease["heartbeat"] = now
+            except OSError as e:
+                print(f"[HostLeaseAllocator] heartbeat failed: {e}")
@@ -0,0 +1,151 @@
+import os
+import subprocess
+import tempfile
+
+import yaml
+from docker.errors import NotFound
+
+
+class ContainerSpec:
+    """Everything needed to start one fb_service container."""
+
+    def __init__(self, name, project_name, service, network_name, ip_address, compose_data=None):
+        self.name = name
+        self.project_name = project_name
+        self.service = service
+        self.network_name = network_name
+        self.ip_address = ip_address
+        self.compose_data = compose_data
+        self.compose_file = None
+
+
+class ComposeBackend:
+    """Original lifecycle: a temporary compose file per instance and `docker-compose up/down`."""
+
+    name = "compose"
+
+    def up(self, spec):
+        # Write modified compose data to a temporary file for this instance
+        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".yaml")
+        with open(tmp.name, 'w') as file:
+            yaml.dump(spec.compose_data, file)
+        tmp.close()
+        spec.compose_file = tmp.name
+
+        # Start the container with the modified compose file and unique project name
+        try:
+            subprocess.run(
+                ["docker-compose", "-f", spec.compose_file, "up", "-d"],
+                check=True,
+                env=dict(os.environ, COMPOSE_PROJECT_NAME=spec.project_name)
+            )
+        except subprocess.CalledProcessError:
+            os.remove(spec.compose_file)
+            spec.compose_file = None
+            raise
+
+    def adopt(self, spec):
+        """Take over an already running container: only write the compose file `down` needs."""
+        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".yaml")
+        with open(tmp.name, 'w') as file:
+            yaml.dump(spec.compose_data, file)
+        tmp.close()
+        spec.compose_file = tmp.name
+
+    def down(self, spec):
+        try:
+            subprocess.run(
+                ["docker-compose", "-f", spec.compose_file, "down"],
+                check=True,
+                env=dict(os.environ, COMPOSE_PROJECT_NAME=spec.project_name)
+            )
+        except subprocess.CalledProcessError as e:
+            print(f"Error stopping container: {e}")
+
+        # Remove the modified compose file if it exists
+        try:
+            if spec.compose_file and os.path.exists(spec.compose_file):
+                os.remove(spec.compose_file)
+        except PermissionError as e:
+            print(f"Permission error when trying to delete file {spec.compose_file}: {e}")
+
+
+class DockerSDKBackend:
+    """
+    Lifecycle through the Docker SDK's low-level API: create, start, stop
+    and remove containers directly, with no compose files and no CLI forks.
+    The container name and labels match what docker-compose would produce,
+    so the rest of FBEnvironment (exec_run, cleanup) is unaffected.
+    """
+
+    name = "sdk"
+
+    def __init__(self, client, stop_timeout=2):
+        self.client = client
+        self.api = client.api
+        self.stop_timeout = stop_timeout
+
+    def _create_kwargs(self, spec):
+        svc = spec.service
+        restart = svc.get("restart")
+        restart_policy = None
+        if restart and restart != "no":
+            restart_policy = {"Name": restart}
+
+        host_config = self.api.create_host_config(
+            binds=list(svc.get("volumes", [])),
+            security_opt=svc.get("security_opt"),
+            restart_policy=restart_policy,
+            network_mode=spec.network_name,
+        )
+        networking_config = self.api.create_networking_config({
+            spec.network_name: self.api.create_endpoint_config(ipv4_address=spec.ip_address)
+        })
+        labels = dict(svc.get("labels", {}))
+        labels.setdefault("com.docker.compose.project", spec.project_name)
+        labels.setdefault("com.docker.compose.service", "fb_service")
+
+        return dict(
+            image=svc["image"],
+            name=spec.name,
+            environment={k: str(v) for k, v in svc.get("environment", {}).items()},
+            labels=labels,
+            ports=[int(p) for p in svc.get("expose", [])],
+            host_config=host_config,
+            networking_config=networking_config,
+        )
+
+    def up(self, spec):
+        container = self.api.create_container(**self._create_kwargs(spec))
+        try:
+            self.api.start(container["Id"])
+        except Exception:
+            self._remove(spec.name)
+            raise
+
+    def adopt(self, spec):
+        """Take over an already running container; nothing to create."""
+        pass
+
+    def _remove(self, name):
+        try:
+            self.api.remove_container(name, force=True)
+        except NotFound:
+            pass
+
+    def down(self, spec):
+        try:
+            self.api.stop(spec.name, timeout=self.stop_timeout)
+        except NotFound:
+            return
+        except Exception as e:
+            print(f"Error stopping container: {e}")
+        self._remove(spec.name)
+
+
+def make_backend(name, client):
+    if name == "compose":
+        return ComposeBackend()
+    if name == "sdk":
+        return DockerSDKBackend(client)
+    raise ValueError(f"Unknown container backend {name!r}, use 'compose' or 'sdk'")
@@ -0,0 +1,105 @@
+import numpy as np
+
+from .readiness import luminance_u8
+
+
+class AreaResize:
+    """
+    Area-averaging resize of (H, W, C) uint8 images to a fixed (h, w).
+
+    Every output pixel is the rounded mean of the input pixels that fall in
+    its bin. Bin boundaries are computed once, so each call is two
+    `np.add.reduceat` passes (or one reshape-mean when the sizes divide).
+    Upscaling repeats the nearest input pixel.
+    """
+
+    def __init__(self, in_hw, out_hw):
+        self.in_hw = tuple(in_hw)
+        self.out_hw = tuple(out_hw)
+        (H, W), (h, w) = self.in_hw, self.out_hw
+
+        self._exact = H % h == 0 and W % w == 0
+        self._rows, row_counts = self._bins(H, h)
+        self._cols, col_counts = self._bins(W, w)
+        area = np.outer(row_counts, col_counts).astype(np.uint32)
+        self._area = area[..., None]
+        self._half = (area // 2)[..., None]
+
+    @staticmethod
+    def _bins(n_in, n_out):
+        starts = (np.arange(n_out) * n_in) // n_out
+        ends = np.append(starts[1:], n_in)
+        counts = np.maximum(ends - starts, 1)
+        return starts, counts
+
+    def __call__(self, src, out):
+        (H, W), (h, w) = self.in_hw, self.out_hw
+        if self._exact:
+            fy, fx = H // h, W // w
+            acc = src.reshape(h, fy, w, fx, -1).sum(axis=(1, 3), dtype=np.uint32)
+        else:
+            acc = np.add.reduceat(src, self._rows, axis=0, dtype=np.uint32)
+            acc = np.add.reduceat(acc, self._cols, axis=1)
+        acc += self._half
+        acc //= self._area
+        np.copyto(out, acc, casting="unsafe")
+        return out
+
+
+class ObservationProcessor:
+    """
+    Turn raw (H, W, 3) frames into the configured observation:
+    optional single-channel luminance, optional area-averaged resize, and
+    optional stacking of the last `frame_stack` frames along the channel
+    axis (oldest first). Results are written into one preallocated buffer.
+    """
+
+    def __init__(self, in_hw, size=None, grayscale=False, frame_stack=1):
+        if frame_stack < 1:
+            raise ValueError("frame_stack must be at least 1")
+        self.in_hw = tuple(in_hw)
+        self.size = tuple(size) if size is not None else self.in_hw
+        self.grayscale = grayscale
+        self.frame_stack = frame_stack
+        self.channels = 1 if grayscale else 3
+
+        h, w = self.size
+        self._resize = AreaResize(self.in_hw, self.size) if self.size != self.in_hw else None
+        self._lum = np.empty(self.in_hw + (1,), dtype=np.uint8) if grayscale else None
+        self._frames = np.zeros((frame_stack, h, w, self.channels), dtype=np.uint8)
+        self._head = 0
+        self._primed = False
+        self.output = np.zeros((h, w, self.channels * frame_stack), dtype=np.uint8)
+
+    @property
+    def shape(self):
+        return self.output.shape
+
+    def reset(self):
+        """Start a new episode: the next frame fills the whole stack."""
+        self._primed = False
+
+    def _convert(self, frame, out):
+        if self.grayscale:
+            frame = luminance_u8(frame, out=self._lum[..., 0])[..., None]
+        if self._resize is not None:
+            self._resize(frame, out)
+        else:
+            np.copyto(out, frame)
+
+    def __call__(self, frame):
+        k = self.frame_stack
+        self._head = (self._head + 1) % k
+        self._convert(frame, self._frames[self._head])
+        if not self._primed:
+            self._frames[:] = self._frames[self._head]
+            self._primed = True
+
+        if k == 1:
+            return self._frames[0]
+
+        c = self.channels
+        for i in range(k):
+            slot = (self._head + 1 + i) % k
+            self.output[..., i * c:(i + 1) * c] = self._frames[slot]
+        return self.output
@@ -0,0 +1,169 @@
+import queue
+import threading
+
+from .env import FBEnvironment, FBEnvironmentException
+
+
+# Posted to the ready queue once a slot exhausted its launch retries
+_BROKEN = object()
+
+
+class FBEnvironmentPool:
+    """
+    Keep a number of FBEnvironment containers warm in the background.
+
+    Every pooled environment has already been reset (home populated,
+    Nautilus relaunched and themed) and has produced one usable frame, so
+    handing one out costs nothing more than a queue pop. Environments given
+    back through `release()` are reset on a background worker and then
+    become available again.
+
+    The pool owns `size` spare containers on top of the ones currently
+    leased out, so it needs `size + leased` addresses from the IP pool.
+
+    A slot whose container fails to launch is retried with exponential
+    backoff (`retry_backoff` seconds, doubling, capped at 30 s). After
+    `max_retries` failed attempts the pool is marked broken and `acquire()`
+    raises instead of waiting forever.
+    """
+
+    def __init__(self, size, height, width, workers=None, max_retries=5, retry_backoff=1.0, **env_kwargs):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+
+        self.size = size
+        self.height = height
+        self.width = width
+        self.env_kwargs = env_kwargs
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._ready = queue.Queue()
+        self._pending = queue.Queue()
+        self._closed = threading.Event()
+        self._lock = threading.Lock()
+        self._all = set()
+        self._error = None
+
+        # An int in the pending queue means "launch a brand new container";
+        # its value is the number of failed attempts for that slot so far
+        for _ in range(size):
+            self._pending.put(0)
+
+        self._workers = []
+        for _ in range(workers or size):
+            t = threading.Thread(target=self._worker, daemon=True)
+            t.start()
+            self._workers.append(t)
+
+    def _worker(self):
+        """Launch or recycle environments until the pool is closed."""
+        while not self._closed.is_set():
+            try:
+                item = self._pending.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            attempts = item if isinstance(item, int) else 0
+            env = None if isinstance(item, int) else item
+            try:
+                if env is None:
+                    env = FBEnvironment(self.height, self.width, **self.env_kwargs)
+                    with self._lock:
+                        self._all.add(env)
+                    env.getScreen()
+                else:
+                    env.reset()
+            except Exception as e:
+                print(f"[FBEnvironmentPool] failed to prepare environment: {e}")
+                if env is not None:
+                    self._discard(env)
+                # a recycled container that failed is replaced by a fresh one
+                self._retry(attempts + 1 if isinstance(item, int) else 0, e)
+                continue
+
+            if self._closed.is_set():
+                self._discard(env)
+            else:
+                self._ready.put(env)
+
+    def _retry(self, attempts, error):
+        """Re-queue a slot after a backoff delay, or mark the pool broken once it failed too often."""
+        if attempts > self.max_retries:
+            print(f"[FBEnvironmentPool] giving up on a slot after {attempts} failed launches")
+            first = self._error is None
+            self._error = error
+            if first:
+                # wake a waiter; acquire() re-posts it for the others
+                self._ready.put(_BROKEN)
+            return
+        if attempts:
+            delay = min(self.retry_backoff * 2 ** (attempts - 1), 30.0)
+            if self._closed.wait(delay):
+                return
+        self._pending.put(attempts)
+
+    def _discard(self, env):
+        with self._lock:
+            self._all.discard(env)
+        try:
+            env.close()
+        except Exception as e:
+            print(f"[FBEnvironmentPool] error closing environment: {e}")
+
+    def acquire(self, timeout=None, seed=None):
+        """
+        Return a warm, freshly reset environment, blocking until one is ready.
+
+        :param timeout: max seconds to wait (None = infinite)
+        :param seed: reset the environment with this seed before returning
+                     it. Background resets are unseeded, so this reset runs
+                     synchronously in the caller.
+        """
+        if self._closed.is_set():
+            raise FBEnvironmentException("Pool is closed")
+        try:
+            env = self._ready.get(timeout=timeout)
+        except queue.Empty:
+            raise FBEnvironmentException("Timed out waiting for a warm environment")
+        if env is _BROKEN:
+            self._ready.put(_BROKEN)
+            raise FBEnvironmentException(f"Pool cannot launch environments: {self._error}") from self._error
+        if seed is not None:
+            try:
+                env.reset(seed=seed)
+            except Exception:
+                self.release(env)
+                raise
+        return env
+
+    def release(self, env):
+        """Hand an environment back; it is reset asynchronously and reused."""
+        if self._closed.is_set():
+            self._discard(env)
+        else:
+            self._pending.put(env)
+
+    def swap(self, env, timeout=None, seed=None):
+        """Release `env` and return a warm replacement."""
+        fresh = self.acquire(timeout=timeout, seed=seed)
+        self.release(env)
+        return fresh
+
+    def ready_count(self):
+        """Number of environments that can be acquired without waiting."""
+        return self._ready.qsize() - (self._error is not None)
+
+    def close(self):
+        """Stop the background workers and close every pooled container."""
+        self._closed.set()
+        for t in self._workers:
+            t.join()
+        with self._lock:
+            envs = list(self._all)
+            self._all.clear()
+        for env in envs:
+            try:
+                env.close()
+            except Exception as e:
+                print(f"[FBEnvironmentPool] error closing environment: {e}")
@@ -0,0 +1,92 @@
+import time
+from collections import deque
+
+import numpy as np
+
+
+# Integer BT.601 luma weights scaled by 256: 77 R + 150 G + 29 B
+LUMA_WEIGHTS = (77, 150, 29)
+
+
+def luminance_u8(arr, out=None):
+    """
+    Integer luminance of an (H, W, 3) uint8 array, as uint8.
+
+    Same weights as 0.2989/0.5870/0.1140 to within one grey level, but
+    computed in uint16 without any float temporaries.
+    """
+    acc = arr[..., 0].astype(np.uint16) * LUMA_WEIGHTS[0]
+    acc += arr[..., 1].astype(np.uint16) * LUMA_WEIGHTS[1]
+    acc += arr[..., 2].astype(np.uint16) * LUMA_WEIGHTS[2]
+    acc >>= 8
+    if out is None:
+        return acc.astype(np.uint8)
+    np.copyto(out, acc, casting="unsafe")
+    return out
+
+
+class FrameReadiness:
+    """
+    Decide whether a frame is past the mostly-black loading screen.
+
+    Only a strided subsample of the frame is tested, and once one usable
+    frame has been seen the instance is considered warm and further frames
+    are not tested at all until `mark_cold()` (called on every reset).
+    The time from going cold to the first usable frame is recorded: count,
+    mean, min and max over the whole run, the median over the last
+    `window` episodes.
+    """
+
+    def __init__(self, stride=4, threshold=16, max_black=0.9, window=1024):
+        self.stride = stride
+        # lum < threshold  <=>  77 R + 150 G + 29 B < threshold * 256
+        self._limit = threshold << 8
+        self.max_black = max_black
+        self.warm = False
+        self._cold_since = time.time()
+        self._samples = deque(maxlen=window)
+        self._count = 0
+        self._total = 0.0
+        self._min = float("inf")
+        self._max = 0.0
+
+    def mark_cold(self):
+        self.warm = False
+        self._cold_since = time.time()
+
+    def check(self, arr):
+        """Return True if `arr` is usable; marks the instance warm if so."""
+        if self.warm:
+            return True
+
+        sub = arr[::self.stride, ::self.stride]
+        acc = sub[..., 0].astype(np.uint16) * LUMA_WEIGHTS[0]
+        acc += sub[..., 1].astype(np.uint16) * LUMA_WEIGHTS[1]
+        acc += sub[..., 2].astype(np.uint16) * LUMA_WEIGHTS[2]
+        frac_black = np.count_nonzero(acc < self._limit) / acc.size
+
+        if frac_black <= self.max_black:
+            self.warm = True
+            self._record(time.time() - self._cold_since)
+            return True
+        return False
+
+    def _record(self, seconds):
+        self._samples.append(seconds)
+        self._count += 1
+        self._total += seconds
+        self._min = min(self._min, seconds)
+        self._max = max(self._max, seconds)
+
+    def stats(self):
+        """Summary of time-to-first-usable-frame samples, in seconds."""
+        if not self._count:
+            return {"count": 0}
+        return {
+            "count": self._count,
+            "last": float(self._samples[-1]),
+            "mean": self._total / self._count,
+            "p50": float(np.median(self._samples)),
+            "min": self._min,
+            "max": self._max,
+        }
@@ -0,0 +1,329 @@
+import asyncio
+import re
+import struct
+import threading
+
+from .framebuffer import Framebuffer
+
+
+RAW_ENCODING = 0
+COPYRECT_ENCODING = 1
+DESKTOP_SIZE_ENCODING = -223
+
+# X11 keysyms for the key names FBEnvironment callers use; single
+# printable characters map to their code point.
+KEYMAP = {
+    "bsp": 0xff08, "backspace": 0xff08,
+    "tab": 0xff09,
+    "return": 0xff0d, "enter": 0xff0d,
+    "esc": 0xff1b, "escape": 0xff1b,
+    "ins": 0xff63, "insert": 0xff63,
+    "del": 0xffff, "delete": 0xffff,
+    "home": 0xff50, "end": 0xff57,
+    "left": 0xff51, "up": 0xff52, "right": 0xff53, "down": 0xff54,
+    "pgup": 0xff55, "pgdn": 0xff56,
+    "shift": 0xffe1, "lshift": 0xffe1, "rshift": 0xffe2,
+    "ctrl": 0xffe3, "lctrl": 0xffe3, "rctrl": 0xffe4,
+    "meta": 0xffe7, "lmeta": 0xffe7, "rmeta": 0xffe8,
+    "alt": 0xffe9, "lalt": 0xffe9, "ralt": 0xffea,
+    "super": 0xffeb, "lsuper": 0xffeb, "rsuper": 0xffec,
+    "menu": 0xff67,
+    "space": 0x20,
+}
+KEYMAP.update({f"f{i}": 0xffbe + i - 1 for i in range(1, 13)})
+
+
+def keysym(key):
+    """Translate a key name (or single character) to an X11 keysym."""
+    if len(key) == 1:
+        return ord(key)
+    try:
+        return KEYMAP[key.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown key {key!r}")
+
+
+def split_combo(key):
+    """Split 'ctrl+c' / 'ctrl-c' into its keys; a lone '-' or '+' is a key."""
+    if len(key) == 1:
+        return [key]
+    return [k for k in re.split(r"[+-]", key) if k]
+
+
+def _vnc_auth_response(password, challenge):
+    """DES-encrypt the 16-byte challenge with the VNC password (bit-reversed key)."""
+    key = (password.encode("latin-1") + b"\0" * 8)[:8]
+    key = bytes(int(f"{b:08b}"[::-1], 2) for b in key)
+    try:
+        from Cryptodome.Cipher import DES
+        return DES.new(key, DES.MODE_ECB).encrypt(challenge)
+    except ImportError:
+        pass
+    try:
+        from Crypto.Cipher import DES
+        return DES.new(key, DES.MODE_ECB).encrypt(challenge)
+    except ImportError:
+        pass
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    encryptor = Cipher(algorithms.TripleDES(key), modes.ECB()).encryptor()
+    return encryptor.update(challenge) + encryptor.finalize()
+
+
+class RFBError(Exception):
+    """Raised when the VNC server rejects or breaks the RFB session."""
+    pass
+
+
+class AsyncRFBClient:
+    """
+    Minimal asyncio RFB 3.3/3.8 client.
+
+    Requests 32-bit RGBX pixels with Raw and CopyRect encodings, mirrors
+    the screen into a Framebuffer and keeps one incremental update request
+    in flight, like the vncdotool-based FramebufferClient.
+    """
+
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self.framebuffer = None
+        self.buttons = 0
+        self.name = ""
+        self._reader_task = None
+
+    async def connect(self, host, port=5900, password=None, timeout=None):
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port), timeout
+        )
+        await asyncio.wait_for(self._handshake(password), timeout)
+        self._reader_task = asyncio.ensure_future(self._read_loop())
+
+    async def _handshake(self, password):
+        banner = await self.reader.readexactly(12)
+        m = re.match(rb"RFB (\d{3})\.(\d{3})\n", banner)
+        if not m:
+            raise RFBError(f"Not an RFB server: {banner!r}")
+        version = (int(m.group(1)), int(m.group(2)))
+        version = min(version, (3, 8))
+        if version < (3, 7):
+            version = (3, 3)
+        self.writer.write(b"RFB %03d.%03d\n" % version)
+
+        if version == (3, 3):
+            (sectype,) = struct.unpack("!I", await self.reader.readexactly(4))
+            if sectype == 0:
+                raise RFBError(await self._read_reason())
+        else:
+            (count,) = struct.unpack("!B", await self.reader.readexactly(1))
+            if count == 0:
+                raise RFBError(await self._read_reason())
+            offered = await self.reader.readexactly(count)
+            if 2 in offered and password is not None:
+                sectype = 2
+            elif 1 in offered:
+                sectype = 1
+            else:
+                raise RFBError(f"No supported security type in {list(offered)}")
+            self.writer.write(struct.pack("!B", sectype))
+
+        if sectype == 2:
+            challenge = await self.reader.readexactly(16)
+            self.writer.write(_vnc_auth_response(password or "", challenge))
+
+        if sectype == 2 or version >= (3, 8):
+            (result,) = struct.unpack("!I", await self.reader.readexactly(4))
+            if result != 0:
+                reason = await self._read_reason() if version >= (3, 8) else "authentication failed"
+                raise RFBError(reason)
+
+        # ClientInit (shared session) and ServerInit
+        self.writer.write(b"\x01")
+        width, height = struct.unpack("!HH", await self.reader.readexactly(4))
+        await self.reader.readexactly(16)  # server pixel format, replaced below
+        (name_len,) = struct.unpack("!I", await self.reader.readexactly(4))
+        self.name = (await self.reader.readexactly(name_len)).decode("utf-8", "replace")
+        self.framebuffer = Framebuffer(width, height)
+
+        # SetPixelFormat: 32bpp, depth 24, little endian, true colour, RGBX
+        self.writer.write(struct.pack("!B3x", 0) + struct.pack(
+            "!BBBBHHHBBB3x", 32, 24, 0, 1, 255, 255, 255, 0, 8, 16
+        ))
+        encodings = [COPYRECT_ENCODING, RAW_ENCODING, DESKTOP_SIZE_ENCODING]
+        self.writer.write(struct.pack(f"!BxH{len(encodings)}i", 2, len(encodings), *encodings))
+        self._request_update(incremental=False)
+        await self.writer.drain()
+
+    async def _read_reason(self):
+        (length,) = struct.unpack("!I", await self.reader.readexactly(4))
+        return (await self.reader.readexactly(length)).decode("utf-8", "replace")
+
+    def _request_update(self, incremental=True):
+        fb = self.framebuffer
+        self.writer.write(struct.pack("!BBHHHH", 3, int(incremental), 0, 0, fb.width, fb.height))
+
+    async def _read_loop(self):
+        read = self.reader.readexactly
+        fb = self.framebuffer
+        try:
+            while True:
+                (msg,) = struct.unpack("!B", await read(1))
+                if msg == 0:  # FramebufferUpdate
+                    (nrects,) = struct.unpack("!xH", await read(3))
+                    for _ in range(nrects):
+                        x, y, w, h, enc = struct.unpack("!HHHHi", await read(12))
+                        if enc == RAW_ENCODING:
+                            fb.update(x, y, w, h, await read(w * h * 4))
+                        elif enc == COPYRECT_ENCODING:
+                            srcx, srcy = struct.unpack("!HH", await read(4))
+                            fb.copy_rect(srcx, srcy, x, y, w, h)
+                        elif enc == DESKTOP_SIZE_ENCODING:
+                            fb.resize(w, h)
+                        else:
+                            raise RFBError(f"Unsupported encoding {enc}")
+                    fb.commit()
+                    self._request_update(incremental=True)
+                elif msg == 1:  # SetColourMapEntries
+                    _, count = struct.unpack("!xHH", await read(5))
+                    await read(count * 6)
+                elif msg == 2:  # Bell
+                    pass
+                elif msg == 3:  # ServerCutText
+                    (length,) = struct.unpack("!3xI", await read(7))
+                    await read(length)
+                else:
+                    raise RFBError(f"Unknown server message {msg}")
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.writer.close()
+
+    @property
+    def connected(self):
+        return self._reader_task is not None and not self._reader_task.done()
+
+    async def send(self, data):
+        if not self.connected:
+            raise RFBError("RFB session is closed")
+        self.writer.write(data)
+        await self.writer.drain()
+
+    def pointer_event(self, x, y, buttons=None):
+        if buttons is not None:
+            self.buttons = buttons
+        return struct.pack("!BBHH", 5, self.buttons, x, y)
+
+    def key_event(self, key, down):
+        return struct.pack("!BBxxI", 4, int(down), keysym(key))
+
+    async def close(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+        elif self.writer is not None:
+            self.writer.close()
+
+
+class _LoopThread:
+    """One background asyncio loop shared by every AsyncVNCClient."""
+    _loop = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls):
+        with cls._lock:
+            if cls._loop is None:
+                loop = asyncio.new_event_loop()
+                t = threading.Thread(target=loop.run_forever, name="fb-rfb-loop", daemon=True)
+                t.start()
+                cls._loop = loop
+            return cls._loop
+
+
+class AsyncVNCClient:
+    """
+    Blocking facade over AsyncRFBClient with the vncdotool method names
+    FBEnvironment uses. All connections are multiplexed on one shared event
+    loop thread; each call only hops onto that loop to write its message.
+    """
+
+    def __init__(self, host, port=5900, password=None, timeout=None):
+        self._loop = _LoopThread.get()
+        self._timeout = timeout
+        self.client = AsyncRFBClient()
+        self._run(self.client.connect(host, port, password, timeout))
+        self.x = 0
+        self.y = 0
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(self._timeout)
+
+    @property
+    def framebuffer(self):
+        return self.client.framebuffer
+
+    def _send(self, *messages):
+        self._run(self.client.send(b"".join(messages)))
+        return self
+
+    def mouseMove(self, x, y):
+        self.x, self.y = x, y
+        return self._send(self.client.pointer_event(x, y))
+
+    def mouseDown(self, button):
+        return self._send(self.client.pointer_event(self.x, self.y, self.client.buttons | (1 << (button - 1))))
+
+    def mouseUp(self, button):
+        return self._send(self.client.pointer_event(self.x, self.y, self.client.buttons & ~(1 << (button - 1))))
+
+    def mousePress(self, button):
+        mask = 1 << (button - 1)
+        down = self.client.pointer_event(self.x, self.y, self.client.buttons | mask)
+        up = self.client.pointer_event(self.x, self.y, self.client.buttons & ~mask)
+        return self._send(down, up)
+
+    def keyDown(self, key):
+        return self._send(*(self.client.key_event(k, True) for k in split_combo(key)))
+
+    def keyUp(self, key):
+        return self._send(*(self.client.key_event(k, False) for k in reversed(split_combo(key))))
+
+    def keyPress(self, key):
+        keys = split_combo(key)
+        return self._send(
+            *(self.client.key_event(k, True) for k in keys),
+            *(self.client.key_event(k, False) for k in reversed(keys)),
+        )
+
+    def runMacro(self, events):
+        """
+        Send a batch of (method, *args) input events (mouseMove, mouseDown,
+        mouseUp, keyDown, keyUp) as one write.
+        """
+        messages = []
+        buttons = self.client.buttons
+        for name, *args in events:
+            if name == "mouseMove":
+                self.x, self.y = args
+            elif name == "mouseDown":
+                buttons |= 1 << (args[0] - 1)
+            elif name == "mouseUp":
+                buttons &= ~(1 << (args[0] - 1))
+            elif name == "keyDown":
+                messages.extend(self.client.key_event(k, True) for k in split_combo(args[0]))
+                continue
+            elif name == "keyUp":
+                messages.extend(self.client.key_event(k, False) for k in reversed(split_combo(args[0])))
+                continue
+            else:
+                raise ValueError(f"Unknown macro event {name!r}")
+            messages.append(self.client.pointer_event(self.x, self.y, buttons))
+        return self._send(*messages)
+
+    def disconnect(self):
+        try:
+            self._run(self.client.close())
+        except Exception:
+            pass
@@ -0,0 +1,122 @@
+import time
+from collections import Counter
+
+import numpy as np
+
+
+# Upper bucket edges in milliseconds; the last bucket is open-ended
+SETTLE_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class SettleHistogram:
+    """Per-kind ("step", "reset", ...) histograms of settle times and outcomes."""
+
+    def __init__(self, buckets_ms=SETTLE_BUCKETS_MS):
+        self.edges = np.asarray(buckets_ms, dtype=np.float64)
+        self._counts = {}
+        self._sums = Counter()
+        self._maxes = {}
+        self._outcomes = {}
+
+    def record(self, kind, seconds, outcome):
+        ms = seconds * 1000.0
+        counts = self._counts.get(kind)
+        if counts is None:
+            counts = self._counts[kind] = np.zeros(len(self.edges) + 1, dtype=np.int64)
+            self._outcomes[kind] = Counter()
+        counts[int(np.searchsorted(self.edges, ms))] += 1
+        self._sums[kind] += ms
+        self._maxes[kind] = max(self._maxes.get(kind, 0.0), ms)
+        self._outcomes[kind][outcome] += 1
+
+    def _percentile(self, counts, q):
+        """Upper edge of the bucket holding the q-th percentile."""
+        target = q * counts.sum()
+        i = int(np.searchsorted(np.cumsum(counts), target))
+        return float(self.edges[i]) if i < len(self.edges) else float("inf")
+
+    def stats(self):
+        out = {}
+        for kind, counts in self._counts.items():
+            n = int(counts.sum())
+            labels = [f"<={int(e)}ms" for e in self.edges] + [f">{int(self.edges[-1])}ms"]
+            out[kind] = {
+                "count": n,
+                "mean_ms": self._sums[kind] / n,
+                "p50_ms": self._percentile(counts, 0.50),
+                "p90_ms": self._percentile(counts, 0.90),
+                "p99_ms": self._percentile(counts, 0.99),
+                "max_ms": self._maxes[kind],
+                "buckets": dict(zip(labels, counts.tolist())),
+                "outcomes": dict(self._outcomes[kind]),
+            }
+        return out
+
+
+class FrameSettler:
+    """
+    Decide when the screen has settled after an input.
+
+    With a persistent framebuffer every committed VNC update bumps its
+    version, so the screen is settled once no update arrived for `quiet`
+    seconds. If nothing changes at all within `idle` seconds the action
+    had no visible effect. A navigation event from Nautilus counts as a
+    change (the redraw follows it). `require_event` keeps waiting until an
+    event arrived (e.g. Nautilus relaunching in reset). Everything is
+    capped by `deadline`.
+
+    Without a framebuffer there is no update traffic to watch; settling
+    then falls back to the caller's fixed `fallback` delay (none for plain
+    steps, the old 0.5 s pause for a Nautilus relaunch) and returns early,
+    after `quiet`, on the first navigation event.
+
+    Outcomes: "quiet", "event", "idle" or "deadline".
+    """
+
+    def __init__(self, quiet=0.05, idle=0.15, deadline=1.0, poll=0.02):
+        self.quiet = quiet
+        self.idle = idle
+        self.deadline = deadline
+        self.poll = poll
+
+    def settle(self, fb, events, since_version, since_event, deadline=None, require_event=False,
+               fallback=0.0):
+        """Block until settled; returns (seconds waited, outcome)."""
+        start = time.monotonic()
+        end = start + (self.deadline if deadline is None else deadline)
+
+        if fb is None:
+            first = events.wait_for_event(timeout=max(0.0, min(fallback, end - start)), after=since_event)
+            if first is None and events.count <= since_event:
+                outcome = "deadline" if require_event else "idle"
+            else:
+                time.sleep(min(self.quiet, max(0.0, end - time.monotonic())))
+                outcome = "event"
+            return time.monotonic() - start, outcome
+
+        version = since_version
+        saw_change = fb.version > since_version
+        saw_event = False
+        last_change = start
+        while True:
+            now = time.monotonic()
+            if now >= end:
+                return now - start, "deadline"
+            if not saw_event and events.count > since_event:
+                saw_event = True
+                last_change = now
+
+            if require_event and not saw_event:
+                window = end - last_change
+            else:
+                window = self.quiet if (saw_change or saw_event) else self.idle
+            remaining = last_change + window - now
+            if remaining <= 0:
+                outcome = "event" if saw_event else ("quiet" if saw_change else "idle")
+                return now - start, outcome
+
+            new = fb.wait_for_update(version, timeout=min(remaining, end - now, self.poll))
+            if new > version:
+                version = new
+                saw_change = True
+                last_change = time.monotonic()
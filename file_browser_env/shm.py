@@ -0,0 +1,116 @@
+import uuid
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+_MAGIC = 0x46424F42  # "FBOB"
+_HEADER_WORDS = 8     # magic, slots, ndim, dim0..dim3, itemsize
+
+
+class SharedObservationRing:
+    """
+    Ring buffer of fixed-shape uint8 observations in shared memory.
+
+    A worker process writes each observation into the next slot and hands
+    the learner only the slot index; the learner attaches to the same
+    segment by name and reads the slot as a numpy view, without pickling
+    or copying the frame. Each slot carries a sequence number so a reader
+    can tell whether the slot was overwritten (the ring wrapped) before it
+    got to it.
+
+    Layout: int64 header, int64 sequence number per slot, then the slots.
+    """
+
+    def __init__(self, shape, slots=8, name=None, _shm=None):
+        shape = tuple(int(d) for d in shape)
+        if len(shape) > 4:
+            raise ValueError("Observations may have at most 4 dimensions")
+        self.shape = shape
+        self.slots = slots
+
+        frame_bytes = int(np.prod(shape))
+        offset = 8 * (_HEADER_WORDS + slots)
+        size = offset + slots * frame_bytes
+
+        if _shm is None:
+            self._shm = shared_memory.SharedMemory(
+                name=name or f"fbenv_{uuid.uuid4().hex[:12]}", create=True, size=size
+            )
+            self._owner = True
+        else:
+            self._shm = _shm
+            self._owner = False
+
+        buf = self._shm.buf
+        self._header = np.ndarray((_HEADER_WORDS,), dtype=np.int64, buffer=buf)
+        self._seq = np.ndarray((slots,), dtype=np.int64, buffer=buf, offset=8 * _HEADER_WORDS)
+        self._frames = np.ndarray((slots,) + shape, dtype=np.uint8, buffer=buf, offset=offset)
+
+        if self._owner:
+            dims = list(shape) + [0] * (4 - len(shape))
+            self._header[:] = [_MAGIC, slots, len(shape), *dims, 1]
+            self._seq[:] = -1
+        self._next = 0
+        self._count = 0
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @classmethod
+    def attach(cls, name):
+        """Attach to a ring created by another process."""
+        try:
+            # the creating process owns the segment (Python >= 3.13)
+            shm = shared_memory.SharedMemory(name=name, create=False, track=False)
+        except TypeError:
+            shm = shared_memory.SharedMemory(name=name, create=False)
+        header = np.ndarray((_HEADER_WORDS,), dtype=np.int64, buffer=shm.buf)
+        if header[0] != _MAGIC:
+            shm.close()
+            raise ValueError(f"{name!r} is not an observation ring")
+        slots, ndim = int(header[1]), int(header[2])
+        shape = tuple(int(d) for d in header[3:3 + ndim])
+        return cls(shape, slots, _shm=shm)
+
+    def write(self, obs):
+        """Copy `obs` into the next slot; returns (slot, sequence number)."""
+        slot = self._next
+        self._seq[slot] = -1
+        np.copyto(self._frames[slot], obs)
+        self._seq[slot] = self._count
+        self._next = (slot + 1) % self.slots
+        self._count += 1
+        return slot, self._count - 1
+
+    def __getitem__(self, slot):
+        """Read-only view of a slot (no copy)."""
+        view = self._frames[slot]
+        view.flags.writeable = False
+        return view
+
+    def sequence(self, slot):
+        """Sequence number currently stored in `slot` (-1 while being written)."""
+        return int(self._seq[slot])
+
+    def read(self, slot, seq=None):
+        """
+        Return a view of `slot`, or None if `seq` is given and the slot has
+        since been overwritten.
+        """
+        if seq is not None and self.sequence(slot) != seq:
+            return None
+        return self[slot]
+
+    def close(self):
+        self._header = self._seq = self._frames = None
+        self._shm.close()
+
+    def unlink(self):
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                # an attached process's resource tracker got there first
+                pass
@@ -0,0 +1,223 @@
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+
+import numpy as np
+
+from .home_snapshot import TemplateEntry, parse_template
+
+
+MAGIC = b"FBTSTORE"
+VERSION = 1
+_HEADER = struct.Struct("<8sQQQQ")   # magic, version, templates, records, string bytes
+
+# One packed record per template line; names live in a shared string pool
+RECORD_DTYPE = np.dtype([
+    ("depth", "<u2"),
+    ("is_dir", "u1"),
+    ("size", "<u8"),
+    ("name_off", "<u8"),
+    ("name_len", "<u4"),
+])
+
+
+class TemplateStoreWriter:
+    """
+    Stream templates into a .fbt store.
+
+    Records and strings are spilled to temporary files as they arrive, so
+    corpora far larger than memory can be compiled; `close()` assembles the
+    final file:
+
+        header | template offsets (n+1 x u64) | template names (n x (off, len) u64)
+               | records (RECORD_DTYPE) | string pool (utf-8)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._dir = tempfile.mkdtemp(prefix="fbt_", dir=os.path.dirname(os.path.abspath(path)))
+        self._records = open(os.path.join(self._dir, "records"), "wb")
+        self._pool = open(os.path.join(self._dir, "pool"), "wb")
+        self._pool_size = 0
+        self._offsets = array("Q", [0])
+        self._names = array("Q")
+        self._strings = {}
+
+    def _intern(self, s):
+        off = self._strings.get(s)
+        data = s.encode("utf-8", "surrogateescape")
+        if off is None:
+            off = self._pool_size
+            self._pool.write(data)
+            self._pool_size += len(data)
+            # names repeat a lot across a corpus; cap the dedup table
+            if len(self._strings) < 1 << 20:
+                self._strings[s] = off
+        return off, len(data)
+
+    def add(self, name, records):
+        """Append one template given its TemplateEntry records."""
+        recs = np.empty(len(records), dtype=RECORD_DTYPE)
+        for i, rec in enumerate(records):
+            off, length = self._intern(rec.name)
+            recs[i] = (rec.depth, rec.is_dir, rec.size, off, length)
+        self._records.write(recs.tobytes())
+        self._offsets.append(self._offsets[-1] + len(records))
+        self._names.extend(self._intern(name))
+
+    def add_lines(self, name, lines):
+        """Append one template given its text lines."""
+        self.add(name, parse_template([L.rstrip() for L in lines if L.strip()]))
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def close(self):
+        self._records.close()
+        self._pool.close()
+        n = len(self)
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "wb") as out:
+                out.write(_HEADER.pack(MAGIC, VERSION, n, self._offsets[-1], self._pool_size))
+                self._offsets.tofile(out)
+                self._names.tofile(out)
+                for part in ("records", "pool"):
+                    with open(os.path.join(self._dir, part), "rb") as f:
+                        shutil.copyfileobj(f, out)
+            os.replace(tmp, self.path)
+        finally:
+            shutil.rmtree(self._dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TemplateStore:
+    """
+    Read-only, mmap'd view of a .fbt template store.
+
+    Every template is pre-parsed, so picking one is an index into the offset
+    table and reading it touches only its own records.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n, n_records, pool_size = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path!r} is not a template store")
+        if version != VERSION:
+            raise ValueError(f"Unsupported template store version {version}")
+
+        pos = _HEADER.size
+        self._offsets = np.frombuffer(self._mm, dtype="<u8", count=n + 1, offset=pos)
+        pos += 8 * (n + 1)
+        self._names = np.frombuffer(self._mm, dtype="<u8", count=2 * n, offset=pos).reshape(n, 2)
+        pos += 16 * n
+        self._records = np.frombuffer(self._mm, dtype=RECORD_DTYPE, count=n_records, offset=pos)
+        self._pool_start = pos + RECORD_DTYPE.itemsize * n_records
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def _string(self, off, length):
+        start = self._pool_start + int(off)
+        return self._mm[start:start + int(length)].decode("utf-8", "surrogateescape")
+
+    def name(self, index):
+        off, length = self._names[index]
+        return self._string(off, length)
+
+    def records(self, index):
+        """TemplateEntry records of one template."""
+        recs = self._records[self._offsets[index]:self._offsets[index + 1]]
+        out = []
+        stack = []
+        for depth, is_dir, size, off, length in recs.tolist():
+            name = self._string(off, length)
+            if is_dir:
+                stack = stack[:depth] + [name]
+                path = "/".join(stack)
+            else:
+                path = "/".join(stack[:depth] + [name])
+            out.append(TemplateEntry(depth, name, bool(is_dir), size, path))
+        return out
+
+    def close(self):
+        self._offsets = self._names = self._records = None
+        self._mm.close()
+
+
+def render_tree(records):
+    """Render records in get_template_tree()'s format (no sizes, dirs end with '/')."""
+    return "\n".join(
+        " " * (2 * rec.depth) + rec.name + ("/" if rec.is_dir else "")
+        for rec in records
+    )
+
+
+def merge_store(writer, path):
+    """Append every template of the .fbt store at `path` to `writer`."""
+    store = TemplateStore(path)
+    try:
+        for i in range(len(store)):
+            writer.add(store.name(i), store.records(i))
+    finally:
+        store.close()
+
+
+def compile_directory(templates, path):
+    """
+    Compile a directory of templates into a single .fbt store. Text files
+    hold one template each; .jsonl shards (from generate_trees.py) hold one
+    {"name", "tree"} object per line; .fbt stores are merged as they are.
+    """
+    out = os.path.abspath(path)
+    with TemplateStoreWriter(path) as writer:
+        for fn in sorted(os.listdir(templates)):
+            full = os.path.join(templates, fn)
+            if (not os.path.isfile(full) or fn == "manifest.json"
+                    or os.path.abspath(full) in (out, out + ".tmp")):
+                continue
+            if fn.endswith(".fbt"):
+                merge_store(writer, full)
+                continue
+            with open(full, encoding="utf-8") as f:
+                if fn.endswith(".jsonl"):
+                    for line in f:
+                        if line.strip():
+                            item = json.loads(line)
+                            writer.add_lines(item["name"], item["tree"].split("\n"))
+                else:
+                    writer.add_lines(fn, f)
+    return len(writer)
+
+
+def corpus_store(directory):
+    """
+    Path of the merged store of a generate_trees.py corpus directory (named
+    by the "store" key of its manifest.json), or None for a plain directory.
+    """
+    manifest = os.path.join(directory, "manifest.json")
+    if not os.path.isfile(manifest):
+        return None
+    with open(manifest, encoding="utf-8") as f:
+        store = json.load(f).get("store")
+    return os.path.join(directory, store) if store else None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m file_browser_env.template_store <templates_dir> <out.fbt>")
+    count = compile_directory(sys.argv[1], sys.argv[2])
+    print(f"Wrote {count} templates to {sys.argv[2]}")
@@ -0,0 +1,346 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+
+
+BUNDLE_VERSION = 1
+INDEX_NAME = "index.json"
+COMPLETE_MARKER = ".complete"
+
+# Bundle directory -> mount point in the container. /usr/local/share is on
+# GTK's search path, so extra themes supplement the image's own
+# /usr/share/themes and /usr/share/icons (and their baked icon caches)
+# instead of hiding them.
+MOUNTS = {"themes": "/usr/local/share/themes", "icons": "/usr/local/share/icons"}
+
+# Upstream sources, only used by `fetch` to assemble a source tree for
+# `build`: (name, git url, install commands). Most repositories are sources
+# that have to be built; their commands install into the "{prefix}"
+# directory. Without commands the clone already holds installed themes,
+# possibly nested (Papirus, Numix, ...).
+_MESON = (["meson", "setup", "--prefix={prefix}", "build"], ["meson", "install", "-C", "build"])
+_SCRIPT = (["./install.sh", "-d", "{prefix}"],)
+
+GTK_REPOS = [
+    ("Arc",      "https://github.com/jnsh/arc-theme.git", _MESON),
+    ("Adapta",   "https://github.com/adapta-project/adapta-gtk-theme.git",
+     (["./autogen.sh", "--prefix={prefix}"], ["make"], ["make", "install"])),
+    ("Materia",  "https://github.com/nana-4/materia-theme.git", _MESON),
+    ("Pop",      "https://github.com/pop-os/gtk-theme.git", _MESON),
+    ("Canta",    "https://github.com/vinceliuice/Canta-theme.git", _SCRIPT),
+    ("Dracula",  "https://github.com/dracula/gtk.git", ()),
+    ("FlatRemix","https://github.com/daniruiz/flat-remix-gtk.git", ()),
+    ("WhiteSur", "https://github.com/vinceliuice/WhiteSur-gtk-theme.git", _SCRIPT),
+]
+
+ICON_REPOS = [
+    ("Papirus",      "https://github.com/PapirusDevelopmentTeam/papirus-icon-theme.git", ()),
+    ("Moka",         "https://github.com/snwh/Moka-icon-theme.git", ()),
+    ("Numix",        "https://github.com/numixproject/numix-icon-theme.git", ()),
+    ("FlatRemix",    "https://github.com/daniruiz/flat-remix.git", ()),
+    ("La-Capitaine", "https://github.com/keeferrourke/la-capitaine-icon-theme.git", ()),
+    ("Tela",         "https://github.com/vinceliuice/Tela-icon-theme.git", _SCRIPT),
+]
+
+# Where a source's install commands put their output, inside its clone
+INSTALL_DIR = ".fb-install"
+# Themes are looked for at most this deep (meson installs to prefix/share/themes/<name>)
+MAX_THEME_DEPTH = 4
+
+
+def tree_digest(path):
+    """sha256 over every file / symlink under `path` (relative names, contents, link targets); also returns the entry count."""
+    h = hashlib.sha256()
+    count = 0
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            full = os.path.join(root, name)
+            rel = os.path.relpath(full, path)
+            if os.path.islink(full):
+                h.update(b"L" + rel.encode("utf-8", "surrogateescape") + b"\0")
+                h.update(os.readlink(full).encode("utf-8", "surrogateescape") + b"\0")
+            else:
+                h.update(b"F" + rel.encode("utf-8", "surrogateescape") + b"\0")
+                with open(full, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b""):
+                        h.update(chunk)
+                h.update(b"\0")
+            count += 1
+    return h.hexdigest(), count
+
+
+def validate_theme(kind, path):
+    """Return None if `path` is a usable (installed, not source) theme of `kind`, else the reason."""
+    if not os.path.isfile(os.path.join(path, "index.theme")):
+        return "no index.theme (source tree that needs a build step?)"
+    if kind == "themes":
+        if not os.path.isfile(os.path.join(path, "gtk-3.0", "gtk.css")):
+            return "no compiled gtk-3.0/gtk.css"
+    else:
+        with open(os.path.join(path, "index.theme"), encoding="utf-8", errors="replace") as f:
+            if "[Icon Theme]" not in f.read():
+                return "index.theme has no [Icon Theme] section"
+    return None
+
+
+def build_icon_cache(path):
+    """Pre-generate icon-theme.cache with gtk-update-icon-cache; returns whether a cache exists."""
+    tool = shutil.which("gtk-update-icon-cache")
+    if tool is not None:
+        result = subprocess.run([tool, "-f", "-q", "-t", path],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            print(f"[themes] icon cache for {path} failed: {result.stderr.decode(errors='replace').strip()}")
+    return os.path.isfile(os.path.join(path, "icon-theme.cache"))
+
+
+def find_themes(kind, root, max_depth=MAX_THEME_DEPTH):
+    """Valid themes of `kind` at or below `root` (not inside one another, skipping dot dirs), sorted."""
+    found = []
+    base = root.rstrip(os.sep).count(os.sep)
+    for path, dirs, _ in os.walk(root):
+        if validate_theme(kind, path) is None:
+            found.append(path)
+            dirs[:] = []
+            continue
+        if path.count(os.sep) - base >= max_depth:
+            dirs[:] = []
+        else:
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+    return sorted(found)
+
+
+def install_source(path, commands):
+    """Run a source's install commands in its clone; returns the error, or None once installed."""
+    prefix = os.path.join(os.path.abspath(path), INSTALL_DIR)
+    if os.path.isfile(os.path.join(prefix, COMPLETE_MARKER)):
+        return None
+    shutil.rmtree(prefix, ignore_errors=True)
+    os.makedirs(prefix)
+    for cmd in commands:
+        cmd = [arg.format(prefix=prefix) for arg in cmd]
+        try:
+            result = subprocess.run(cmd, cwd=path, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except OSError as e:
+            result = None
+            error = str(e)
+        else:
+            error = result.stderr.decode(errors="replace").strip().splitlines()[-1:] or ["no output"]
+            error = f"exit {result.returncode}: {error[0]}"
+        if result is None or result.returncode != 0:
+            shutil.rmtree(prefix, ignore_errors=True)
+            return f"{' '.join(cmd)} failed ({error})"
+    open(os.path.join(prefix, COMPLETE_MARKER), "w").close()
+    return None
+
+
+def fetch_sources(dest):
+    """
+    Clone the upstream repositories into dest/(themes|icons) and run their
+    install steps; needs network (and the themes' build tools), run once.
+    Failed builds are reported and left for `build` to skip.
+    """
+    for kind, repos in (("themes", GTK_REPOS), ("icons", ICON_REPOS)):
+        os.makedirs(os.path.join(dest, kind), exist_ok=True)
+        for name, url, commands in repos:
+            target = os.path.join(dest, kind, name)
+            if not os.path.isdir(target):
+                subprocess.run(["git", "clone", "--depth=1", url, target], check=True)
+            if commands:
+                error = install_source(target, commands)
+                if error is not None:
+                    print(f"[themes] installing {kind}/{name} failed: {error}")
+
+
+def build_bundle(src, out, min_sources=0.5):
+    """
+    Pack the installed themes of every source under src/themes and
+    src/icons into the tar archive `out` (gzip if it ends in .gz / .tgz),
+    with an index of names, sources, digests and file counts. A source's
+    themes are found in its install directory if it has one, otherwise
+    anywhere in the clone. Icon caches are generated first.
+
+    Sources without a usable theme are reported and left out; if that
+    leaves less than `min_sources` of all sources, ValueError is raised
+    instead of writing a thin bundle. Returns the index.
+    """
+    index = {"version": BUNDLE_VERSION, "created": time.time()}
+    paths = {}
+    sources, skipped = 0, []
+    for kind in MOUNTS:
+        entries = []
+        kind_dir = os.path.join(src, kind)
+        names = sorted(os.listdir(kind_dir)) if os.path.isdir(kind_dir) else []
+        for source in names:
+            root = os.path.join(kind_dir, source)
+            if not os.path.isdir(root) or source.startswith("."):
+                continue
+            sources += 1
+            installed = os.path.join(root, INSTALL_DIR)
+            found = find_themes(kind, installed if os.path.isdir(installed) else root)
+            if not found:
+                reason = validate_theme(kind, root)
+                print(f"[themes] skipping {kind}/{source}: no installed theme found ({reason})")
+                skipped.append(f"{kind}/{source}")
+                continue
+            for path in found:
+                name = os.path.basename(path)
+                if (kind, name) in paths:
+                    print(f"[themes] skipping {kind}/{name} from {source}: name already taken")
+                    continue
+                paths[kind, name] = path
+                entry = {"name": name, "source": source}
+                if kind == "icons":
+                    entry["icon_cache"] = build_icon_cache(path)
+                entry["digest"], entry["files"] = tree_digest(path)
+                entries.append(entry)
+        index[kind] = entries
+
+    if sources == 0 or sources - len(skipped) < min_sources * sources:
+        raise ValueError(f"Only {sources - len(skipped)} of {sources} theme sources under {src!r} "
+                         f"produced a usable theme (skipped: {', '.join(skipped) or 'none'}); "
+                         f"run `fetch` with the themes' build tools installed")
+
+    mode = "w:gz" if out.endswith((".gz", ".tgz")) else "w"
+    payload = json.dumps(index, indent=1).encode("utf-8")
+    with tarfile.open(out, mode) as tar:
+        # the index goes first so loading only has to read the archive's head
+        info = tarfile.TarInfo(INDEX_NAME)
+        info.size = len(payload)
+        info.mtime = int(index["created"])
+        tar.addfile(info, fileobj=io.BytesIO(payload))
+        for kind in MOUNTS:
+            for entry in index[kind]:
+                tar.add(paths[kind, entry["name"]], arcname=f"{kind}/{entry['name']}")
+    return index
+
+
+def read_index(path):
+    """The index of a bundle archive, as raw bytes."""
+    with tarfile.open(path, "r:*") as tar:
+        member = tar.next()
+        if member is None or member.name != INDEX_NAME:
+            raise ValueError(f"{path!r} is not a theme bundle (no leading {INDEX_NAME})")
+        return tar.extractfile(member).read()
+
+
+class ThemeBundle:
+    """
+    An offline, versioned archive of validated, compiled GTK and icon themes.
+
+    The archive is extracted once per host into `cache_dir/<bundle id>`
+    (the id is a hash of its index) and every theme's digest is checked
+    while doing so; later loads only read the index. `load()` additionally
+    keeps one instance per archive for the whole process, so constructors
+    cost nothing and `reset()` samples names from in-memory tuples.
+    """
+
+    _lock = threading.Lock()
+    _loaded = {}   # realpath -> ThemeBundle
+
+    def __init__(self, path, cache_dir=None):
+        self.path = os.path.realpath(path)
+        raw = read_index(self.path)
+        self.index = json.loads(raw)
+        if self.index.get("version") != BUNDLE_VERSION:
+            raise ValueError(f"Unsupported theme bundle version {self.index.get('version')!r}")
+        self.id = hashlib.sha256(raw).hexdigest()[:16]
+
+        cache_dir = cache_dir or os.path.expanduser("~/.nautilus_extra_themes/bundles")
+        self.root = os.path.join(cache_dir, self.id)
+        if not os.path.exists(os.path.join(self.root, COMPLETE_MARKER)):
+            self._extract(cache_dir)
+
+        self.gtk_themes = tuple(e["name"] for e in self.index["themes"])
+        self.icon_themes = tuple(e["name"] for e in self.index["icons"])
+
+    @classmethod
+    def load(cls, path, cache_dir=None):
+        key = os.path.realpath(path)
+        with cls._lock:
+            bundle = cls._loaded.get(key)
+            if bundle is None:
+                bundle = cls._loaded[key] = cls(path, cache_dir)
+            return bundle
+
+    def _extract(self, cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=f".{self.id}_", dir=cache_dir)
+        try:
+            with tarfile.open(self.path, "r:*") as tar:
+                if hasattr(tarfile, "data_filter"):
+                    tar.extractall(tmp, filter="data")
+                else:
+                    tar.extractall(tmp)
+            bad = self.verify(tmp)
+            if bad:
+                raise ValueError(f"Theme bundle {self.path!r} is corrupt: {', '.join(bad)}")
+            for kind in MOUNTS:
+                os.makedirs(os.path.join(tmp, kind), exist_ok=True)
+            open(os.path.join(tmp, COMPLETE_MARKER), "w").close()
+            try:
+                os.rename(tmp, self.root)
+            except OSError:
+                # another process finished the same bundle first
+                if not os.path.exists(os.path.join(self.root, COMPLETE_MARKER)):
+                    raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def verify(self, root=None):
+        """Recompute every theme's digest; returns the "kind/name" entries that do not match."""
+        root = root or self.root
+        bad = []
+        for kind in MOUNTS:
+            for entry in self.index[kind]:
+                path = os.path.join(root, kind, entry["name"])
+                if not os.path.isdir(path) or tree_digest(path)[0] != entry["digest"]:
+                    bad.append(f"{kind}/{entry['name']}")
+        return bad
+
+    def volumes(self):
+        """Read-only bind mounts of the extracted themes."""
+        return [f"{os.path.join(self.root, kind)}:{target}:ro" for kind, target in MOUNTS.items()]
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    usage = ("usage: python -m file_browser_env.themes fetch <src-dir>\n"
+             "       python -m file_browser_env.themes build <src-dir> <bundle.tar[.gz]>\n"
+             "       python -m file_browser_env.themes verify <bundle.tar[.gz]>")
+    if not argv or argv[0] not in ("fetch", "build", "verify"):
+        print(usage)
+        return 2
+    cmd, args = argv[0], argv[1:]
+    if cmd == "fetch" and len(args) == 1:
+        fetch_sources(args[0])
+    elif cmd == "build" and len(args) == 2:
+        try:
+            index = build_bundle(*args)
+        except ValueError as e:
+            print(e)
+            return 1
+        print(f"{args[1]}: {len(index['themes'])} GTK themes, {len(index['icons'])} icon themes")
+    elif cmd == "verify" and len(args) == 1:
+        bundle = ThemeBundle(args[0])
+        bad = bundle.verify()
+        print(f"{args[0]} ({bundle.id}): {len(bundle.gtk_themes)} GTK themes, "
+              f"{len(bundle.icon_themes)} icon themes, " + (f"corrupt: {', '.join(bad)}" if bad else "ok"))
+        return 1 if bad else 0
+    else:
+        print(usage)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
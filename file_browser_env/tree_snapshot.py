@@ -0,0 +1,156 @@
+import hashlib
+import weakref
+from collections import namedtuple
+
+
+class TreeDiff(namedtuple("TreeDiff", ["added", "removed", "moved"])):
+    """
+    Difference between two TreeSnapshots.
+
+    added / removed: tuples of (path, is_dir) that only exist on one side.
+    moved: tuple of (old_path, new_path, is_dir); entries listed here are
+    not repeated in added / removed.
+    """
+    __slots__ = ()
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.moved)
+
+
+class TreeSnapshot:
+    """
+    Immutable, interned snapshot of a directory tree.
+
+    `entries` is a tuple of (relative_path, is_dir) in the same order as
+    get_directory_tree()'s lines. Equality and hashing use a content digest
+    of the entries, so comparing two snapshots is O(1). Inode numbers are
+    kept on the side to tell moves and renames apart from delete + create.
+
+    Build snapshots with `TreeSnapshot.create()`; identical trees (same
+    entries and inodes) share one object.
+    """
+
+    __slots__ = ("entries", "digest", "_inodes", "_index", "_hash", "__weakref__")
+
+    _interned = weakref.WeakValueDictionary()
+
+    def __init__(self, entries, inodes, digest):
+        self.entries = entries
+        self._inodes = inodes
+        self.digest = digest
+        self._hash = int.from_bytes(digest[:8], "little")
+        self._index = None
+
+    @classmethod
+    def create(cls, entries, inodes=None):
+        entries = tuple(entries)
+        inodes = tuple(inodes) if inodes is not None else (0,) * len(entries)
+
+        h = hashlib.blake2b(digest_size=16)
+        for path, is_dir in entries:
+            h.update(path.encode("utf-8", "surrogateescape"))
+            h.update(b"/\n" if is_dir else b"\n")
+        digest = h.digest()
+
+        key = (digest, hash(inodes))
+        snap = cls._interned.get(key)
+        if snap is None or snap._inodes != inodes:
+            snap = cls(entries, inodes, digest)
+            cls._interned[key] = snap
+        return snap
+
+    def __eq__(self, other):
+        if not isinstance(other, TreeSnapshot):
+            return NotImplemented
+        return self is other or self.digest == other.digest
+
+    def __hash__(self):
+        return self._hash
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __repr__(self):
+        return f"<TreeSnapshot {self.digest.hex()[:12]} entries={len(self.entries)}>"
+
+    @property
+    def index(self):
+        """Mapping of path -> (is_dir, inode), built on first use."""
+        if self._index is None:
+            self._index = {
+                path: (is_dir, ino)
+                for (path, is_dir), ino in zip(self.entries, self._inodes)
+            }
+        return self._index
+
+    def __contains__(self, path):
+        return path in self.index
+
+    def is_dir(self, path):
+        return self.index[path][0]
+
+    def files(self):
+        return tuple(path for path, is_dir in self.entries if not is_dir)
+
+    def dirs(self):
+        return tuple(path for path, is_dir in self.entries if is_dir)
+
+    def to_text(self) -> str:
+        """Render in get_directory_tree()'s two-space indented format."""
+        lines = []
+        for path, is_dir in self.entries:
+            depth = path.count("/")
+            name = path.rsplit("/", 1)[-1]
+            lines.append(" " * (2 * depth) + name + ("/" if is_dir else ""))
+        return "\n".join(lines)
+
+    def diff(self, new):
+        """Return the TreeDiff that turns this snapshot into `new`."""
+        if self == new:
+            return TreeDiff((), (), ())
+
+        old_idx, new_idx = self.index, new.index
+        removed = {p: v for p, v in old_idx.items() if p not in new_idx or new_idx[p][0] != v[0]}
+        added = {p: v for p, v in new_idx.items() if p not in old_idx or old_idx[p][0] != v[0]}
+
+        def split(path):
+            head, _, tail = path.rpartition("/")
+            return head, tail
+
+        moved = []
+        # 1) same inode on both sides -> moved or renamed. Inode numbers are
+        #    recycled right after a delete, so a match must also keep either
+        #    the name (a move) or the parent directory (a rename).
+        by_inode = {v[1]: p for p, v in added.items() if v[1]}
+        for src, (is_dir, ino) in list(removed.items()):
+            dst = by_inode.get(ino) if ino else None
+            if dst is None or added[dst][0] != is_dir:
+                continue
+            (src_dir, src_name), (dst_dir, dst_name) = split(src), split(dst)
+            if src_name == dst_name or src_dir == dst_dir:
+                moved.append((src, dst, is_dir))
+                del removed[src], added[dst], by_inode[ino]
+
+        # 2) no inode info: pair up entries whose basename is unique on both
+        #    sides. Two known, different inodes are a delete plus a create.
+        def by_name(entries):
+            names = {}
+            for p, (is_dir, _) in entries.items():
+                names.setdefault((p.rsplit("/", 1)[-1], is_dir), []).append(p)
+            return {k: v[0] for k, v in names.items() if len(v) == 1}
+
+        old_names, new_names = by_name(removed), by_name(added)
+        for key, src in old_names.items():
+            dst = new_names.get(key)
+            if dst is not None and (removed[src][1] == 0 or added[dst][1] == 0):
+                moved.append((src, dst, key[1]))
+                del removed[src], added[dst]
+
+        return TreeDiff(
+            tuple((p, v[0]) for p, v in sorted(added.items())),
+            tuple((p, v[0]) for p, v in sorted(removed.items())),
+            tuple(sorted(moved)),
+        )
@@ -0,0 +1,217 @@
+import ctypes
+import ctypes.util
+import os
+import struct
+
+from .tree_snapshot import TreeSnapshot
+
+
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF   = 0x00000800
+IN_Q_OVERFLOW  = 0x00004000
+IN_IGNORED     = 0x00008000
+IN_ONLYDIR     = 0x01000000
+IN_NONBLOCK    = 0o4000
+IN_CLOEXEC     = 0o2000000
+
+_WATCH_MASK = (IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+               | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+_EVENT = struct.Struct("iIII")
+
+# Nautilus runtime files that never show up in the tree
+DEFAULT_IGNORE = frozenset({'.dbus', '.hidden', '.hidden.sock'})
+
+
+def _load_libc():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+_libc = _load_libc()
+
+
+class DirectoryTreeWatcher:
+    """
+    Cached, inotify-backed model of a directory tree.
+
+    Each directory's (sorted) listing is cached and watched; inotify events
+    only mark the affected directories dirty, and the next query relists
+    just those. When nothing changed since the last query the cached text
+    is returned without touching the disk. Without inotify (non-Linux, or
+    out of watches) every query falls back to a full walk.
+    """
+
+    def __init__(self, root, ignore=DEFAULT_IGNORE):
+        self.root = root
+        self.ignore = frozenset(ignore)
+        self._listings = {}
+        self._wd_to_path = {}
+        self._path_to_wd = {}
+        self._dirty = set()
+        self._text = None
+        self._snapshot = None
+        self._fd = None
+        if _libc is not None:
+            fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0:
+                self._fd = fd
+
+    @property
+    def inotify(self):
+        return self._fd is not None
+
+    def _watch(self, path):
+        if self._fd is None or path in self._path_to_wd:
+            return
+        wd = _libc.inotify_add_watch(self._fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            # e.g. ENOSPC (fs.inotify.max_user_watches); stop trusting the cache
+            print(f"[DirectoryTreeWatcher] inotify_add_watch failed for {path}: "
+                  f"{os.strerror(ctypes.get_errno())}; falling back to full walks")
+            self.close()
+            return
+        self._wd_to_path[wd] = path
+        self._path_to_wd[path] = wd
+
+    def _forget(self, wd):
+        path = self._wd_to_path.pop(wd, None)
+        if path is not None:
+            self._path_to_wd.pop(path, None)
+            self._listings.pop(path, None)
+
+    def _forget_subtree(self, root):
+        if root is None:
+            return
+        prefix = root + os.sep
+        for path in [p for p in self._path_to_wd if p == root or p.startswith(prefix)]:
+            self._forget(self._path_to_wd[path])
+
+    def _drain(self):
+        """Apply every pending inotify event; returns True if anything changed."""
+        if self._fd is None:
+            return True
+        changed = False
+        while True:
+            try:
+                buf = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            except OSError:
+                self.close()
+                return True
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _, length = _EVENT.unpack_from(buf, offset)
+                offset += _EVENT.size + length
+                changed = True
+                if mask & IN_Q_OVERFLOW:
+                    self._listings.clear()
+                    continue
+                if mask & IN_IGNORED:
+                    self._forget(wd)
+                    continue
+                if mask & IN_MOVE_SELF:
+                    # the watch follows the inode, so every cached path at or
+                    # below the old location is stale; re-watching the new
+                    # location reuses the same descriptors
+                    self._forget_subtree(self._wd_to_path.get(wd))
+                    continue
+                path = self._wd_to_path.get(wd)
+                if path is not None:
+                    self._dirty.add(path)
+        return changed
+
+    def _list(self, path):
+        """Watch `path` and (re)cache its sorted (name, is_dir, inode) listing."""
+        self._watch(path)
+        listing = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.name in self.ignore:
+                        continue
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    listing.append((entry.name, is_dir, entry.inode()))
+        except (PermissionError, FileNotFoundError, NotADirectoryError):
+            pass
+        listing = tuple(sorted(listing))
+        self._listings[path] = listing
+        return listing
+
+    def _build(self):
+        if self._fd is None:
+            self._listings.clear()
+        for path in self._dirty:
+            self._listings.pop(path, None)
+        self._dirty.clear()
+
+        lines = []
+        entries = []
+        inodes = []
+        seen = set()
+
+        def walk(path, rel, level):
+            seen.add(path)
+            listing = self._listings.get(path)
+            if listing is None:
+                listing = self._list(path)
+            indent = " " * (2 * level)
+            for name, is_dir, ino in listing:
+                relpath = f"{rel}{name}"
+                entries.append((relpath, is_dir))
+                inodes.append(ino)
+                if is_dir:
+                    lines.append(f"{indent}{name}/")
+                    walk(os.path.join(path, name), relpath + "/", level + 1)
+                else:
+                    lines.append(f"{indent}{name}")
+
+        walk(self.root, "", 0)
+
+        # drop listings of directories that are no longer reachable
+        for path in [p for p in self._listings if p not in seen]:
+            del self._listings[path]
+
+        self._text = "\n".join(lines)
+        self._snapshot = TreeSnapshot.create(entries, inodes)
+
+    def get_tree(self) -> str:
+        """Two-space indented tree text, directories ending with '/'."""
+        if self._drain() or self._text is None:
+            self._build()
+        return self._text
+
+    def get_snapshot(self):
+        """Structured TreeSnapshot of the same tree get_tree() describes."""
+        if self._drain() or self._snapshot is None:
+            self._build()
+        return self._snapshot
+
+    def invalidate(self):
+        """Forget every cached listing (the next query re-walks the tree)."""
+        self._listings.clear()
+        self._text = None
+        self._snapshot = None
+
+    def close(self):
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = None
+            self._wd_to_path.clear()
+            self._path_to_wd.clear()
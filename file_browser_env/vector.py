@@ -0,0 +1,136 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import gymnasium as gym
+from gymnasium import spaces
+from gymnasium.vector.utils import batch_space
+from gymnasium.vector.vector_env import AutoresetMode
+
+from .env import FBGymEnv
+
+
+class FBVectorEnv(gym.vector.VectorEnv):
+    """
+    Run several FBGymEnv instances side by side and step them concurrently.
+
+    All instances live in this process, so they share FBEnvironment's
+    class-level IP pool and Docker network. Actions are fanned out on a
+    thread pool (each step is dominated by VNC and filesystem round-trips,
+    which release the GIL) and observations are written straight into one
+    preallocated `(N, ...)` uint8 batch.
+
+    With `autoreset=True`, an instance whose episode ends is reset inside
+    the same step (gymnasium's `AutoresetMode.SAME_STEP`); its last
+    observation and info are returned under the `final_obs` / `final_info`
+    keys of the info dict.
+    """
+
+    def __init__(self, num_envs, max_workers=None, autoreset=True, copy=True, **env_kwargs):
+        if env_kwargs.get("statemode") == "both":
+            raise ValueError("FBVectorEnv cannot batch statemode='both'; use 'full' or 'zoomed'")
+
+        self.num_envs = num_envs
+        self.autoreset = autoreset
+        self.copy = copy
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or num_envs)
+
+        # The first instance performs the one-time network setup and
+        # container cleanup, so it must exist before the others start.
+        first = FBGymEnv(**env_kwargs)
+        rest = list(self._executor.map(lambda _: FBGymEnv(**env_kwargs), range(num_envs - 1)))
+        self.envs = [first] + rest
+
+        self.single_observation_space = first.observation_space
+        self.single_action_space = first.action_space
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+        self.action_space = batch_space(self.single_action_space, num_envs)
+        # copy: the sub-environments' metadata is class-level
+        self.metadata = dict(first.metadata)
+        self.metadata["autoreset_mode"] = AutoresetMode.SAME_STEP if autoreset else AutoresetMode.DISABLED
+        self.render_mode = first.render_mode
+        self.is_vector_env = True
+        self.closed = False
+
+        self._observations = np.zeros(self.observation_space.shape, dtype=np.uint8)
+        self._rewards = np.zeros((num_envs,), dtype=np.float64)
+        self._terminateds = np.zeros((num_envs,), dtype=np.bool_)
+        self._truncateds = np.zeros((num_envs,), dtype=np.bool_)
+
+    def _map(self, fn, *iterables):
+        return list(self._executor.map(fn, *iterables))
+
+    def _reset_one(self, i, seed, options):
+        obs, info = self.envs[i].reset(seed=seed, options=options)
+        self._observations[i] = obs
+        return info
+
+    def reset(self, seed=None, options=None):
+        """Reset every instance concurrently."""
+        if seed is None:
+            seeds = [None] * self.num_envs
+        elif isinstance(seed, int):
+            seeds = [seed + i for i in range(self.num_envs)]
+        else:
+            seeds = list(seed)
+
+        infos = self._map(lambda i, s: self._reset_one(i, s, options), range(self.num_envs), seeds)
+        return self._batch_observations(), self._merge_infos(infos)
+
+    def _step_one(self, i, action):
+        env = self.envs[i]
+        obs, reward, terminated, truncated, info = env.step(action)
+        if self.autoreset and (terminated or truncated):
+            info = dict(info, final_obs=obs, final_info=dict(info))
+            obs, _ = env.reset()
+        self._observations[i] = obs
+        self._rewards[i] = reward
+        self._terminateds[i] = terminated
+        self._truncateds[i] = truncated
+        return info
+
+    def step(self, actions):
+        """Apply one action per instance concurrently and gather the batch."""
+        if isinstance(self.single_action_space, spaces.Tuple):
+            # batch_space(Tuple) yields a tuple of per-component arrays
+            actions = list(zip(*actions))
+        infos = self._map(self._step_one, range(self.num_envs), actions)
+        return (
+            self._batch_observations(),
+            np.copy(self._rewards),
+            np.copy(self._terminateds),
+            np.copy(self._truncateds),
+            self._merge_infos(infos),
+        )
+
+    def _batch_observations(self):
+        return np.copy(self._observations) if self.copy else self._observations
+
+    def _merge_infos(self, infos):
+        """Merge per-instance info dicts using gymnasium's `key` / `_key` layout."""
+        merged = {}
+        for i, info in enumerate(infos):
+            for key, value in info.items():
+                if key not in merged:
+                    merged[key] = np.full((self.num_envs,), None, dtype=object)
+                    merged[f"_{key}"] = np.zeros((self.num_envs,), dtype=np.bool_)
+                merged[key][i] = value
+                merged[f"_{key}"][i] = True
+        return merged
+
+    def call(self, name, *args, **kwargs):
+        """Call a method (or read an attribute) on every instance."""
+        def one(env):
+            attr = getattr(env, name)
+            return attr(*args, **kwargs) if callable(attr) else attr
+        return tuple(self._map(one, self.envs))
+
+    def render(self):
+        return self.call("render")
+
+    def close(self, **kwargs):
+        """Close every instance (container, pool lease, shared-memory ring) concurrently."""
+        if self.closed:
+            return
+        self._map(lambda env: env.close(), self.envs)
+        self._executor.shutdown(wait=True)
+        self.closed = True
@@ -0,0 +1,200 @@
+"""
+In-process RFB server for exercising FBEnvironment's VNC clients without
+Docker. Used by the tests and by benchmarks/rfb_latency.py.
+"""
+
+import asyncio
+import os
+import struct
+import threading
+
+import numpy as np
+
+
+class _Session:
+    def __init__(self, writer, shifts, bigendian):
+        self.writer = writer
+        self.shifts = shifts          # red, green, blue shift of the client's pixel format
+        self.bigendian = bigendian
+        self.pending = False          # an incremental update request is outstanding
+        self.queue = []               # rectangles waiting for one
+
+
+class FakeRFBServer:
+    """
+    RFB 3.8 (or 3.3) server with Raw and CopyRect encodings.
+
+    The frame is kept as RGB and encoded in whatever 32bpp true-colour
+    format the client asked for with SetPixelFormat; until then the
+    server's own format is used (`native="rgbx"` or `"bgrx"`, the x11vnc
+    default). With `password`, VNC authentication (security type 2) is
+    required. Pointer and key events are recorded; with `mark_pointer`,
+    every pointer event paints a 4x4 marker at the pointer position.
+    `paint()` / `copy()` change the frame from the test thread and send
+    the change to clients with an outstanding incremental request (or on
+    their next one); full requests get the requested rectangle.
+    """
+
+    def __init__(self, width=500, height=500, host="127.0.0.1", port=0, native="rgbx",
+                 version=(3, 8), password=None, mark_pointer=True):
+        self.width = width
+        self.height = height
+        self.host = host
+        self.port = port
+        self.native_shifts = {"rgbx": (0, 8, 16), "bgrx": (16, 8, 0)}[native]
+        self.version = version
+        self.password = password
+        self.mark_pointer = mark_pointer
+        self.frame = np.full((height, width, 3), 96, dtype=np.uint8)
+        self.pointer = []   # (buttons, x, y)
+        self.keys = []      # (down, keysym)
+        self.pixel_formats = []   # shifts requested through SetPixelFormat
+        self.update_requests = []   # (incremental, x, y, w, h)
+        self._sessions = []
+        self._loop = None
+        self._server = None
+        self._started = threading.Event()
+
+    @property
+    def pointer_events(self):
+        return len(self.pointer)
+
+    @property
+    def key_events(self):
+        return len(self.keys)
+
+    def start(self):
+        """Serve on a background thread; returns once the port is bound."""
+        threading.Thread(target=self._run, daemon=True).start()
+        self._started.wait()
+        return self
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._started.set()
+        self._loop.run_forever()
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._server.close)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    # ------------------------------------------------------------ frame edits
+
+    def paint(self, x, y, w, h, rgb):
+        """Fill a rectangle with an (r, g, b) colour and push it to clients."""
+        def apply():
+            self.frame[y:y + h, x:x + w] = rgb
+            self._broadcast(lambda s: self._raw(s, x, y, w, h))
+        self._loop.call_soon_threadsafe(apply)
+
+    def copy(self, srcx, srcy, x, y, w, h):
+        """Move a rectangle within the frame and push it as a CopyRect."""
+        def apply():
+            self.frame[y:y + h, x:x + w] = self.frame[srcy:srcy + h, srcx:srcx + w].copy()
+            rect = struct.pack("!HHHHi", x, y, w, h, 1) + struct.pack("!HH", srcx, srcy)
+            self._broadcast(lambda s: rect)
+        self._loop.call_soon_threadsafe(apply)
+
+    def _broadcast(self, encode):
+        for session in self._sessions:
+            session.queue.append(encode(session))
+            if session.pending:
+                self._flush(session)
+
+    def _flush(self, session):
+        rects, session.queue, session.pending = session.queue, [], False
+        session.writer.write(struct.pack("!BxH", 0, len(rects)) + b"".join(rects))
+
+    # ------------------------------------------------------------ encoding
+
+    def _raw(self, session, x, y, w, h):
+        px = self.frame[y:y + h, x:x + w].astype(np.uint32)
+        rs, gs, bs = session.shifts
+        value = (px[..., 0] << rs) | (px[..., 1] << gs) | (px[..., 2] << bs)
+        data = value.astype(">u4" if session.bigendian else "<u4").tobytes()
+        return struct.pack("!HHHHi", x, y, w, h, 0) + data
+
+    # ------------------------------------------------------------ protocol
+
+    async def _handshake(self, reader, writer):
+        read = reader.readexactly
+        writer.write(b"RFB %03d.%03d\n" % self.version)
+        await read(12)
+        sectype = 2 if self.password is not None else 1
+        if self.version >= (3, 7):
+            writer.write(struct.pack("!BB", 1, sectype))
+            await read(1)
+        else:
+            writer.write(struct.pack("!I", sectype))
+        if sectype == 2:
+            from file_browser_env.rfb import _vnc_auth_response
+            challenge = os.urandom(16)
+            writer.write(challenge)
+            if await read(16) != _vnc_auth_response(self.password, challenge):
+                reason = b"bad password"
+                writer.write(struct.pack("!I", 1) + (struct.pack("!I", len(reason)) + reason
+                                                     if self.version >= (3, 8) else b""))
+                return False
+        if sectype == 2 or self.version >= (3, 8):
+            writer.write(struct.pack("!I", 0))
+        await read(1)  # ClientInit
+        name = b"fake"
+        rs, gs, bs = self.native_shifts
+        writer.write(struct.pack("!HH", self.width, self.height)
+                     + struct.pack("!BBBBHHHBBB3x", 32, 24, 0, 1, 255, 255, 255, rs, gs, bs)
+                     + struct.pack("!I", len(name)) + name)
+        return True
+
+    async def _handle(self, reader, writer):
+        read = reader.readexactly
+        session = None
+        try:
+            if not await self._handshake(reader, writer):
+                return
+            session = _Session(writer, self.native_shifts, False)
+            self._sessions.append(session)
+            while True:
+                (msg,) = struct.unpack("!B", await read(1))
+                if msg == 0:  # SetPixelFormat
+                    pf = await read(19)
+                    bpp, _, bigendian, _, _, _, _, rs, gs, bs = struct.unpack("!BBBBHHHBBB", pf[3:16])
+                    if bpp != 32:
+                        raise ValueError(f"fake server only speaks 32bpp, client asked for {bpp}")
+                    session.shifts, session.bigendian = (rs, gs, bs), bool(bigendian)
+                    self.pixel_formats.append((rs, gs, bs))
+                elif msg == 2:  # SetEncodings
+                    (count,) = struct.unpack("!xH", await read(3))
+                    await read(4 * count)
+                elif msg == 3:  # FramebufferUpdateRequest
+                    incremental, x, y, w, h = struct.unpack("!BHHHH", await read(9))
+                    self.update_requests.append((incremental, x, y, w, h))
+                    if not incremental:
+                        w, h = min(w, self.width - x), min(h, self.height - y)
+                        session.queue.append(self._raw(session, x, y, w, h))
+                    session.pending = True
+                    if session.queue:
+                        self._flush(session)
+                elif msg == 4:  # KeyEvent
+                    down, key = struct.unpack("!BxxI", await read(7))
+                    self.keys.append((bool(down), key))
+                elif msg == 5:  # PointerEvent
+                    buttons, px, py = struct.unpack("!BHH", await read(5))
+                    self.pointer.append((buttons, px, py))
+                    if self.mark_pointer:
+                        px, py = min(px, self.width - 4), min(py, self.height - 4)
+                        self.frame[py:py + 4, px:px + 4] = (len(self.pointer) * 7) % 256
+                        self._broadcast(lambda s: self._raw(s, px, py, 4, 4))
+                elif msg == 6:  # ClientCutText
+                    (length,) = struct.unpack("!3xI", await read(7))
+                    await read(length)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if session is not None:
+                self._sessions.remove(session)
+            writer.close()
@@ -0,0 +1,57 @@
+import pytest
+
+from file_browser_env.env import FBEnvironment
+
+
+class FakeContainer:
+    def __init__(self, name, ip, width=500, height=500, username="user"):
+        self.name = self.id = name
+        self.labels = {"fb_env.ip": ip, "fb_env.width": str(width),
+                       "fb_env.height": str(height), "fb_env.username": username}
+        self.calls = []
+
+    def stop(self):
+        self.calls.append("stop")
+
+    def remove(self):
+        self.calls.append("remove")
+
+
+class FakeAllocator:
+    def __init__(self):
+        self.released = []
+
+    def release(self, ip):
+        self.released.append(ip)
+
+
+@pytest.fixture
+def subnet(monkeypatch):
+    monkeypatch.setattr(FBEnvironment, "_adoptable", {})
+    monkeypatch.setattr(FBEnvironment, "_allocators", {})
+    FBEnvironment._allocators[90] = FakeAllocator()
+    return 90
+
+
+def test_unclaimed_containers_are_removed_and_released(subnet):
+    small = FakeContainer("a", "172.90.0.2", width=300)
+    big = FakeContainer("b", "172.90.0.3")
+    FBEnvironment._adoptable[subnet] = [small, big]
+
+    assert FBEnvironment._claim_adoptable(subnet, 500, 500, "user") is big
+    assert FBEnvironment.reap_adoptable(subnet) == 1
+
+    assert small.calls == ["stop", "remove"]
+    assert big.calls == []
+    assert FBEnvironment._allocators[subnet].released == ["172.90.0.2"]
+    assert FBEnvironment._claim_adoptable(subnet, 300, 500, "user") is None
+    # a second reap (the timer after close_all, or at exit) finds nothing
+    assert FBEnvironment.reap_adoptable(subnet) == 0
+
+
+def test_close_all_reaps_every_subnet(subnet):
+    other = FakeContainer("c", "172.90.0.4")
+    FBEnvironment._adoptable[subnet] = [other]
+    FBEnvironment.close_all()
+    assert other.calls == ["stop", "remove"]
+    assert FBEnvironment._adoptable == {}
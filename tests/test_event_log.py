@@ -0,0 +1,73 @@
+import pytest
+
+from file_browser_env.event_log import EventLog, EventRecord, read_spill
+
+
+def fill(log, n, start=0):
+    for i in range(start, start + n):
+        log.append(float(i), f"/home/user/d{i}", "icon-view", episode=i // 3, step=i % 3, seq=i)
+
+
+def test_ring_keeps_the_newest_records_in_order():
+    log = EventLog(capacity=4)
+    fill(log, 3)
+    assert len(log) == 3 and log.overwritten == 0
+    fill(log, 7, start=3)
+    assert len(log) == 4
+    assert log.total == 10
+    assert log.overwritten == 6
+    assert [r.seq for r in log.query()] == [6, 7, 8, 9]
+    assert log.as_array()["seq"].tolist() == [6, 7, 8, 9]
+    assert log.latest() == EventRecord(9.0, 3, 0, 9, "/home/user/d9", "icon-view")
+
+
+def test_query_filters():
+    log = EventLog(capacity=8)
+    fill(log, 12)
+    assert [r.seq for r in log.query(since=6.0, until=8.0)] == [6, 7, 8]
+    assert [r.seq for r in log.query(episode=3)] == [9, 10, 11]
+    assert [r.seq for r in log.query(step=0)] == [6, 9]
+    assert [r.seq for r in log.query(path_prefix="/home/user/d1")] == [10, 11]
+    assert [r.seq for r in log.query(last=2)] == [10, 11]
+    assert log.query(last=0) == []
+    assert EventLog().latest() is None
+
+
+def test_missing_strings_are_stored_empty():
+    log = EventLog(capacity=2)
+    log.append(1.0, None, None)
+    assert log.latest() == EventRecord(1.0, 0, 0, -1, "", "")
+
+
+def test_spill_file_keeps_every_record(tmp_path):
+    path = str(tmp_path / "events.bin")
+    log = EventLog(capacity=2, spill_path=path)
+    fill(log, 5)
+    log.append(5.0, "/home/user/café \udcff", "list-view", seq=5)
+    log.close()
+    records = list(read_spill(path))
+    assert [r.seq for r in records] == [0, 1, 2, 3, 4, 5]
+    assert records[1] == EventRecord(1.0, 0, 1, 1, "/home/user/d1", "icon-view")
+    assert records[-1].path == "/home/user/café \udcff"
+
+    # reopening appends without a second header
+    log = EventLog(spill_path=path)
+    log.append(6.0, "/x", "icon-view", seq=6)
+    log.close()
+    assert [r.seq for r in read_spill(path)] == [0, 1, 2, 3, 4, 5, 6]
+
+
+def test_truncated_spill_stops_at_the_last_whole_record(tmp_path):
+    path = tmp_path / "events.bin"
+    log = EventLog(spill_path=str(path))
+    fill(log, 2)
+    log.close()
+    path.write_bytes(path.read_bytes()[:-3])
+    assert [r.seq for r in read_spill(str(path))] == [0]
+
+
+def test_read_spill_rejects_other_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"not a log")
+    with pytest.raises(ValueError):
+        list(read_spill(str(path)))
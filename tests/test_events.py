@@ -0,0 +1,167 @@
+import importlib.util
+import json
+import os
+import socket
+import struct
+import sys
+import types
+
+import pytest
+
+from file_browser_env.events import MAX_FRAME, NavigationEventChannel
+from tests.test_rfb import wait_until
+
+EXTENSION = os.path.join(os.path.dirname(__file__), "..", "docker", "remote_selection.py")
+
+
+def frame(msg):
+    payload = json.dumps(msg).encode()
+    return struct.pack(">I", len(payload)) + payload
+
+
+@pytest.fixture
+def channel(tmp_path):
+    events = []
+    ch = NavigationEventChannel(str(tmp_path / ".hidden.sock"), str(tmp_path / ".hidden"),
+                                on_event=events.append)
+    ch.events = events
+    yield ch
+    ch.close()
+
+
+def connect(channel):
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.connect(channel.sock_path)
+    return s
+
+
+def test_frames_split_across_reads(channel):
+    data = frame({"seq": 0, "path": "/home/user/A"}) + frame({"seq": 1, "path": "/home/user/B"})
+    with connect(channel) as s:
+        # byte by byte, then two frames in one write
+        for i in range(len(data) // 2):
+            s.sendall(data[i:i + 1])
+        s.sendall(data[len(data) // 2:])
+        wait_until(lambda: channel.count == 2)
+    assert [e["path"] for e in channel.events] == ["/home/user/A", "/home/user/B"]
+    assert [e["count"] for e in channel.events] == [1, 2]
+    assert channel.stats() == {"events": 2, "dropped": 0, "connections": 1}
+
+
+def test_sequence_gaps_count_as_dropped(channel):
+    with connect(channel) as s:
+        s.sendall(b"".join(frame({"seq": n}) for n in (0, 1, 4)) + frame("not a dict") + b"\0\0\0\2{x")
+        s.sendall(frame({"seq": 5}))
+        wait_until(lambda: channel.count == 4)
+    assert [e["seq"] for e in channel.events] == [0, 1, 4, 5]
+    assert channel.stats()["dropped"] == 2
+
+
+def test_each_connection_keeps_its_own_sequence(channel):
+    with connect(channel) as a:
+        a.sendall(frame({"seq": 7}))
+        wait_until(lambda: channel.count == 1)
+    with connect(channel) as b:
+        b.sendall(frame({"seq": 0}))
+        wait_until(lambda: channel.count == 2)
+    assert channel.stats() == {"events": 2, "dropped": 0, "connections": 2}
+
+
+def test_oversized_frame_drops_the_connection(channel):
+    with connect(channel) as s:
+        s.sendall(struct.pack(">I", MAX_FRAME + 1))
+        s.settimeout(5)
+        assert s.recv(1) == b""
+    assert channel.count == 0
+
+
+def test_fifo_lines(channel):
+    fd = os.open(channel.fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+    try:
+        os.write(fd, b'{"path": "/a"}\n{"pa')
+        wait_until(lambda: channel.count == 1)
+        os.write(fd, b'th": "/b"}\n')
+        wait_until(lambda: channel.count == 2)
+    finally:
+        os.close(fd)
+    assert [e["path"] for e in channel.events] == ["/a", "/b"]
+
+
+def test_wait_for_event(channel):
+    assert channel.wait_for_event(timeout=0.05) is None
+    with connect(channel) as s:
+        s.sendall(frame({"seq": 0, "path": "/x"}))
+        event = channel.wait_for_event(timeout=5, after=0)
+    assert event["path"] == "/x"
+
+
+# ---------------------------------------------------------------- extension
+
+@pytest.fixture
+def extension(tmp_path, monkeypatch):
+    """The Nautilus extension, loaded with just enough of gi to construct it."""
+    class Settings:
+        @staticmethod
+        def new(schema):
+            raise RuntimeError("no GSettings schema")
+
+    repository = types.SimpleNamespace(
+        Nautilus=types.SimpleNamespace(LocationWidgetProvider=type("LocationWidgetProvider", (), {})),
+        GObject=types.SimpleNamespace(GObject=type("GObject", (), {})),
+        Gio=types.SimpleNamespace(Settings=Settings),
+    )
+    gi = types.ModuleType("gi")
+    gi.require_version = lambda name, version: None
+    gi.repository = repository
+    monkeypatch.setitem(sys.modules, "gi", gi)
+    monkeypatch.setitem(sys.modules, "gi.repository", repository)
+    monkeypatch.setenv("HOME", str(tmp_path))
+
+    spec = importlib.util.spec_from_file_location("remote_selection", EXTENSION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.LocationPipeLogger()
+
+
+def test_extension_resends_its_backlog_after_reconnecting(tmp_path, extension):
+    events = []
+    sock_path, fifo_path = str(tmp_path / ".hidden.sock"), str(tmp_path / ".hidden")
+    first = NavigationEventChannel(sock_path, fifo_path, on_event=events.append)
+    extension.get_widget("file:///home/user/A", None)
+    wait_until(lambda: first.count == 1)
+    first.close()
+
+    # the host is gone but its socket path is back: nothing listens yet
+    dead = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    dead.bind(sock_path)
+    extension.get_widget("file:///home/user/B", None)
+    extension.get_widget("file:///home/user/C%20D", None)
+    dead.close()
+    assert len(extension._backlog) == 2
+
+    second = NavigationEventChannel(sock_path, fifo_path, on_event=events.append)
+    try:
+        extension.get_widget("file:///home/user/E", None)
+        wait_until(lambda: second.count == 3)
+        assert [(e["seq"], e["path"]) for e in events] == [
+            (0, "/home/user/A"), (1, "/home/user/B"), (2, "/home/user/C%20D"), (3, "/home/user/E"),
+        ]
+        assert events[0]["view"] == "unknown"
+        assert second.stats()["dropped"] == 0
+        assert not extension._backlog
+    finally:
+        second.close()
+
+
+def test_extension_falls_back_to_the_fifo(tmp_path, extension):
+    # a host without the socket: only the legacy FIFO exists
+    fifo_path = str(tmp_path / ".hidden")
+    os.mkfifo(fifo_path)
+    fd = os.open(fifo_path, os.O_RDONLY | os.O_NONBLOCK)
+    try:
+        extension.get_widget("file:///home/user/A", None)
+        line = os.read(fd, 65536)
+    finally:
+        os.close(fd)
+    assert json.loads(line) == {"seq": 0, "path": "/home/user/A", "view": "unknown"}
+    assert line.endswith(b"\n")
@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from file_browser_env.home_snapshot import TemplateCache, materialise, parse_template, plan_template
+
+TEMPLATE = [
+    "Documents/",
+    "  Reports/",
+    "    q1.pdf (1.5 MB)",
+    "  notes.txt (12 KB)",
+    "Music/",
+    "  Album/Disc 1/track01.mp3 (4 MB)",
+    "todo.md (300 B)",
+]
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(TemplateCache, "_plans", type(TemplateCache._plans)())
+
+
+def test_plan_lists_each_directory_once_parents_first():
+    plan = plan_template(parse_template(TEMPLATE))
+    assert plan.dirs == ("Documents", "Documents/Reports", "Music",
+                         "Music/Album", "Music/Album/Disc 1")
+    assert plan.files == (("Documents/Reports/q1.pdf", int(1.5 * 1024**2)),
+                          ("Documents/notes.txt", 12 * 1024),
+                          ("Music/Album/Disc 1/track01.mp3", 4 * 1024**2),
+                          ("todo.md", 300))
+
+
+def test_materialise_creates_sparse_files(tmp_path):
+    records = parse_template(TEMPLATE)
+    materialise(records, tmp_path)
+    track = tmp_path / "Music" / "Album" / "Disc 1" / "track01.mp3"
+    assert track.stat().st_size == 4 * 1024**2
+    assert track.stat().st_blocks == 0
+    # rebuilding over an existing tree truncates rather than failing
+    (tmp_path / "todo.md").write_bytes(b"x" * 1000)
+    materialise(plan_template(records), tmp_path)
+    assert (tmp_path / "todo.md").stat().st_size == 300
+
+
+def test_cache_loads_once_and_populates_directly(tmp_path):
+    loads = []
+
+    def load():
+        loads.append(1)
+        return parse_template(TEMPLATE)
+
+    for episode in range(3):
+        root = tmp_path / f"home{episode}"
+        root.mkdir()
+        records = TemplateCache.populate("t", str(root), load)
+        assert len(records) == len(TEMPLATE)
+        assert (root / "Documents" / "Reports" / "q1.pdf").is_file()
+        assert sorted(os.listdir(root)) == ["Documents", "Music", "todo.md"]
+    assert len(loads) == 1
+
+
+def test_load_runs_outside_the_lock():
+    # a loader that needs the cache itself would deadlock if get() held the lock
+    def load_outer():
+        TemplateCache.get("inner", lambda: parse_template(TEMPLATE[:1]))
+        return parse_template(TEMPLATE)
+
+    assert len(TemplateCache.get("outer", load_outer).records) == len(TEMPLATE)
+
+
+def test_least_recently_used_plan_is_dropped(monkeypatch):
+    monkeypatch.setattr(TemplateCache, "max_templates", 2)
+    load = lambda: parse_template(TEMPLATE)
+    TemplateCache.get("a", load)
+    TemplateCache.get("b", load)
+    TemplateCache.get("a", load)
+    TemplateCache.get("c", load)
+    assert list(TemplateCache._plans) == ["a", "c"]
@@ -0,0 +1,116 @@
+import pytest
+from docker.errors import NotFound
+
+from file_browser_env.env import FBEnvironment
+from file_browser_env.ipam import AddressPoolExhausted, SubnetAllocator
+
+
+class FakeNetworks:
+    """docker.networks with create() recorded instead of talking to the daemon."""
+
+    def __init__(self, existing=()):
+        self.existing = set(existing)
+        self.created = []
+
+    def get(self, name):
+        if name not in self.existing:
+            raise NotFound(f"network {name} not found")
+        return name
+
+    def create(self, name, driver=None, ipam=None):
+        self.created.append((name, driver, [pool["Subnet"] for pool in ipam["Config"]]))
+        self.existing.add(name)
+
+
+class FakeDocker:
+    def __init__(self, networks):
+        self.networks = networks
+
+
+@pytest.fixture
+def networks(monkeypatch):
+    networks = FakeNetworks(existing={"fb_net"})
+    monkeypatch.setattr(FBEnvironment.__dict__["_docker_client"], "_client", FakeDocker(networks))
+    return networks
+
+
+def make_allocator(prefix=29, max_networks=2):
+    # /29 blocks: six hosts, five leasable once the gateway is skipped
+    return SubnetAllocator(
+        "fb_net", "172.30.0.0/16",
+        lambda name, cidr: FBEnvironment._initialize_network(ip_range=cidr, name=name),
+        prefix=prefix, max_networks=max_networks,
+    )
+
+
+def test_first_network_is_loaded_not_created(networks):
+    a = make_allocator()
+    a.initialize()
+    a.initialize()
+    assert networks.created == []
+    assert [name for name, _ in a.networks] == ["fb_net"]
+    assert a.available() == 5
+    assert a.acquire() == ("172.30.0.2", "fb_net")
+
+
+def test_released_addresses_are_reused(networks):
+    a = make_allocator()
+    a.initialize()
+    ips = [a.acquire()[0] for _ in range(5)]
+    assert ips == [f"172.30.0.{i}" for i in range(2, 7)]
+    a.release(ips[1])
+    a.release(ips[1])
+    assert a.leased() == 4
+    # the freed address comes back before another network is created
+    assert a.acquire() == ("172.30.0.3", "fb_net")
+    assert networks.created == []
+
+
+def test_grows_into_a_new_network_when_full(networks):
+    a = make_allocator()
+    a.initialize()
+    for _ in range(5):
+        a.acquire()
+    assert a.acquire() == ("172.30.0.10", "fb_net_1")
+    assert networks.created == [("fb_net_1", "bridge", ["172.30.0.8/29"])]
+    assert a.available() == 4
+
+
+def test_exhaustion_raises(networks):
+    a = make_allocator(max_networks=2)
+    a.initialize()
+    for _ in range(10):
+        a.acquire()
+    with pytest.raises(AddressPoolExhausted, match="All 2 networks"):
+        a.acquire()
+    a.release("172.30.0.4")
+    assert a.acquire()[0] == "172.30.0.4"
+
+
+def test_supernet_without_room_raises(networks):
+    a = SubnetAllocator("fb_net", "172.30.0.0/28", lambda name, cidr: None, prefix=29)
+    a.initialize()
+    for _ in range(10):
+        a.acquire()
+    with pytest.raises(AddressPoolExhausted, match="no room"):
+        a.acquire()
+
+
+def test_reserved_static_address_is_skipped(networks):
+    a = make_allocator()
+    a.initialize()
+    assert a.reserve("172.30.0.2", owner="static") == "fb_net"
+    assert a.acquire()[0] == "172.30.0.3"
+    # an address outside every network still maps to the first one
+    assert a.reserve("10.0.0.5") == "fb_net"
+    a.release("172.30.0.2")
+    assert [a.acquire()[0] for _ in range(4)] == ["172.30.0.4", "172.30.0.5", "172.30.0.6", "172.30.0.2"]
+
+
+def test_reserved_address_in_a_later_network_is_not_handed_out(networks):
+    a = make_allocator()
+    a.initialize()
+    a.reserve("172.30.0.10")
+    ips = [a.acquire()[0] for _ in range(7)]
+    assert "172.30.0.10" not in ips
+    assert ips[5:] == ["172.30.0.11", "172.30.0.12"]
@@ -0,0 +1,124 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from file_browser_env.env import FBEnvironment
+from file_browser_env.ipam import AddressPoolExhausted
+from file_browser_env.leases import HostLeaseAllocator
+
+
+def make_allocator(state_dir, **kwargs):
+    networks = []
+    allocator = HostLeaseAllocator("fb_net_test", "172.30.0.0/16",
+                                   lambda name, cidr: networks.append((name, cidr)),
+                                   state_dir=str(state_dir), **kwargs)
+    allocator.networks_created = networks
+    return allocator
+
+
+def dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def write_dead_leases(state_dir, owners):
+    pid = dead_pid()
+    leases = {f"172.30.0.{10 + i}": {"pid": pid, "start": 1, "network": "fb_net_test",
+                                     "owner": owner, "heartbeat": 0}
+              for i, owner in enumerate(owners)}
+    state = {"networks": [["fb_net_test", "172.30.0.0/24"]], "leases": leases}
+    with open(os.path.join(state_dir, "fb_net_test.leases.json"), "w") as f:
+        json.dump(state, f)
+
+
+def test_acquire_and_release_through_the_lease_file(tmp_path):
+    a = make_allocator(tmp_path)
+    b = make_allocator(tmp_path)   # a second allocator sees the same file
+    a.initialize()
+    b.initialize()
+    assert a.networks_created == [("fb_net_test", "172.30.0.0/24")]
+
+    ip1, net = a.acquire(owner="c1")
+    ip2, _ = b.acquire(owner="c2")
+    assert net == "fb_net_test"
+    assert ip1 == "172.30.0.2" and ip2 == "172.30.0.3"
+    assert a.leased() == 2
+    assert b.live_owners() == {"c1", "c2"}
+
+    a.release(ip1)
+    assert b.leased() == 1
+    assert b.acquire(owner="c3")[0] == ip1
+
+
+def test_growing_and_exhaustion(tmp_path):
+    a = make_allocator(tmp_path, prefix=29, max_networks=2)
+    a.initialize()
+    ips = [a.acquire()[0] for _ in range(10)]
+    assert len(set(ips)) == 10
+    assert [n for n, _ in a.networks_created] == ["fb_net_test", "fb_net_test_1"]
+    with pytest.raises(AddressPoolExhausted):
+        a.acquire()
+
+
+def test_dead_process_leases_are_reclaimed_once(tmp_path):
+    write_dead_leases(tmp_path, ["old_1", "old_2"])
+    a = make_allocator(tmp_path)
+    a.initialize()
+
+    assert a.leased() == 0
+    assert sorted(a.take_reclaimed()) == ["old_1", "old_2"]
+    assert a.take_reclaimed() == []
+    assert a.acquire()[0] == "172.30.0.2"
+
+
+def test_concurrent_takers_never_share_a_name(tmp_path):
+    owners = [f"old_{i}" for i in range(50)]
+    write_dead_leases(tmp_path, owners)
+    a = make_allocator(tmp_path)
+    a.initialize()
+
+    taken = []
+    barrier = threading.Barrier(8)
+
+    def take():
+        barrier.wait()
+        taken.extend(a.take_reclaimed())
+
+    threads = [threading.Thread(target=take) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(taken) == sorted(owners)
+
+
+class FakeAPI:
+    def __init__(self):
+        self.removed = []
+
+    def remove_container(self, name, force=False):
+        if name == "already_gone":
+            raise RuntimeError("No such container")
+        self.removed.append((name, force))
+
+
+class FakeDocker:
+    def __init__(self):
+        self.api = FakeAPI()
+
+
+def test_reclaimed_containers_are_removed(tmp_path, monkeypatch):
+    docker = FakeDocker()
+    monkeypatch.setattr(FBEnvironment.__dict__["_docker_client"], "_client", docker)
+    write_dead_leases(tmp_path, ["old_1", "already_gone", "old_2"])
+    a = make_allocator(tmp_path)
+    a.initialize()
+
+    FBEnvironment._remove_reclaimed(a)
+    FBEnvironment._remove_reclaimed(a)
+    assert sorted(docker.api.removed) == [("old_1", True), ("old_2", True)]
@@ -0,0 +1,168 @@
+import docker
+import pytest
+from docker.errors import APIError, NotFound
+
+from file_browser_env.lifecycle import ContainerSpec, DockerSDKBackend, make_backend
+
+
+class FakeAPIClient(docker.APIClient):
+    """
+    The real low-level client with every daemon round trip replaced:
+    config building (host config, networking config, container config)
+    is docker-py's own, the calls that would hit the socket are recorded.
+    `fail` maps a method name to the exception it should raise.
+    """
+
+    def __init__(self, fail=None):
+        super().__init__(base_url="unix:///nonexistent.sock", version="1.41")
+        self.calls = []
+        self.fail = dict(fail or {})
+
+    def _record(self, method, *args, **kwargs):
+        self.calls.append((method, args, kwargs))
+        if method in self.fail:
+            raise self.fail[method]
+
+    def create_container_from_config(self, config, name=None, platform=None):
+        self._record("create", config, name=name)
+        return {"Id": f"id-{name}"}
+
+    def start(self, container, *args, **kwargs):
+        self._record("start", container)
+
+    def stop(self, container, timeout=None):
+        self._record("stop", container, timeout=timeout)
+
+    def remove_container(self, container, v=False, link=False, force=False):
+        self._record("remove", container, force=force)
+
+    def methods(self):
+        return [c[0] for c in self.calls]
+
+
+class FakeClient:
+    def __init__(self, api):
+        self.api = api
+
+
+def make_spec():
+    service = {
+        "image": "fb_image:latest",
+        "restart": "unless-stopped",
+        "security_opt": ["seccomp:unconfined"],
+        "volumes": ["/tmp/home_7:/home/user:rw"],
+        "expose": ["5900"],
+        "environment": {"DISPLAY_WIDTH": 640, "ICONVIEW": "true"},
+        "labels": {"created_by": "FBEnvironment20"},
+    }
+    return ContainerSpec("fbenv_7_fb_service_1", "fbenv_7", service, "fb_net_20", "172.20.0.7")
+
+
+def make_backend_with(fail=None):
+    api = FakeAPIClient(fail)
+    return DockerSDKBackend(FakeClient(api), stop_timeout=3), api
+
+
+def test_create_kwargs_match_compose():
+    backend, _ = make_backend_with()
+    kwargs = backend._create_kwargs(make_spec())
+
+    assert kwargs["image"] == "fb_image:latest"
+    assert kwargs["name"] == "fbenv_7_fb_service_1"
+    assert kwargs["environment"] == {"DISPLAY_WIDTH": "640", "ICONVIEW": "true"}
+    assert kwargs["ports"] == [5900]
+    assert kwargs["labels"] == {
+        "created_by": "FBEnvironment20",
+        "com.docker.compose.project": "fbenv_7",
+        "com.docker.compose.service": "fb_service",
+    }
+    host = kwargs["host_config"]
+    assert host["Binds"] == ["/tmp/home_7:/home/user:rw"]
+    assert host["SecurityOpt"] == ["seccomp:unconfined"]
+    assert host["RestartPolicy"] == {"Name": "unless-stopped"}
+    assert host["NetworkMode"] == "fb_net_20"
+    endpoint = kwargs["networking_config"]["EndpointsConfig"]["fb_net_20"]
+    assert endpoint["IPAMConfig"] == {"IPv4Address": "172.20.0.7"}
+
+
+def test_restart_no_sets_no_policy():
+    backend, _ = make_backend_with()
+    spec = make_spec()
+    spec.service["restart"] = "no"
+    assert "RestartPolicy" not in backend._create_kwargs(spec)["host_config"]
+
+
+def test_up_creates_and_starts():
+    backend, api = make_backend_with()
+    backend.up(make_spec())
+
+    assert api.methods() == ["create", "start"]
+    config = api.calls[0][1][0]
+    assert api.calls[0][2]["name"] == "fbenv_7_fb_service_1"
+    assert config["Image"] == "fb_image:latest"
+    assert config["Env"] == ["DISPLAY_WIDTH=640", "ICONVIEW=true"]
+    assert config["ExposedPorts"] == {"5900/tcp": {}}
+    assert api.calls[1][1] == ("id-fbenv_7_fb_service_1",)
+
+
+def test_failed_start_removes_container():
+    backend, api = make_backend_with({"start": APIError("address already in use")})
+    with pytest.raises(APIError):
+        backend.up(make_spec())
+    assert api.methods() == ["create", "start", "remove"]
+    assert api.calls[2][2] == {"force": True}
+
+
+def test_failed_create_propagates():
+    backend, api = make_backend_with({"create": APIError("no such image")})
+    with pytest.raises(APIError):
+        backend.up(make_spec())
+    assert api.methods() == ["create"]
+
+
+def test_down_stops_then_removes():
+    backend, api = make_backend_with()
+    backend.down(make_spec())
+    assert api.calls == [
+        ("stop", ("fbenv_7_fb_service_1",), {"timeout": 3}),
+        ("remove", ("fbenv_7_fb_service_1",), {"force": True}),
+    ]
+
+
+def test_down_of_missing_container_is_quiet():
+    backend, api = make_backend_with({"stop": NotFound("gone")})
+    backend.down(make_spec())
+    assert api.methods() == ["stop"]
+
+
+def test_down_removes_after_stop_error(capsys):
+    backend, api = make_backend_with({"stop": APIError("timeout")})
+    backend.down(make_spec())
+    assert api.methods() == ["stop", "remove"]
+    assert "Error stopping container" in capsys.readouterr().out
+
+
+def test_remove_ignores_not_found():
+    backend, api = make_backend_with({"remove": NotFound("gone")})
+    backend.down(make_spec())
+    assert api.methods() == ["stop", "remove"]
+
+
+def test_remove_propagates_other_errors():
+    backend, _ = make_backend_with({"remove": APIError("device busy")})
+    with pytest.raises(APIError):
+        backend.down(make_spec())
+
+
+def test_adopt_touches_nothing():
+    backend, api = make_backend_with()
+    backend.adopt(make_spec())
+    assert api.calls == []
+
+
+def test_make_backend():
+    api = FakeAPIClient()
+    assert isinstance(make_backend("sdk", FakeClient(api)), DockerSDKBackend)
+    assert make_backend("compose", None).name == "compose"
+    with pytest.raises(ValueError):
+        make_backend("podman", None)
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from file_browser_env.observation import AreaResize, ObservationProcessor
+from file_browser_env.readiness import luminance_u8
+
+
+def reference_resize(src, h, w):
+    """Per-bin mean, rounded half up, with the same bin edges as AreaResize."""
+    H, W = src.shape[:2]
+    out = np.empty((h, w, src.shape[2]), dtype=np.uint8)
+    for y in range(h):
+        y0, y1 = y * H // h, max((y + 1) * H // h, y * H // h + 1)
+        for x in range(w):
+            x0, x1 = x * W // w, max((x + 1) * W // w, x * W // w + 1)
+            block = src[y0:y1, x0:x1].astype(np.float64)
+            out[y, x] = np.floor(block.mean(axis=(0, 1)) + 0.5)
+    return out
+
+
+@pytest.mark.parametrize("in_hw, out_hw", [((8, 12), (4, 3)), ((10, 15), (4, 6)), ((7, 5), (3, 2))])
+def test_area_resize_matches_the_bin_means(in_hw, out_hw):
+    src = np.random.default_rng(1).integers(0, 256, in_hw + (3,), dtype=np.uint8)
+    out = np.empty(out_hw + (3,), dtype=np.uint8)
+    assert AreaResize(in_hw, out_hw)(src, out) is out
+    assert (out == reference_resize(src, *out_hw)).all()
+
+
+def test_area_resize_rounds_half_up():
+    src = np.array([[[1], [2]]], dtype=np.uint8)
+    out = np.empty((1, 1, 1), dtype=np.uint8)
+    AreaResize((1, 2), (1, 1))(src, out)
+    assert out[0, 0, 0] == 2
+
+
+def test_area_resize_upscales_by_repeating():
+    src = np.arange(4, dtype=np.uint8).reshape(2, 2, 1)
+    out = np.empty((4, 4, 1), dtype=np.uint8)
+    AreaResize((2, 2), (4, 4))(src, out)
+    assert out[..., 0].tolist() == [[0, 0, 1, 1], [0, 0, 1, 1], [2, 2, 3, 3], [2, 2, 3, 3]]
+
+
+def test_grayscale_then_resize():
+    frame = np.random.default_rng(2).integers(0, 256, (8, 12, 3), dtype=np.uint8)
+    proc = ObservationProcessor((8, 12), size=(4, 6), grayscale=True)
+    assert proc.shape == (4, 6, 1)
+    obs = proc(frame)
+    assert (obs == reference_resize(luminance_u8(frame)[..., None], 4, 6)).all()
+
+
+def test_without_options_frames_pass_through():
+    frame = np.random.default_rng(3).integers(0, 256, (4, 6, 3), dtype=np.uint8)
+    proc = ObservationProcessor((4, 6))
+    assert proc.shape == (4, 6, 3)
+    assert (proc(frame) == frame).all()
+
+
+def test_frame_stack_is_oldest_first_and_primed_on_reset():
+    proc = ObservationProcessor((2, 2), grayscale=True, frame_stack=3)
+    assert proc.shape == (2, 2, 3)
+
+    def gray(value):
+        return np.full((2, 2, 3), value, dtype=np.uint8)
+
+    stacked = lambda obs: obs[0, 0].tolist()
+    # the first frame of an episode fills the whole stack
+    assert stacked(proc(gray(10))) == [10, 10, 10]
+    assert stacked(proc(gray(20))) == [10, 10, 20]
+    assert stacked(proc(gray(30))) == [10, 20, 30]
+    assert stacked(proc(gray(40))) == [20, 30, 40]
+    proc.reset()
+    assert stacked(proc(gray(50))) == [50, 50, 50]
+    assert stacked(proc(gray(60))) == [50, 50, 60]
+
+
+def test_frame_stack_keeps_colour_channels_together():
+    proc = ObservationProcessor((1, 1), frame_stack=2)
+    proc(np.array([[[1, 2, 3]]], dtype=np.uint8))
+    obs = proc(np.array([[[4, 5, 6]]], dtype=np.uint8))
+    assert obs[0, 0].tolist() == [1, 2, 3, 4, 5, 6]
+
+
+def test_frame_stack_must_be_positive():
+    with pytest.raises(ValueError):
+        ObservationProcessor((2, 2), frame_stack=0)
@@ -0,0 +1,157 @@
+import threading
+import time
+
+import pytest
+
+from file_browser_env import pool as pool_module
+from file_browser_env.env import FBEnvironmentException
+from file_browser_env.pool import FBEnvironmentPool
+
+
+class FakeEnv:
+    """Stands in for FBEnvironment; `failures` launches raise before one succeeds."""
+
+    failures = 0
+    launches = []
+    lock = threading.Lock()
+
+    def __init__(self, height, width, **kwargs):
+        with FakeEnv.lock:
+            FakeEnv.launches.append(time.monotonic())
+            if len(FakeEnv.launches) <= FakeEnv.failures:
+                raise RuntimeError("container did not start")
+        self.kwargs = kwargs
+        self.resets = []
+        self.screens = 0
+        self.closed = False
+        self.fail_reset = False
+
+    def getScreen(self):
+        self.screens += 1
+
+    def reset(self, seed=None):
+        self.resets.append(seed)
+        if self.fail_reset:
+            self.fail_reset = False
+            raise RuntimeError("reset failed")
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fake_env(monkeypatch):
+    monkeypatch.setattr(FakeEnv, "failures", 0)
+    monkeypatch.setattr(FakeEnv, "launches", [])
+    monkeypatch.setattr(pool_module, "FBEnvironment", FakeEnv)
+
+
+def wait_until(predicate, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > end:
+            raise AssertionError("condition not reached in time")
+        time.sleep(0.01)
+
+
+def test_acquire_release_and_close():
+    pool = FBEnvironmentPool(2, 48, 64, username="u")
+    try:
+        a = pool.acquire(timeout=5)
+        b = pool.acquire(timeout=5)
+        assert a is not b
+        assert a.screens == 1 and a.kwargs == {"username": "u"}
+        assert pool.ready_count() == 0
+        pool.release(a)
+        wait_until(lambda: pool.ready_count() == 1)
+        assert a.resets == [None]
+        assert pool.acquire(timeout=5) is a
+    finally:
+        pool.close()
+    assert a.closed and b.closed
+
+
+def test_acquire_times_out():
+    FakeEnv.failures = 100
+    pool = FBEnvironmentPool(1, 48, 64, retry_backoff=5.0)
+    try:
+        with pytest.raises(FBEnvironmentException, match="Timed out"):
+            pool.acquire(timeout=0.1)
+    finally:
+        pool.close()
+
+
+def test_failed_launches_back_off_and_retry():
+    FakeEnv.failures = 2
+    pool = FBEnvironmentPool(1, 48, 64, retry_backoff=0.05)
+    try:
+        env = pool.acquire(timeout=5)
+        assert env.screens == 1
+        t0, t1, t2 = FakeEnv.launches
+        # first retry after one backoff, the second after twice that
+        assert t1 - t0 >= 0.05
+        assert t2 - t1 >= 0.1
+    finally:
+        pool.close()
+
+
+def test_pool_gives_up_after_max_retries():
+    FakeEnv.failures = 100
+    pool = FBEnvironmentPool(1, 48, 64, max_retries=1, retry_backoff=0.01)
+    try:
+        # the broken marker is re-posted, so every waiter sees the error
+        for _ in range(2):
+            with pytest.raises(FBEnvironmentException, match="container did not start"):
+                pool.acquire(timeout=5)
+        assert pool.ready_count() == 0
+        assert len(FakeEnv.launches) == 2
+    finally:
+        pool.close()
+
+
+def test_seeded_acquire_resets_in_the_caller():
+    pool = FBEnvironmentPool(1, 48, 64)
+    try:
+        env = pool.acquire(timeout=5, seed=7)
+        assert env.resets == [7]
+    finally:
+        pool.close()
+
+
+def test_failed_seeded_reset_returns_the_environment():
+    pool = FBEnvironmentPool(1, 48, 64)
+    try:
+        wait_until(lambda: pool.ready_count() == 1)
+        env = pool._ready.queue[0]
+        env.fail_reset = True
+        with pytest.raises(RuntimeError, match="reset failed"):
+            pool.acquire(timeout=5, seed=3)
+        # handed back and reset in the background, unseeded
+        assert pool.acquire(timeout=5) is env
+        assert env.resets == [3, None]
+    finally:
+        pool.close()
+
+
+def test_swap_hands_out_a_fresh_environment():
+    pool = FBEnvironmentPool(2, 48, 64)
+    try:
+        old = pool.acquire(timeout=5)
+        new = pool.swap(old, timeout=5, seed=11)
+        assert new is not old
+        assert new.resets == [11]
+        wait_until(lambda: old.resets == [None])
+        assert pool.acquire(timeout=5) is old
+    finally:
+        pool.close()
+
+
+def test_release_after_close_closes_the_environment():
+    pool = FBEnvironmentPool(1, 48, 64)
+    env = pool.acquire(timeout=5)
+    pool.close()
+    env.closed = False
+    pool.release(env)
+    assert env.closed
+    with pytest.raises(FBEnvironmentException, match="closed"):
+        pool.acquire(timeout=1)
@@ -0,0 +1,34 @@
+import numpy as np
+
+from file_browser_env.readiness import FrameReadiness, luminance_u8
+
+BLACK = np.zeros((40, 40, 3), dtype=np.uint8)
+WHITE = np.full((40, 40, 3), 255, dtype=np.uint8)
+
+
+def test_luminance_matches_float_weights():
+    rng = np.random.default_rng(0)
+    arr = rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    ref = arr @ np.array([0.2989, 0.5870, 0.1140])
+    assert np.abs(luminance_u8(arr).astype(int) - ref.astype(np.uint8)).max() <= 1
+
+
+def test_black_frame_stays_cold_until_usable():
+    r = FrameReadiness()
+    assert not r.check(BLACK)
+    assert r.stats() == {"count": 0}
+    assert r.check(WHITE)
+    assert r.warm
+    # warm instances accept anything until the next reset
+    assert r.check(BLACK)
+    r.mark_cold()
+    assert not r.check(BLACK)
+    assert r.stats()["count"] == 1
+
+
+def test_samples_are_bounded_but_totals_cover_the_run():
+    r = FrameReadiness(window=3)
+    for seconds in (5.0, 1.0, 2.0, 3.0, 4.0):
+        r._record(seconds)
+    assert len(r._samples) == 3
+    assert r.stats() == {"count": 5, "last": 4.0, "mean": 3.0, "p50": 3.0, "min": 1.0, "max": 5.0}
@@ -0,0 +1,153 @@
+import time
+
+import numpy as np
+import pytest
+
+from file_browser_env.rfb import AsyncVNCClient, RFBError, keysym, split_combo
+from tests.fake_rfb import FakeRFBServer
+
+RED = (255, 0, 0)
+
+
+def wait_until(predicate, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > end:
+            raise AssertionError("condition not reached in time")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def server(request):
+    kwargs = getattr(request, "param", {})
+    srv = FakeRFBServer(64, 48, mark_pointer=False, **kwargs).start()
+    yield srv
+    srv.stop()
+
+
+def connect(server, **kwargs):
+    client = AsyncVNCClient("127.0.0.1", server.port, timeout=5, **kwargs)
+    client.framebuffer.wait_ready(5)
+    return client
+
+
+def test_keysym_and_combos():
+    assert keysym("a") == ord("a")
+    assert keysym("Return") == 0xff0d
+    assert keysym("f12") == 0xffc9
+    assert split_combo("ctrl+c") == ["ctrl", "c"]
+    assert split_combo("ctrl-shift-t") == ["ctrl", "shift", "t"]
+    assert split_combo("-") == ["-"]
+    with pytest.raises(ValueError):
+        keysym("nosuchkey")
+
+
+def test_handshake_requests_rgbx(server):
+    client = connect(server)
+    try:
+        fb = client.framebuffer
+        assert (fb.width, fb.height) == (64, 48)
+        assert client.client.name == "fake"
+        assert server.pixel_formats == [(0, 8, 16)]
+        assert (fb.read(0, 0, 64, 48) == 96).all()
+    finally:
+        client.disconnect()
+
+
+@pytest.mark.parametrize("server", [{"version": (3, 3), "password": "12345"},
+                                    {"version": (3, 8), "password": "12345"}], indirect=True)
+def test_vnc_authentication(server):
+    client = connect(server, password="12345")
+    client.disconnect()
+    with pytest.raises(RFBError):
+        AsyncVNCClient("127.0.0.1", server.port, password="wrong", timeout=5)
+
+
+@pytest.mark.parametrize("server", [{"native": "bgrx"}], indirect=True)
+def test_raw_update_is_rgb(server):
+    client = connect(server)
+    try:
+        fb = client.framebuffer
+        version = fb.version
+        server.paint(8, 4, 6, 5, RED)
+        wait_until(lambda: fb.wait_for_update(version, 0.1) > version)
+        assert (fb.read(8, 4, 6, 5) == RED).all()
+        assert (fb.read(0, 0, 8, 4) == 96).all()
+    finally:
+        client.disconnect()
+
+
+def test_copyrect(server):
+    client = connect(server)
+    try:
+        fb = client.framebuffer
+        server.paint(0, 0, 4, 4, RED)
+        wait_until(lambda: (fb.read(0, 0, 4, 4) == RED).all())
+        server.copy(0, 0, 20, 10, 4, 4)
+        wait_until(lambda: (fb.read(20, 10, 4, 4) == RED).all())
+        np.testing.assert_array_equal(fb.read(0, 0, 4, 4), fb.read(20, 10, 4, 4))
+    finally:
+        client.disconnect()
+
+
+def test_input_encoding(server):
+    client = connect(server)
+    try:
+        client.mouseMove(10, 20)
+        client.mousePress(1)
+        client.mouseDown(3)
+        client.mouseUp(3)
+        client.keyPress("ctrl+c")
+        wait_until(lambda: server.pointer_events == 5 and server.key_events == 4)
+        assert server.pointer == [(0, 10, 20), (1, 10, 20), (0, 10, 20), (4, 10, 20), (0, 10, 20)]
+        ctrl, c = keysym("ctrl"), ord("c")
+        assert server.keys == [(True, ctrl), (True, c), (False, c), (False, ctrl)]
+    finally:
+        client.disconnect()
+
+
+def test_macro_is_one_batch(server):
+    client = connect(server)
+    try:
+        client.runMacro([("mouseMove", 5, 6), ("mouseDown", 1), ("mouseUp", 1),
+                         ("keyDown", "shift"), ("keyUp", "shift")])
+        wait_until(lambda: server.pointer_events == 3 and server.key_events == 2)
+        assert server.pointer == [(0, 5, 6), (1, 5, 6), (0, 5, 6)]
+        assert server.keys == [(True, keysym("shift")), (False, keysym("shift"))]
+    finally:
+        client.disconnect()
+
+
+@pytest.mark.parametrize("server", [{"native": "bgrx"}], indirect=True)
+def test_vncdotool_framebuffer_negotiates_rgbx(server):
+    from vncdotool import api
+    from file_browser_env.framebuffer import FramebufferFactory
+
+    client = api.connect(f"127.0.0.1::{server.port}", timeout=5, factory_class=FramebufferFactory)
+    try:
+        client.mouseMove(1, 1)
+        fb = client.factory.framebuffer
+        fb.wait_ready(5)
+        assert server.pixel_formats[0] == (0, 8, 16)
+        server.paint(0, 0, 4, 4, RED)
+        wait_until(lambda: (fb.read(0, 0, 4, 4) == RED).all())
+    finally:
+        client.disconnect()
+
+
+def test_vncdotool_region_capture_requests_only_the_region(server):
+    from vncdotool import api
+    from file_browser_env.framebuffer import RegionCaptureFactory
+
+    server.paint(10, 8, 6, 4, RED)
+    client = api.connect(f"127.0.0.1::{server.port}", timeout=5, factory_class=RegionCaptureFactory)
+    try:
+        images = []
+        client.captureRegionPIL(images.append, 8, 6, 10, 8)
+        region = np.asarray(images[0].convert("RGB"))
+        assert region.shape == (8, 10, 3)
+        assert (region[2:6, 2:8] == RED).all()
+        assert (region[0, 0] == 96).all()
+        assert server.update_requests[-1] == (0, 8, 6, 10, 8)
+    finally:
+        client.disconnect()
@@ -0,0 +1,81 @@
+import threading
+import time
+
+from file_browser_env.settle import FrameSettler
+
+
+class FakeEvents:
+    def __init__(self):
+        self.count = 0
+        self._cond = threading.Condition()
+
+    def fire(self, delay):
+        def run():
+            time.sleep(delay)
+            with self._cond:
+                self.count += 1
+                self._cond.notify_all()
+        threading.Thread(target=run, daemon=True).start()
+
+    def wait_for_event(self, timeout=None, after=None):
+        with self._cond:
+            if self._cond.wait_for(lambda: self.count > after, timeout):
+                return {"count": self.count}
+            return None
+
+
+class FakeFramebuffer:
+    def __init__(self, updates=()):
+        self.version = 0
+        self._cond = threading.Condition()
+        for delay in updates:
+            threading.Timer(delay, self._update).start()
+
+    def _update(self):
+        with self._cond:
+            self.version += 1
+            self._cond.notify_all()
+
+    def wait_for_update(self, since, timeout):
+        with self._cond:
+            self._cond.wait_for(lambda: self.version > since, timeout)
+            return self.version
+
+
+def test_without_framebuffer_steps_do_not_wait():
+    settler = FrameSettler(quiet=0.05, idle=0.15, deadline=1.0)
+    waited, outcome = settler.settle(None, FakeEvents(), 0, 0)
+    assert outcome == "idle"
+    assert waited < 0.05
+
+
+def test_without_framebuffer_fallback_ends_early_on_event():
+    settler = FrameSettler(quiet=0.02, idle=0.15, deadline=5.0)
+    events = FakeEvents()
+    events.fire(0.05)
+    waited, outcome = settler.settle(None, events, 0, 0, require_event=True, fallback=0.5)
+    assert outcome == "event"
+    assert waited < 0.3
+
+
+def test_without_framebuffer_fallback_is_a_fixed_cap():
+    settler = FrameSettler(quiet=0.02, idle=0.15, deadline=5.0)
+    waited, outcome = settler.settle(None, FakeEvents(), 0, 0, require_event=True, fallback=0.2)
+    assert outcome == "deadline"
+    assert 0.15 < waited < 0.5
+
+
+def test_framebuffer_settles_once_updates_go_quiet():
+    settler = FrameSettler(quiet=0.05, idle=0.15, deadline=1.0, poll=0.01)
+    fb = FakeFramebuffer(updates=(0.01, 0.03))
+    waited, outcome = settler.settle(fb, FakeEvents(), 0, 0)
+    assert outcome == "quiet"
+    assert fb.version == 2
+    assert waited < 0.15
+
+
+def test_framebuffer_without_changes_is_idle():
+    settler = FrameSettler(quiet=0.05, idle=0.1, deadline=1.0, poll=0.01)
+    waited, outcome = settler.settle(FakeFramebuffer(), FakeEvents(), 0, 0)
+    assert outcome == "idle"
+    assert 0.09 < waited < 0.3
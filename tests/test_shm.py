@@ -0,0 +1,85 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+from multiprocessing import shared_memory
+
+from file_browser_env.shm import SharedObservationRing
+
+
+def frame(value, shape=(4, 6, 3)):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def read_in_child(name, slot, seq, conn):
+    ring = SharedObservationRing.attach(name)
+    try:
+        view = ring.read(slot, seq)
+        conn.send(None if view is None else (ring.shape, ring.slots, view.copy()))
+    finally:
+        ring.close()
+
+
+@pytest.fixture
+def ring():
+    ring = SharedObservationRing((4, 6, 3), slots=3)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+
+def test_write_and_read_in_place(ring):
+    assert ring.write(frame(1)) == (0, 0)
+    assert ring.write(frame(2)) == (1, 1)
+    view = ring.read(1, seq=1)
+    assert (view == 2).all()
+    assert not view.flags.writeable
+    assert ring.sequence(2) == -1
+
+
+def test_wrapped_slot_reads_as_none(ring):
+    for value in range(4):
+        ring.write(frame(value))
+    # slot 0 held seq 0, now overwritten by seq 3
+    assert ring.read(0, seq=0) is None
+    assert (ring.read(0, seq=3) == 3).all()
+    assert (ring.read(0) == 3).all()
+
+
+def test_another_process_attaches_by_name(ring):
+    ring.write(frame(7))
+    slot, seq = ring.write(frame(9))
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe()
+    proc = ctx.Process(target=read_in_child, args=(ring.name, slot, seq, child))
+    proc.start()
+    shape, slots, data = parent.recv()
+    proc.join(10)
+    assert proc.exitcode == 0
+    assert (shape, slots) == ((4, 6, 3), 3)
+    assert (data == 9).all()
+
+
+def test_attach_rejects_foreign_segments():
+    shm = shared_memory.SharedMemory(create=True, size=128)
+    try:
+        with pytest.raises(ValueError, match="not an observation ring"):
+            SharedObservationRing.attach(shm.name)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_too_many_dimensions():
+    with pytest.raises(ValueError):
+        SharedObservationRing((1, 2, 3, 4, 5))
+
+
+def test_unlink_removes_the_segment():
+    ring = SharedObservationRing((2, 2), slots=2)
+    name = ring.name
+    ring.close()
+    ring.unlink()
+    ring.unlink()
+    with pytest.raises(FileNotFoundError):
+        SharedObservationRing.attach(name)
@@ -0,0 +1,67 @@
+import json
+
+from file_browser_env.template_store import (TemplateStore, TemplateStoreWriter, compile_directory,
+                                             corpus_store)
+
+TREE = ["Documents/", "  a.txt (1 KB)", "Music/"]
+
+
+def write_store(path, names):
+    with TemplateStoreWriter(str(path)) as writer:
+        for name in names:
+            writer.add_lines(name, TREE)
+
+
+def names(path):
+    store = TemplateStore(str(path))
+    try:
+        return [store.name(i) for i in range(len(store))]
+    finally:
+        store.close()
+
+
+def test_compile_merges_text_jsonl_and_fbt(tmp_path):
+    src = tmp_path / "corpus"
+    src.mkdir()
+    (src / "a_tree.txt").write_text("\n".join(TREE))
+    (src / "b_shard.jsonl").write_text(json.dumps({"name": "j0", "tree": "\n".join(TREE)}) + "\n")
+    write_store(src / "c_shard.fbt", ["s0", "s1"])
+    (src / "manifest.json").write_text("{}")
+
+    out = tmp_path / "all.fbt"
+    assert compile_directory(str(src), str(out)) == 4
+    assert names(out) == ["a_tree.txt", "j0", "s0", "s1"]
+    store = TemplateStore(str(out))
+    assert [r.path for r in store.records(3)] == ["Documents", "Documents/a.txt", "Music"]
+    store.close()
+
+
+def test_compile_into_its_own_directory_skips_the_output(tmp_path):
+    write_store(tmp_path / "shard-00000.fbt", ["s0"])
+    out = tmp_path / "corpus.fbt"
+    assert compile_directory(str(tmp_path), str(out)) == 1
+    # compiling again must not read the previous output back in
+    assert compile_directory(str(tmp_path), str(out)) == 1
+
+
+def test_corpus_store_follows_the_manifest(tmp_path):
+    assert corpus_store(str(tmp_path)) is None
+    (tmp_path / "manifest.json").write_text(json.dumps({"format": "jsonl", "shards": []}))
+    assert corpus_store(str(tmp_path)) is None
+    (tmp_path / "manifest.json").write_text(json.dumps({"format": "fbt", "store": "corpus.fbt"}))
+    assert corpus_store(str(tmp_path)) == str(tmp_path / "corpus.fbt")
+
+
+def test_environment_loads_a_corpus_directory(tmp_path):
+    from file_browser_env.env import FBEnvironment
+
+    write_store(tmp_path / "corpus.fbt", ["t0", "t1", "t2"])
+    (tmp_path / "manifest.json").write_text(json.dumps({"format": "fbt", "store": "corpus.fbt"}))
+    store, listing = FBEnvironment._template_source(str(tmp_path))
+    try:
+        assert listing is None
+        assert len(store) == 3
+        assert FBEnvironment._template_source(str(tmp_path))[0] is store
+    finally:
+        FBEnvironment._template_stores.pop(str(tmp_path), None)
+        store.close()
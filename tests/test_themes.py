@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+from file_browser_env.themes import INSTALL_DIR, ThemeBundle, build_bundle, find_themes, install_source
+
+
+def gtk_theme(path):
+    os.makedirs(os.path.join(path, "gtk-3.0"))
+    with open(os.path.join(path, "index.theme"), "w") as f:
+        f.write("[Desktop Entry]\nType=X-GNOME-Metatheme\n")
+    with open(os.path.join(path, "gtk-3.0", "gtk.css"), "w") as f:
+        f.write("window {}\n")
+
+
+def icon_theme(path):
+    os.makedirs(os.path.join(path, "16x16", "places"))
+    with open(os.path.join(path, "index.theme"), "w") as f:
+        f.write("[Icon Theme]\nName=x\nDirectories=16x16/places\n")
+    open(os.path.join(path, "16x16", "places", "folder.png"), "wb").close()
+
+
+def source_tree(root):
+    """A source that was built, one installed in place, nested icon themes and an unbuilt source."""
+    gtk_theme(os.path.join(root, "themes", "Materia", INSTALL_DIR, "share", "themes", "Materia-dark"))
+    os.makedirs(os.path.join(root, "themes", "Materia", "src", "gtk-3.0"))
+    gtk_theme(os.path.join(root, "themes", "Dracula"))
+    icon_theme(os.path.join(root, "icons", "Papirus", "Papirus"))
+    icon_theme(os.path.join(root, "icons", "Papirus", "Papirus-Dark"))
+    os.makedirs(os.path.join(root, "icons", "Papirus", ".git", "objects"))
+    os.makedirs(os.path.join(root, "icons", "Tela", "src"))
+
+
+def test_find_themes_descends_but_not_into_themes(tmp_path):
+    icon_theme(str(tmp_path / "Papirus"))
+    icon_theme(str(tmp_path / "Papirus" / "nested"))
+    icon_theme(str(tmp_path / "a" / "b" / "c" / "d" / "too-deep"))
+    assert find_themes("icons", str(tmp_path)) == [str(tmp_path / "Papirus")]
+    assert find_themes("themes", str(tmp_path)) == []
+
+
+def test_install_source_runs_commands_into_prefix(tmp_path):
+    script = ["sh", "-c", "mkdir -p {prefix}/share/themes/Built/gtk-3.0 && "
+              "touch {prefix}/share/themes/Built/index.theme {prefix}/share/themes/Built/gtk-3.0/gtk.css"]
+    assert install_source(str(tmp_path), [script]) is None
+    assert find_themes("themes", str(tmp_path / INSTALL_DIR))[0].endswith("Built")
+    # installed once; a second fetch does not rebuild
+    assert install_source(str(tmp_path), [["false"]]) is None
+
+
+def test_failed_install_leaves_no_prefix(tmp_path):
+    error = install_source(str(tmp_path), [["sh", "-c", "echo missing sassc >&2; exit 3"]])
+    assert "exit 3: missing sassc" in error
+    assert not (tmp_path / INSTALL_DIR).exists()
+
+
+def test_build_bundle_packs_installed_and_nested_themes(tmp_path):
+    src = str(tmp_path / "src")
+    source_tree(src)
+    out = str(tmp_path / "themes.tar")
+    index = build_bundle(src, out)
+
+    assert [(e["name"], e["source"]) for e in index["themes"]] == [("Dracula", "Dracula"),
+                                                                   ("Materia-dark", "Materia")]
+    assert [e["name"] for e in index["icons"]] == ["Papirus", "Papirus-Dark"]
+
+    bundle = ThemeBundle(out, cache_dir=str(tmp_path / "cache"))
+    assert bundle.verify() == []
+    assert os.path.isfile(os.path.join(bundle.root, "themes", "Materia-dark", "gtk-3.0", "gtk.css"))
+
+
+def test_build_fails_when_most_sources_are_skipped(tmp_path):
+    src = str(tmp_path / "src")
+    source_tree(src)
+    for name in ("Adapta", "Arc", "Pop"):
+        os.makedirs(os.path.join(src, "themes", name, "src"))
+    with pytest.raises(ValueError, match="Only 3 of 7"):
+        build_bundle(src, str(tmp_path / "themes.tar"))
+    assert build_bundle(src, str(tmp_path / "themes.tar"), min_sources=0)["themes"]
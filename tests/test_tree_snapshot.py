@@ -0,0 +1,66 @@
+from file_browser_env.tree_snapshot import TreeDiff, TreeSnapshot
+
+
+def snap(*entries):
+    """Entries as (path, is_dir, inode)."""
+    return TreeSnapshot.create([(p, d) for p, d, _ in entries], [i for _, _, i in entries])
+
+
+def test_equal_snapshots_are_interned_and_have_no_diff():
+    a = snap(("A", True, 1), ("A/x.txt", False, 2))
+    b = snap(("A", True, 1), ("A/x.txt", False, 2))
+    assert a is b
+    assert a.diff(b) == TreeDiff((), (), ())
+    assert not a.diff(b)
+
+
+def test_move_keeps_the_name():
+    old = snap(("A", True, 1), ("A/x.txt", False, 2), ("B", True, 3))
+    new = snap(("A", True, 1), ("B", True, 3), ("B/x.txt", False, 2))
+    assert old.diff(new) == TreeDiff((), (), (("A/x.txt", "B/x.txt", False),))
+
+
+def test_rename_keeps_the_directory():
+    old = snap(("A", True, 1), ("A/x.txt", False, 2))
+    new = snap(("A", True, 1), ("A/y.txt", False, 2))
+    assert old.diff(new) == TreeDiff((), (), (("A/x.txt", "A/y.txt", False),))
+
+
+def test_directory_move_reports_the_directory():
+    old = snap(("A", True, 1), ("A/sub", True, 5), ("B", True, 3))
+    new = snap(("A", True, 1), ("B", True, 3), ("B/sub", True, 5))
+    assert old.diff(new).moved == (("A/sub", "B/sub", True),)
+
+
+def test_reused_inode_with_new_name_and_place_is_not_a_move():
+    # x.txt deleted, its inode recycled for an unrelated file elsewhere
+    old = snap(("A", True, 1), ("A/x.txt", False, 2), ("B", True, 3))
+    new = snap(("A", True, 1), ("B", True, 3), ("B/y.txt", False, 2))
+    assert old.diff(new) == TreeDiff((("B/y.txt", False),), (("A/x.txt", False),), ())
+
+
+def test_delete_plus_create_with_same_name_is_not_a_move():
+    old = snap(("A", True, 1), ("A/x.txt", False, 2), ("B", True, 3))
+    new = snap(("A", True, 1), ("B", True, 3), ("B/x.txt", False, 99))
+    assert old.diff(new) == TreeDiff((("B/x.txt", False),), (("A/x.txt", False),), ())
+
+
+def test_without_inodes_unique_names_pair_up():
+    old = TreeSnapshot.create([("A", True), ("A/x.txt", False), ("B", True)])
+    new = TreeSnapshot.create([("A", True), ("B", True), ("B/x.txt", False)])
+    assert old.diff(new).moved == (("A/x.txt", "B/x.txt", False),)
+
+
+def test_without_inodes_ambiguous_names_stay_added_and_removed():
+    old = TreeSnapshot.create([("A/x.txt", False), ("B/x.txt", False)])
+    new = TreeSnapshot.create([("C/x.txt", False), ("D/x.txt", False)])
+    d = old.diff(new)
+    assert d.moved == ()
+    assert d.added == (("C/x.txt", False), ("D/x.txt", False))
+    assert d.removed == (("A/x.txt", False), ("B/x.txt", False))
+
+
+def test_type_change_is_remove_plus_add():
+    old = snap(("x", False, 2))
+    new = snap(("x", True, 7))
+    assert old.diff(new) == TreeDiff((("x", True),), (("x", False),), ())
@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+from file_browser_env import tree_watch
+from file_browser_env.tree_snapshot import TreeDiff
+from file_browser_env.tree_watch import DirectoryTreeWatcher
+
+
+@pytest.fixture(params=["inotify", "walk"])
+def watcher(request, tmp_path, monkeypatch):
+    if request.param == "walk":
+        monkeypatch.setattr(tree_watch, "_libc", None)
+    elif tree_watch._libc is None:
+        pytest.skip("inotify not available")
+    for d in ("A/sub/deep", "B"):
+        (tmp_path / d).mkdir(parents=True)
+    (tmp_path / "A" / "sub" / "deep" / "f.txt").write_text("x")
+    (tmp_path / "A" / "a.txt").write_text("x")
+    w = DirectoryTreeWatcher(str(tmp_path))
+    assert w.inotify == (request.param == "inotify")
+    yield w
+    w.close()
+
+
+def full_walk(root):
+    """What a fresh watcher without inotify reports."""
+    w = DirectoryTreeWatcher(str(root))
+    w.close()
+    return w.get_tree()
+
+
+def test_initial_tree(watcher):
+    assert watcher.get_tree().splitlines() == [
+        "A/", "  a.txt", "  sub/", "    deep/", "      f.txt", "B/",
+    ]
+
+
+def test_unchanged_tree_is_not_relisted(watcher, monkeypatch):
+    if not watcher.inotify:
+        pytest.skip("without inotify every query walks")
+    text = watcher.get_tree()
+    monkeypatch.setattr(watcher, "_list", lambda path: pytest.fail(f"relisted {path}"))
+    assert watcher.get_tree() is text
+
+
+def test_create(watcher, tmp_path):
+    watcher.get_tree()
+    (tmp_path / "B" / "new.txt").write_text("x")
+    (tmp_path / "A" / "sub" / "deep" / "inner").mkdir()
+    (tmp_path / ".hidden").write_text("x")
+    tree = watcher.get_tree()
+    assert "  new.txt" in tree.splitlines()
+    assert "      inner/" in tree.splitlines()
+    assert ".hidden" not in tree
+    assert tree == full_walk(tmp_path)
+
+
+def test_rename(watcher, tmp_path):
+    before = watcher.get_snapshot()
+    os.rename(tmp_path / "A" / "a.txt", tmp_path / "A" / "b.txt")
+    after = watcher.get_snapshot()
+    assert before.diff(after) == TreeDiff((), (), (("A/a.txt", "A/b.txt", False),))
+    assert watcher.get_tree() == full_walk(tmp_path)
+
+
+def test_delete(watcher, tmp_path):
+    watcher.get_tree()
+    (tmp_path / "A" / "sub" / "deep" / "f.txt").unlink()
+    os.rmdir(tmp_path / "A" / "sub" / "deep")
+    (tmp_path / "A" / "a.txt").unlink()
+    assert watcher.get_tree().splitlines() == ["A/", "  sub/", "B/"]
+
+
+def test_recursive_directory_move(watcher, tmp_path):
+    before = watcher.get_snapshot()
+    os.rename(tmp_path / "A" / "sub", tmp_path / "B" / "sub")
+    after = watcher.get_snapshot()
+    assert before.diff(after).moved == (
+        ("A/sub", "B/sub", True),
+        ("A/sub/deep", "B/sub/deep", True),
+        ("A/sub/deep/f.txt", "B/sub/deep/f.txt", False),
+    )
+    assert watcher.get_tree() == full_walk(tmp_path)
+    # the moved subtree is still watched under its new path
+    (tmp_path / "B" / "sub" / "deep" / "g.txt").write_text("x")
+    os.rename(tmp_path / "B" / "sub" / "deep" / "f.txt", tmp_path / "B" / "sub" / "f.txt")
+    assert watcher.get_tree() == full_walk(tmp_path)
+    assert "      g.txt" in watcher.get_tree().splitlines()
+
+
+def test_invalidate_rewalks(watcher, tmp_path):
+    watcher.get_tree()
+    watcher.invalidate()
+    assert watcher.get_tree() == full_walk(tmp_path)
@@ -0,0 +1,137 @@
+import numpy as np
+import pytest
+from gymnasium import spaces
+from gymnasium.vector.vector_env import AutoresetMode
+
+from file_browser_env import vector as vector_module
+from file_browser_env.vector import FBVectorEnv
+
+DONE = 2
+
+
+class StubGymEnv:
+    """Observations are filled with `value`; action DONE ends the episode."""
+
+    metadata = {"render_modes": []}
+    render_mode = None
+    created = []
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.index = len(StubGymEnv.created)
+        StubGymEnv.created.append(self)
+        self.observation_space = spaces.Box(0, 255, (4, 6, 3), dtype=np.uint8)
+        self.action_space = spaces.Discrete(3)
+        self.value = 0
+        self.seeds = []
+        self.closed = False
+
+    def _obs(self):
+        return np.full((4, 6, 3), self.value, dtype=np.uint8)
+
+    def reset(self, seed=None, options=None):
+        self.seeds.append(seed)
+        self.value = 100 + self.index
+        return self._obs(), {"reset": self.index}
+
+    def step(self, action):
+        self.value = 10 * self.index + action
+        info = {"step": self.index}
+        if action == 1:
+            info["only_on_one"] = True
+        return self._obs(), float(action), action == DONE, False, info
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def stub_env(monkeypatch):
+    monkeypatch.setattr(StubGymEnv, "created", [])
+    monkeypatch.setattr(vector_module, "FBGymEnv", StubGymEnv)
+
+
+def test_spaces_and_reset_seeds():
+    env = FBVectorEnv(3, statemode="full")
+    try:
+        assert env.observation_space.shape == (3, 4, 6, 3)
+        assert env.metadata["autoreset_mode"] == AutoresetMode.SAME_STEP
+        assert "autoreset_mode" not in StubGymEnv.metadata
+        obs, info = env.reset(seed=5)
+        assert [e.seeds for e in env.envs] == [[5], [6], [7]]
+        assert [e.kwargs for e in env.envs] == [{"statemode": "full"}] * 3
+        assert obs[:, 0, 0, 0].tolist() == [100, 101, 102]
+        assert info["reset"].tolist() == [0, 1, 2]
+        assert info["_reset"].all()
+    finally:
+        env.close()
+
+
+def test_statemode_both_is_rejected():
+    with pytest.raises(ValueError):
+        FBVectorEnv(2, statemode="both")
+
+
+def test_finished_instance_resets_in_the_same_step():
+    env = FBVectorEnv(3)
+    try:
+        env.reset()
+        obs, rewards, terminated, truncated, info = env.step(np.array([0, DONE, 1]))
+        # instance 1 ended: its batch slot already holds the reset observation
+        assert obs[:, 0, 0, 0].tolist() == [0, 101, 21]
+        assert rewards.tolist() == [0.0, 2.0, 1.0]
+        assert terminated.tolist() == [False, True, False]
+        assert not truncated.any()
+        assert info["_final_obs"].tolist() == [False, True, False]
+        assert info["final_obs"][0] is None
+        assert (info["final_obs"][1] == 12).all()
+        assert info["final_info"][1] == {"step": 1}
+        assert env.envs[1].seeds == [None, None]
+    finally:
+        env.close()
+
+
+def test_infos_merge_into_key_and_mask():
+    env = FBVectorEnv(2)
+    try:
+        env.reset()
+        _, _, _, _, info = env.step(np.array([1, 0]))
+        assert info["step"].tolist() == [0, 1]
+        assert info["_step"].tolist() == [True, True]
+        assert info["only_on_one"].tolist() == [True, None]
+        assert info["_only_on_one"].tolist() == [True, False]
+    finally:
+        env.close()
+
+
+def test_without_autoreset_the_final_observation_stays():
+    env = FBVectorEnv(2, autoreset=False)
+    try:
+        env.reset()
+        obs, _, terminated, _, info = env.step(np.array([DONE, 0]))
+        assert obs[:, 0, 0, 0].tolist() == [2, 10]
+        assert terminated.tolist() == [True, False]
+        assert "final_obs" not in info
+    finally:
+        env.close()
+
+
+def test_copy_false_reuses_the_batch_buffer():
+    env = FBVectorEnv(2, copy=False)
+    try:
+        first, _ = env.reset()
+        second, *_ = env.step(np.array([0, 0]))
+        assert first is second
+    finally:
+        env.close()
+
+
+def test_close_closes_every_instance_once():
+    env = FBVectorEnv(2)
+    env.close()
+    assert env.closed
+    assert all(e.closed for e in env.envs)
+    for e in env.envs:
+        e.closed = False
+    env.close()
+    assert not any(e.closed for e in env.envs)